@@ -9,21 +9,38 @@ AdminPortal uses ttk.Notebook with the following tabs:
     - Patients
     - Doctors
     - Appointments (read-only overview)
+    - Analytics (utilization / no-show reports)
 
 Each tab is implemented by a separate frame class imported from:
     - frames_department
     - frames_patient
     - frames_doctor
     - frames_appointment_admin
+    - frames_analytics
+
+Tabs are built lazily: a tab's frame (and its queries) is only created the
+first time the tab is selected. After the first tab is shown, the shared
+reference data is warmed up in the background so later tabs open quickly.
+
+Opened through session.session_manager, "Return to Login" only hides the
+window (`on_return`), and the Appointments tab shares its loaded list with
+the session's other windows (`context`).
 """
 
 from tkinter import *
 from tkinter import ttk
 
+from db_executor import db_executor
+from reference_cache import reference_cache
+
 from frames_department import DepartmentFrame
 from frames_patient import PatientFrame
 from frames_doctor import DoctorFrame
 from frames_appointment_admin import AppointmentAdminFrame
+from frames_analytics import AnalyticsFrame
+
+
+WARM_UP_DELAY_MS = 300
 
 
 class AdminPortal:
@@ -32,8 +49,9 @@ class AdminPortal:
     This window is typically opened from MainApp via a Toplevel.
     """
 
-    def __init__(self, root):
+    def __init__(self, root, warm_up=True, context=None, on_return=None):
         self.root = root
+        self.context = context
         self.root.title("Clinic Admin Portal")
         self.root.geometry("1200x650+80+40")
         self.root.configure(bg="white")
@@ -47,23 +65,47 @@ class AdminPortal:
         )
         title.pack(fill=X)
         Button(root, text="Return to Login", bg="#FF6666", fg="white",
-            command=root.destroy).pack(side=TOP, anchor="ne", padx=10, pady=5)
+            command=on_return or root.destroy).pack(side=TOP, anchor="ne", padx=10, pady=5)
 
         notebook = ttk.Notebook(root)
         notebook.pack(fill=BOTH, expand=True)
+        self.notebook = notebook
+
+        # tab widget name -> frame class, built on first selection
+        self.tab_classes = {}
+        self.tab_frames = {}
+
+        for text, frame_class in [
+            ("Departments", DepartmentFrame),
+            ("Patients", PatientFrame),
+            ("Doctors", DoctorFrame),
+            ("Appointments", AppointmentAdminFrame),
+            ("Analytics", AnalyticsFrame),
+        ]:
+            tab = Frame(notebook, bg="white")
+            notebook.add(tab, text=text)
+            self.tab_classes[str(tab)] = frame_class
+
+        notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.build_tab(notebook.select())
+
+        if warm_up:
+            root.after(WARM_UP_DELAY_MS, self.warm_up)
+
+    def on_tab_changed(self, event):
+        """Build the selected tab's frame the first time it is shown."""
+        self.build_tab(event.widget.select())
+
+    def build_tab(self, tab_name):
+        if not tab_name or tab_name in self.tab_frames:
+            return
+        tab = self.notebook.nametowidget(tab_name)
+        frame_class = self.tab_classes[tab_name]
+        if frame_class is AppointmentAdminFrame:
+            self.tab_frames[tab_name] = frame_class(tab, context=self.context)
+        else:
+            self.tab_frames[tab_name] = frame_class(tab)
 
-        dept_tab = Frame(notebook, bg="white")
-        patient_tab = Frame(notebook, bg="white")
-        doctor_tab = Frame(notebook, bg="white")
-        appointment_tab = Frame(notebook, bg="white")
-
-        notebook.add(dept_tab, text="Departments")
-        notebook.add(patient_tab, text="Patients")
-        notebook.add(doctor_tab, text="Doctors")
-        notebook.add(appointment_tab, text="Appointments")
-
-        # Attach functional frames
-        DepartmentFrame(dept_tab)
-        PatientFrame(patient_tab)
-        DoctorFrame(doctor_tab)
-        AppointmentAdminFrame(appointment_tab)
+    def warm_up(self):
+        """Load the shared reference tables in the background so other tabs open instantly."""
+        db_executor.submit(self.notebook, reference_cache.warm, on_error=None)
@@ -0,0 +1,330 @@
+"""
+analytics.py
+------------
+Daily per-doctor rollups of the appointment table, kept up to date by the
+writes themselves, and the utilization / no-show reports built from them.
+
+One row per (doctor_id, stat_date) in doctor_daily_stats holds:
+
+    booked                          appointments on that day (any status)
+    scheduled / completed /         status counts ("No-show" is a status the
+    cancelled / no_show             admin can set like the others)
+    rated, rating_sum               ratings given for that day's visits
+    rating_1 .. rating_5            rating distribution (1.0-1.5 -> 1, ..., 5.0 -> 5)
+
+The booking, update, delete and rating writes call apply_appointment_change()
+inside their own transaction (like ratings.apply_rating_change), so a
+rollup row is never out of step with its appointments. rebuild_rollups()
+recomputes rows from the appointment table: schema migration 8 uses it to
+backfill, and `python analytics.py rebuild` repairs a date range.
+
+Reports only read rollup rows. Capacity is the number of slots the roster
+offers (schedule.template_for), counted per doctor and day, and department
+figures are sums over their doctors' rows:
+
+    doctor_report(date_from, date_to, department_id=None)     -> [DoctorUtilization]
+    department_report(date_from, date_to, department_id=None) -> [DepartmentUtilization]
+"""
+
+from __future__ import annotations
+
+import math
+import sys
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+from db_config import pooled_connection
+from availability import format_slot_date
+from reference_cache import reference_cache
+from schedule import schedule
+
+
+STATUS_COLUMNS = {
+    "Scheduled": "scheduled",
+    "Completed": "completed",
+    "Cancelled": "cancelled",
+    "No-show": "no_show",
+}
+RATING_BUCKETS = ("rating_1", "rating_2", "rating_3", "rating_4", "rating_5")
+COUNTER_COLUMNS = ("booked",) + tuple(STATUS_COLUMNS.values()) + ("rated",) + RATING_BUCKETS
+
+ROLLUP_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS doctor_daily_stats (
+        doctor_id INT NOT NULL,
+        stat_date DATE NOT NULL,
+        department_id INT NOT NULL,
+        booked INT NOT NULL DEFAULT 0,
+        scheduled INT NOT NULL DEFAULT 0,
+        completed INT NOT NULL DEFAULT 0,
+        cancelled INT NOT NULL DEFAULT 0,
+        no_show INT NOT NULL DEFAULT 0,
+        rated INT NOT NULL DEFAULT 0,
+        rating_sum DECIMAL(10,1) NOT NULL DEFAULT 0,
+        rating_1 INT NOT NULL DEFAULT 0,
+        rating_2 INT NOT NULL DEFAULT 0,
+        rating_3 INT NOT NULL DEFAULT 0,
+        rating_4 INT NOT NULL DEFAULT 0,
+        rating_5 INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (doctor_id, stat_date)
+    )
+"""
+# Bucket number (1..5) of a rating; rating_bucket() is the same rule in Python
+RATING_BUCKET_SQL = "LEAST(GREATEST(FLOOR({column}), 1), 5)"
+
+ROLLUP_INDEX_DDL = "CREATE INDEX idx_stats_date_department ON doctor_daily_stats (stat_date, department_id)"
+
+
+def rating_bucket(rating):
+    """'rating_1' .. 'rating_5' for a rating of 1.0 .. 5.0."""
+    return RATING_BUCKETS[min(max(math.floor(Decimal(str(rating))), 1), 5) - 1]
+
+
+# ---------------- incremental maintenance ----------------
+
+def _contribution(appointment, sign, deltas):
+    """Add (sign=+1) or remove (-1) one appointment's counts to deltas[(doctor_id, date)]."""
+    doctor_id, appointment_date, status, rating = appointment
+    key = (int(doctor_id), format_slot_date(appointment_date))
+    counts = deltas.setdefault(key, {"rating_sum": Decimal(0)})
+    for column in ["booked", STATUS_COLUMNS.get(status)] + (
+            ["rated", rating_bucket(rating)] if rating is not None else []):
+        if column:
+            counts[column] = counts.get(column, 0) + sign
+    if rating is not None:
+        counts["rating_sum"] += sign * Decimal(str(rating))
+
+
+def apply_appointment_change(cursor, old=None, new=None):
+    """
+    Move one appointment's counts in doctor_daily_stats. old / new are
+    (doctor_id, appointment_date, status, doctor_rating) before and after
+    the write (None for an insert / delete).
+
+    Runs inside the caller's transaction (the caller commits).
+    """
+    deltas = {}
+    if old is not None:
+        _contribution(old, -1, deltas)
+    if new is not None:
+        _contribution(new, +1, deltas)
+    for (doctor_id, stat_date), counts in deltas.items():
+        changed = {column: n for column, n in counts.items() if n}
+        if changed:
+            _bump(cursor, doctor_id, stat_date, changed)
+
+
+def _bump(cursor, doctor_id, stat_date, changed):
+    """
+    Add `changed` to the (doctor_id, stat_date) row, creating it for the
+    doctor's first appointment of the day. A single upsert: an UPDATE that
+    misses followed by an INSERT deadlocks on the gap lock when two bookings
+    create the same row at once.
+    """
+    columns = list(changed)
+    cursor.execute(f"""
+        INSERT INTO doctor_daily_stats (doctor_id, stat_date, department_id, {", ".join(columns)})
+        SELECT doctor_id, %s, department_id, {", ".join(["%s"] * len(columns))}
+        FROM doctor WHERE doctor_id = %s
+        ON DUPLICATE KEY UPDATE {", ".join(f"{c} = {c} + VALUES({c})" for c in columns)}
+    """, (stat_date,) + tuple(changed[c] for c in columns) + (doctor_id,))
+
+
+def rebuild_rollups(cursor, date_from=None, date_to=None):
+    """Recompute doctor_daily_stats (for a date range, or all of it) from the appointment table."""
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append("appointment_date >= %s")
+        params.append(format_slot_date(date_from))
+    if date_to is not None:
+        conditions.append("appointment_date <= %s")
+        params.append(format_slot_date(date_to))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    status_sums = ", ".join(f"SUM(CASE WHEN a.status = '{status}' THEN 1 ELSE 0 END)"
+                            for status in STATUS_COLUMNS)
+    bucket = RATING_BUCKET_SQL.format(column="a.doctor_rating")
+    bucket_sums = ", ".join(f"SUM(CASE WHEN {bucket} = {n} THEN 1 ELSE 0 END)"
+                            for n in range(1, len(RATING_BUCKETS) + 1))
+
+    cursor.execute(f"DELETE FROM doctor_daily_stats {where.replace('appointment_date', 'stat_date')}",
+                   tuple(params))
+    cursor.execute(f"""
+        INSERT INTO doctor_daily_stats (doctor_id, stat_date, department_id, {", ".join(COUNTER_COLUMNS)},
+                                        rating_sum)
+        SELECT a.doctor_id, a.appointment_date, d.department_id,
+               COUNT(*), {status_sums}, COUNT(a.doctor_rating), {bucket_sums},
+               COALESCE(SUM(a.doctor_rating), 0)
+        FROM appointment a
+        JOIN doctor d ON a.doctor_id = d.doctor_id
+        {where.replace("appointment_date", "a.appointment_date")}
+        GROUP BY a.doctor_id, a.appointment_date, d.department_id
+    """, tuple(params))
+
+
+# ---------------- reports ----------------
+
+class _Rates:
+    """Derived figures shared by the doctor and department rows."""
+
+    @property
+    def utilization(self):
+        """Booked share of the offered slots (None without capacity)."""
+        return self.booked / self.capacity if self.capacity else None
+
+    @property
+    def no_show_rate(self):
+        """No-shows among the visits that were due (completed + no-show)."""
+        due = self.completed + self.no_show
+        return self.no_show / due if due else None
+
+    @property
+    def avg_rating(self):
+        return self.rating_sum / self.rated if self.rated else None
+
+
+@dataclass(frozen=True)
+class DoctorUtilization(_Rates):
+    doctor_id: int
+    doctor_display: str
+    department_id: int
+    capacity: int
+    booked: int
+    scheduled: int
+    completed: int
+    cancelled: int
+    no_show: int
+    rated: int
+    rating_sum: float
+    ratings: tuple   # counts of 1..5
+
+
+@dataclass(frozen=True)
+class DepartmentUtilization(_Rates):
+    department_id: int
+    department_name: str
+    doctors: int
+    capacity: int
+    booked: int
+    scheduled: int
+    completed: int
+    cancelled: int
+    no_show: int
+    rated: int
+    rating_sum: float
+    ratings: tuple
+
+
+def _days(date_from, date_to):
+    day = date.fromisoformat(format_slot_date(date_from))
+    last = date.fromisoformat(format_slot_date(date_to))
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+def _capacity(doctor_id, days):
+    return sum(len(schedule.template_for(doctor_id, day)) for day in days)
+
+
+def doctor_report(date_from, date_to, department_id=None) -> list[DoctorUtilization]:
+    """
+    One row per doctor (of the department, or all) for the inclusive date
+    range, including doctors without any appointment in it.
+    """
+    conditions = ["stat_date >= %s", "stat_date <= %s"]
+    params = [format_slot_date(date_from), format_slot_date(date_to)]
+    if department_id is not None:
+        conditions.append("department_id = %s")
+        params.append(department_id)
+    with pooled_connection() as con:
+        cur = con.cursor()
+        cur.execute(f"""
+            SELECT doctor_id, department_id, {", ".join(f"SUM({c})" for c in COUNTER_COLUMNS)},
+                   SUM(rating_sum)
+            FROM doctor_daily_stats
+            WHERE {" AND ".join(conditions)}
+            GROUP BY doctor_id, department_id
+        """, tuple(params))
+        rows = cur.fetchall()
+
+    totals = {}   # doctor_id -> (department_id, counters, rating_sum)
+    for doctor_id, dept_id, *counters, rating_sum in rows:
+        # A doctor who changed department has rows under both; report under the current one
+        previous = totals.get(doctor_id)
+        counters = [int(n or 0) for n in counters]
+        rating_sum = float(rating_sum or 0)
+        if previous is not None:
+            counters = [a + b for a, b in zip(previous[1], counters)]
+            rating_sum += previous[2]
+        totals[doctor_id] = (dept_id, counters, rating_sum)
+
+    days = list(_days(date_from, date_to))
+    doctors = reference_cache.doctors() if department_id is None else \
+        reference_cache.doctors_for_department(department_id)
+    report = []
+    for doc in doctors:
+        doctor_id, first, last, current_dept = doc[0], doc[1], doc[2], doc[3]
+        _, counters, rating_sum = totals.pop(doctor_id, (current_dept, [0] * len(COUNTER_COLUMNS), 0.0))
+        report.append(_doctor_row(doctor_id, f"{doctor_id} - {first} {last}", current_dept,
+                                  _capacity(doctor_id, days), counters, rating_sum))
+    # Rows of doctors that moved out of the department / were deleted
+    for doctor_id, (dept_id, counters, rating_sum) in totals.items():
+        report.append(_doctor_row(doctor_id, f"{doctor_id} - (former)", dept_id, 0, counters, rating_sum))
+    report.sort(key=lambda r: (r.department_id, r.doctor_id))
+    return report
+
+
+def _doctor_row(doctor_id, display, department_id, capacity, counters, rating_sum):
+    values = dict(zip(COUNTER_COLUMNS, counters))
+    return DoctorUtilization(
+        doctor_id, display, department_id, capacity, values["booked"], values["scheduled"],
+        values["completed"], values["cancelled"], values["no_show"], values["rated"], rating_sum,
+        tuple(values[b] for b in RATING_BUCKETS),
+    )
+
+
+def department_report(date_from, date_to, department_id=None) -> list[DepartmentUtilization]:
+    """One row per department (or just `department_id`'s): the sums of its doctors' rows."""
+    return summarize_departments(doctor_report(date_from, date_to, department_id), department_id)
+
+
+def summarize_departments(doctor_rows, department_id=None) -> list[DepartmentUtilization]:
+    """Department rows from doctor_report() rows (callers showing both query once)."""
+    names = {d[0]: d[1] for d in reference_cache.departments()
+             if department_id is None or d[0] == department_id}
+    grouped = {}
+    for row in doctor_rows:
+        grouped.setdefault(row.department_id, []).append(row)
+    report = []
+    for dept_id in sorted(set(names) | set(grouped)):
+        rows = grouped.get(dept_id, [])
+        report.append(DepartmentUtilization(
+            department_id=dept_id, department_name=names.get(dept_id, f"Department {dept_id}"),
+            doctors=len(rows), capacity=sum(r.capacity for r in rows), booked=sum(r.booked for r in rows),
+            scheduled=sum(r.scheduled for r in rows), completed=sum(r.completed for r in rows),
+            cancelled=sum(r.cancelled for r in rows), no_show=sum(r.no_show for r in rows),
+            rated=sum(r.rated for r in rows), rating_sum=sum(r.rating_sum for r in rows),
+            ratings=tuple(sum(r.ratings[i] for r in rows) for i in range(len(RATING_BUCKETS))),
+        ))
+    return report
+
+
+def main(argv):
+    """
+    python analytics.py rebuild [FROM [TO]]   # recompute the rollups (all dates, or a range)
+    """
+    if len(argv) < 2 or argv[1] != "rebuild":
+        print(main.__doc__)
+        return 2
+    date_from = argv[2] if len(argv) > 2 else None
+    date_to = argv[3] if len(argv) > 3 else None
+    with pooled_connection() as con:
+        rebuild_rollups(con.cursor(), date_from, date_to)
+        con.commit()
+    print("doctor_daily_stats rebuilt")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,125 @@
+"""
+api_client.py
+-------------
+Small blocking client for api_server.py, for front-desk tools and scripts
+that should go through the shared server instead of opening their own
+MySQL connections.
+
+    client = ApiClient("http://127.0.0.1:8765", token="...")
+    client.availability(7, "2025-01-20")["free"]
+    result = client.book(patient_id=12, doctor_id=7, date="2025-01-20", time="09:30")
+    if not result["ok"]:
+        print(result["message"], result["alternatives"])
+
+One keep-alive connection is reused per client (guarded by a lock, so a
+client may be shared by worker threads). Booking and rating conflicts are
+returned as data; other non-2xx answers raise ApiClientError.
+"""
+
+import http.client
+import json
+import threading
+from urllib.parse import urlsplit, urlencode
+
+from api_server import DEFAULT_HOST, DEFAULT_PORT
+
+
+class ApiClientError(Exception):
+    """Non-success answer from the API server."""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class ApiClient:
+    def __init__(self, base_url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", token=None, timeout=10.0):
+        url = urlsplit(base_url)
+        self.host = url.hostname or DEFAULT_HOST
+        self.port = url.port or DEFAULT_PORT
+        self.token = token
+        self.timeout = timeout
+        self._con = None
+        self._lock = threading.Lock()
+
+    # ---------- endpoints ----------
+    def health(self):
+        return self._request("GET", "/health")
+
+    def departments(self):
+        return self._request("GET", "/departments")
+
+    def doctors(self, department_id=None):
+        query = {"department_id": department_id} if department_id is not None else None
+        return self._request("GET", "/doctors", query)
+
+    def availability(self, doctor_id, appointment_date):
+        return self._request("GET", "/availability", {"doctor_id": doctor_id, "date": appointment_date})
+
+    def department_availability(self, department_id, appointment_date):
+        return self._request("GET", f"/departments/{department_id}/availability", {"date": appointment_date})
+
+    def book(self, patient_id, doctor_id, date, time, notes=""):
+        """Returns the booking result dict; a taken slot is {"ok": False, "conflict": True, ...}."""
+        return self._request("POST", "/appointments",
+                             body={"patient_id": patient_id, "doctor_id": doctor_id,
+                                   "date": date, "time": time, "notes": notes},
+                             accept=(409, 422))
+
+    def appointments(self, patient_id):
+        return self._request("GET", f"/patients/{patient_id}/appointments")
+
+    def rate(self, patient_id, appointment_id, rating):
+        """True if the rating was stored, False if the appointment was already rated."""
+        result = self._request("POST", "/ratings",
+                               body={"patient_id": patient_id, "appointment_id": appointment_id,
+                                     "rating": rating},
+                               accept=(409,))
+        return bool(result.get("stored"))
+
+    def close(self):
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+    # ---------- transport ----------
+    def _request(self, method, path, query=None, body=None, accept=()):
+        if query:
+            path += "?" + urlencode(query)
+        headers = {"Accept": "application/json"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+
+        with self._lock:
+            status, raw = self._send(method, path, data, headers)
+
+        payload = json.loads(raw) if raw else None
+        if 200 <= status < 300 or status in accept:
+            return payload
+        message = payload.get("error") if isinstance(payload, dict) else raw
+        raise ApiClientError(status, message)
+
+    def _send(self, method, path, data, headers):
+        # Retry once on a fresh connection if the kept-alive one was dropped by the server
+        for attempt in (1, 2):
+            if self._con is None:
+                self._con = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._con.request(method, path, body=data, headers=headers)
+                response = self._con.getresponse()
+                raw = response.read()
+                if response.getheader("Connection", "").lower() == "close":
+                    self._con.close()
+                    self._con = None
+                return response.status, raw
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.CannotSendRequest):
+                self._con.close()
+                self._con = None
+                if attempt == 2 or method != "GET":
+                    raise
@@ -0,0 +1,385 @@
+"""
+api_server.py
+-------------
+Local HTTP/JSON API over the service layer (services.py).
+
+Every front desk running the Tk client opens its own connection pool and
+keeps its own availability index. This server runs them once instead: all
+desks that talk to it share one connection pool, one reference cache and
+one availability index, so the number of MySQL connections stays at
+db_config.POOL_MAX_SIZE however many desks connect.
+
+    python api_server.py [--host 127.0.0.1] [--port 8765] [--token SECRET]
+
+Endpoints (JSON in, JSON out):
+    GET  /health
+    GET  /departments
+    GET  /doctors[?department_id=3]
+    GET  /availability?doctor_id=7&date=2025-01-20
+    GET  /departments/3/availability?date=2025-01-20     free slots per doctor
+    POST /appointments    {"patient_id", "doctor_id", "date", "time", "notes"}
+    GET  /patients/12/appointments
+    POST /ratings         {"patient_id", "appointment_id", "rating"}
+    GET  /metrics         query timings, Prometheus text format (query_metrics.py)
+    GET  /metrics.json    the same as JSON, with the slow-query log
+
+Booking answers 201 when the slot was reserved, 409 with alternatives when
+it was taken, 422 when the time is not a slot of the doctor's schedule.
+
+The HTTP handling is plain asyncio streams (HTTP/1.1 with keep-alive), so
+no web framework is needed. Service calls block, so they run on a thread
+pool no larger than the connection pool. With --token (or CLINIC_API_TOKEN)
+every endpoint except /health requires "Authorization: Bearer <token>".
+The server binds to localhost by default.
+"""
+
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import date, datetime
+from decimal import Decimal
+from urllib.parse import urlsplit, parse_qs
+
+from db_config import POOL_MAX_SIZE
+from availability import availability_index
+from reference_cache import reference_cache
+from schedule import schedule
+from query_metrics import query_metrics
+from services import department_repo, doctor_repo, appointment_service, rating_service
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 64 * 1024
+MAX_HEADER_LINES = 100
+
+log = logging.getLogger("clinic.api")
+REQUEST_TIMEOUT = 10.0       # seconds to receive one request once it started
+KEEP_ALIVE_TIMEOUT = 30.0    # seconds an idle keep-alive connection is kept open
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           422: "Unprocessable Entity", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    """Turned into a JSON error response with the given HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _int_param(source, name):
+    try:
+        return int(source[name])
+    except KeyError:
+        raise ApiError(400, f"'{name}' is required.")
+    except (TypeError, ValueError):
+        raise ApiError(400, f"'{name}' must be an integer.")
+
+
+def _date_param(source, name):
+    value = source.get(name)
+    if not value:
+        raise ApiError(400, f"'{name}' is required.")
+    try:
+        return datetime.strptime(str(value), "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise ApiError(400, f"'{name}' must be a date (YYYY-MM-DD).")
+
+
+def _time_param(source, name):
+    value = source.get(name)
+    if not value:
+        raise ApiError(400, f"'{name}' is required.")
+    try:
+        return datetime.strptime(str(value), "%H:%M").strftime("%H:%M")
+    except ValueError:
+        raise ApiError(400, f"'{name}' must be a time (HH:MM).")
+
+
+# ---------------- handlers (run on the worker pool) ----------------
+
+def get_health(query, body):
+    return 200, {"status": "ok"}
+
+
+def get_metrics(query, body):
+    return 200, query_metrics.to_prometheus()
+
+
+def get_metrics_json(query, body):
+    return 200, query_metrics.snapshot()
+
+
+def get_departments(query, body):
+    return 200, [asdict(d) for d in department_repo.all()]
+
+
+def get_doctors(query, body):
+    if "department_id" in query:
+        doctors = doctor_repo.for_department(_int_param(query, "department_id"))
+    else:
+        doctors = doctor_repo.all()
+    return 200, [asdict(d) for d in doctors]
+
+
+def get_availability(query, body):
+    doctor_id = _int_param(query, "doctor_id")
+    day = _date_param(query, "date")
+    template = schedule.template_for(doctor_id, day)
+    booked = appointment_service.booked_slots(doctor_id, day)
+    return 200, {
+        "doctor_id": doctor_id,
+        "date": day,
+        "slots": list(template.starts),
+        "booked": [s for s in template.starts if s in booked],
+        "free": [s for s in template.starts if s not in booked],
+    }
+
+
+def get_department_availability(query, body, department_id):
+    day = _date_param(query, "date")
+    # one query loads the whole department for the day into the shared index
+    doctors = doctor_repo.for_department(int(department_id), [day])
+    return 200, {
+        "department_id": int(department_id),
+        "date": day,
+        "doctors": [{"doctor_id": d.doctor_id, "display": d.display,
+                     "free_slots": availability_index.free_slot_count(d.doctor_id, day, load=False)}
+                    for d in doctors],
+    }
+
+
+def post_appointment(query, body):
+    patient_id = _int_param(body, "patient_id")
+    doctor_id = _int_param(body, "doctor_id")
+    day = _date_param(body, "date")
+    time_str = _time_param(body, "time")
+
+    result = appointment_service.book(patient_id, doctor_id, day, time_str, str(body.get("notes") or ""))
+    payload = {
+        "ok": result.ok,
+        "appointment_id": result.appointment_id,
+        "conflict": result.conflict,
+        "message": result.message,
+        "alternatives": [{"date": d, "time": t} for d, t in result.alternatives],
+    }
+    if result.ok:
+        return 201, payload
+    return (409 if result.conflict else 422), payload
+
+
+def get_patient_appointments(query, body, patient_id):
+    return 200, [asdict(r) for r in rating_service.history(int(patient_id))]
+
+
+def post_rating(query, body):
+    patient_id = _int_param(body, "patient_id")
+    appointment_id = _int_param(body, "appointment_id")
+    try:
+        rating = float(body["rating"])
+    except (KeyError, TypeError, ValueError):
+        raise ApiError(400, "'rating' must be a number.")
+    # same choices as the Rate Doctor tab: 1.0 .. 5.0 in steps of 0.5
+    if not 1.0 <= rating <= 5.0 or rating * 2 != int(rating * 2):
+        raise ApiError(400, "'rating' must be between 1.0 and 5.0 in steps of 0.5.")
+
+    stored = rating_service.submit(patient_id, appointment_id, f"{rating:.1f}")
+    if stored:
+        # doctor averages changed
+        reference_cache.invalidate("doctor")
+        return 200, {"stored": True}
+    return 409, {"stored": False, "message": "This appointment is already rated or not this patient's."}
+
+
+# (method, path pattern, handler); path groups are passed to the handler
+ROUTES = [
+    ("GET", re.compile(r"/health"), get_health),
+    ("GET", re.compile(r"/metrics"), get_metrics),
+    ("GET", re.compile(r"/metrics\.json"), get_metrics_json),
+    ("GET", re.compile(r"/departments"), get_departments),
+    ("GET", re.compile(r"/departments/(\d+)/availability"), get_department_availability),
+    ("GET", re.compile(r"/doctors"), get_doctors),
+    ("GET", re.compile(r"/availability"), get_availability),
+    ("POST", re.compile(r"/appointments"), post_appointment),
+    ("GET", re.compile(r"/patients/(\d+)/appointments"), get_patient_appointments),
+    ("POST", re.compile(r"/ratings"), post_rating),
+]
+
+
+# ---------------- server ----------------
+
+class ApiServer:
+    """asyncio HTTP server dispatching to the service layer on a bounded thread pool."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, token=None, workers=POOL_MAX_SIZE):
+        self.host = host
+        self.port = port
+        self.token = token
+        # more workers than pooled connections would only queue inside the pool
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-worker")
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=False)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                try:
+                    request = await asyncio.wait_for(self.read_request(request_line, reader), REQUEST_TIMEOUT)
+                except ApiError as e:
+                    await self.respond(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                method, target, headers, body, keep_alive = request
+                status, payload = await self.dispatch(method, target, headers, body)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, request_line, reader):
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise ApiError(400, "Malformed request line.")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADER_LINES:
+                raise ApiError(431, "Too many headers.")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise ApiError(400, "Invalid Content-Length.")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "Request body too large.")
+        body = await reader.readexactly(length) if length else b""
+
+        keep_alive = version.upper() == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        return method.upper(), target, headers, body, keep_alive
+
+    async def dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        matches = [(m, route_method, handler) for route_method, pattern, handler in ROUTES
+                   for m in [pattern.fullmatch(path)] if m]
+        if not matches:
+            return 404, {"error": f"No such endpoint: {path}"}
+        route = next(((m, h) for m, route_method, h in matches if route_method == method), None)
+        if route is None:
+            return 405, {"error": f"{method} is not allowed on {path}"}
+        match, handler = route
+
+        if self.token and handler is not get_health:
+            supplied = headers.get("authorization", "")
+            if not hmac.compare_digest(supplied.encode(), f"Bearer {self.token}".encode()):
+                return 401, {"error": "Missing or invalid API token."}
+
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            return 400, {"error": "Request body must be JSON."}
+        if not isinstance(data, dict):
+            return 400, {"error": "Request body must be a JSON object."}
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, lambda: handler(query, data, *match.groups()))
+        except ApiError as e:
+            return e.status, {"error": e.message}
+        except Exception:
+            # Details stay in the server log; driver errors can quote SQL and data
+            log.exception("%s %s failed", method, path)
+            return 500, {"error": "Internal Server Error"}
+
+    async def respond(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            # Prometheus text exposition
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload, default=_json_default).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python api_server.py", description="Clinic HTTP/JSON API")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token", default=os.environ.get("CLINIC_API_TOKEN"),
+                        help="require 'Authorization: Bearer TOKEN' (default: $CLINIC_API_TOKEN)")
+    args = parser.parse_args(argv)
+
+    server = ApiServer(args.host, args.port, args.token)
+
+    async def run():
+        await server.start()
+        print(f"Clinic API listening on http://{server.host}:{server.port}", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+availability.py
+---------------
+Shared in-memory slot availability index.
+
+The booking grids (client + admin) used to run one SELECT on `appointment`
+per doctor card / date click. This module keeps a bitmap of booked slots
+per (doctor_id, date) instead:
+
+    - bit i of the bitmap is set when an appointment starts in the i-th
+      SLOT_GRANULARITY-minute bucket of the day; the doctor's SlotTemplate
+      (see schedule.py) maps the bitmap to booked slots of any length
+    - whole dates are loaded in bulk with ONE query (see `load_dates`)
+    - a department's doctors x dates are loaded with ONE query
+      (see `department_availability`), so doctor cards can show free-slot
+      badges without N+1 queries
+    - the CRUD code updates the index incrementally after each write
+      (`record_booking`, `move_booking`, `release_booking`)
+
+Loaded dates expire after AVAILABILITY_TTL seconds so bookings made from
+other desks are picked up again.
+"""
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from db_config import pooled_connection
+from schedule import schedule as default_schedule, minute_bit, parse_minutes
+
+
+AVAILABILITY_TTL = 60.0
+
+# Query text is module-level so `python schema.py explain` checks exactly
+# what runs here. {placeholders} is one "%s" per date.
+DATE_BOOKINGS_SQL = """
+    SELECT appointment_id, doctor_id, appointment_date, appointment_time
+    FROM appointment
+    WHERE appointment_date IN ({placeholders})
+"""
+
+DEPARTMENT_BOOKINGS_SQL = """
+    SELECT d.doctor_id, a.appointment_id, a.appointment_date, a.appointment_time
+    FROM doctor d
+    LEFT JOIN appointment a
+           ON a.doctor_id = d.doctor_id
+          AND a.appointment_date IN ({placeholders})
+    WHERE d.department_id=%s
+    ORDER BY d.doctor_id
+"""
+
+DOCTOR_DATE_BOOKINGS_SQL = """
+    SELECT appointment_id, appointment_time
+    FROM appointment
+    WHERE doctor_id=%s AND appointment_date=%s
+"""
+
+
+def format_slot_time(value):
+    """Normalize a TIME value from the driver (time / timedelta / str) to 'HH:MM'."""
+    if hasattr(value, "strftime"):
+        return value.strftime("%H:%M")
+    if isinstance(value, timedelta):
+        minutes = int(value.total_seconds()) // 60
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+    text = str(value)
+    hours, _, rest = text.partition(":")
+    return f"{int(hours):02d}:{rest[:2]}" if rest else text[:5]
+
+
+def format_slot_date(value):
+    """Normalize a DATE value (date / str) to 'YYYY-MM-DD'."""
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+
+class AvailabilityIndex:
+    """Bitmap index of booking start times keyed by (doctor_id, 'YYYY-MM-DD')."""
+
+    def __init__(self, schedule=default_schedule, ttl=AVAILABILITY_TTL):
+        self.schedule = schedule
+        self.ttl = ttl
+
+        self._bitmaps = {}        # (doctor_id, date) -> int
+        self._appts = {}          # (doctor_id, date) -> {appointment_id: bit}
+        self._appt_key = {}       # appointment_id -> (doctor_id, date)
+        self._dates_loaded = {}   # date -> monotonic load time (whole date)
+        self._keys_loaded = {}    # (doctor_id, date) -> monotonic load time
+        self._lock = threading.RLock()
+
+    # ---------- bulk loading ----------
+    def load_dates(self, dates):
+        """Load every booking on the given dates with a single query."""
+        dates = sorted({format_slot_date(d) for d in dates})
+        if not dates:
+            return
+        placeholders = ", ".join(["%s"] * len(dates))
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute(DATE_BOOKINGS_SQL.format(placeholders=placeholders), tuple(dates))
+            rows = cur.fetchall()
+
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k in self._bitmaps if k[1] in dates]:
+                self._drop_key(key)
+            for appt_id, doctor_id, appt_date, appt_time in rows:
+                self._add(appt_id, doctor_id, format_slot_date(appt_date), format_slot_time(appt_time))
+            for d in dates:
+                self._dates_loaded[d] = now
+
+    def department_availability(self, department_id, dates, doctor_ids=None):
+        """
+        Return {doctor_id: {date: set of booked slot starts 'HH:MM'}} for every
+        doctor in the department across the given dates.
+
+        Uses a single joined query. When the caller already knows the
+        department's `doctor_ids` and those dates are still fresh in the
+        index, no query runs at all. Every doctor/date pair is marked as
+        loaded, so later card clicks are served from memory.
+        """
+        dates = sorted({format_slot_date(d) for d in dates})
+        if not dates:
+            return {}
+
+        rows = []
+        with self._lock:
+            cutoff = time.monotonic() - self.ttl
+            all_fresh = doctor_ids is not None and all(
+                self._dates_loaded.get(d, cutoff - 1) >= cutoff for d in dates
+            )
+        if not all_fresh:
+            placeholders = ", ".join(["%s"] * len(dates))
+            with pooled_connection() as con:
+                cur = con.cursor()
+                cur.execute(DEPARTMENT_BOOKINGS_SQL.format(placeholders=placeholders),
+                            tuple(dates) + (department_id,))
+                rows = cur.fetchall()
+            doctor_ids = sorted({r[0] for r in rows})
+
+        now = time.monotonic()
+        with self._lock:
+            if rows:
+                for doctor_id in doctor_ids:
+                    for d in dates:
+                        self._drop_key((doctor_id, d))
+                for doctor_id, appt_id, appt_date, appt_time in rows:
+                    if appt_id is not None:
+                        self._add(appt_id, doctor_id, format_slot_date(appt_date), format_slot_time(appt_time))
+                for doctor_id in doctor_ids:
+                    for d in dates:
+                        self._keys_loaded[(doctor_id, d)] = now
+
+            result = {}
+            for doctor_id in doctor_ids:
+                result[doctor_id] = {
+                    d: self.schedule.template_for(doctor_id, d).booked_starts(self._bitmaps.get((doctor_id, d), 0))
+                    for d in dates
+                }
+            return result
+
+    def _load_key(self, doctor_id, date_str):
+        """Fallback for dates outside the bulk window: load one doctor/date."""
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute(DOCTOR_DATE_BOOKINGS_SQL, (doctor_id, date_str))
+            rows = cur.fetchall()
+
+        with self._lock:
+            self._drop_key((doctor_id, date_str))
+            for appt_id, appt_time in rows:
+                self._add(appt_id, doctor_id, date_str, format_slot_time(appt_time))
+            self._keys_loaded[(doctor_id, date_str)] = time.monotonic()
+
+    def _is_fresh(self, doctor_id, date_str):
+        cutoff = time.monotonic() - self.ttl
+        loaded = self._dates_loaded.get(date_str)
+        if loaded is not None and loaded >= cutoff:
+            return True
+        loaded = self._keys_loaded.get((doctor_id, date_str))
+        return loaded is not None and loaded >= cutoff
+
+    # ---------- queries ----------
+    def is_cached(self, doctor_id, appointment_date):
+        """True when booked_slots() for this doctor/date can be answered from memory."""
+        with self._lock:
+            return self._is_fresh(doctor_id, format_slot_date(appointment_date))
+
+    def booked_mask(self, doctor_id, appointment_date, exclude_appt_id=None):
+        """Return the booking bitmap, loading from the DB only when stale."""
+        date_str = format_slot_date(appointment_date)
+        with self._lock:
+            fresh = self._is_fresh(doctor_id, date_str)
+        if not fresh:
+            self._load_key(doctor_id, date_str)
+
+        key = (doctor_id, date_str)
+        with self._lock:
+            mask = self._bitmaps.get(key, 0)
+            if exclude_appt_id is not None:
+                appts = self._appts.get(key, {})
+                bit = appts.get(exclude_appt_id)
+                if bit and not any(b == bit for a, b in appts.items() if a != exclude_appt_id):
+                    mask &= ~bit
+            return mask
+
+    def booked_slots(self, doctor_id, appointment_date, exclude_appt_id=None):
+        """Return the start times ('HH:MM') of the doctor's slots that overlap a booking on the date."""
+        mask = self.booked_mask(doctor_id, appointment_date, exclude_appt_id)
+        return self.schedule.template_for(doctor_id, appointment_date).booked_starts(mask)
+
+    def free_slot_count(self, doctor_id, appointment_date, load=True):
+        """
+        Number of unbooked slots for the doctor on the given date.
+
+        With load=False, returns None instead of querying when the pair is not cached.
+        """
+        if not load and not self.is_cached(doctor_id, appointment_date):
+            return None
+        mask = self.booked_mask(doctor_id, appointment_date)
+        return self.schedule.template_for(doctor_id, appointment_date).free_count(mask)
+
+    # ---------- incremental updates ----------
+    def record_booking(self, appointment_id, doctor_id, appointment_date, appointment_time):
+        """Mark a newly inserted appointment as booked."""
+        with self._lock:
+            self._add(appointment_id, doctor_id,
+                      format_slot_date(appointment_date), format_slot_time(appointment_time))
+
+    def release_booking(self, appointment_id):
+        """Free the slot held by a deleted appointment."""
+        with self._lock:
+            self._remove(appointment_id)
+
+    def move_booking(self, appointment_id, doctor_id, appointment_date, appointment_time):
+        """Re-index an updated appointment (doctor, date or time may change)."""
+        with self._lock:
+            self._remove(appointment_id)
+            self._add(appointment_id, doctor_id,
+                      format_slot_date(appointment_date), format_slot_time(appointment_time))
+
+    def refresh(self, doctor_id, appointment_date):
+        """Reload one doctor/date from the DB now (e.g. after losing a booking race)."""
+        self._load_key(doctor_id, format_slot_date(appointment_date))
+
+    def invalidate(self):
+        """Forget everything; the next lookups reload from the DB."""
+        with self._lock:
+            self._bitmaps.clear()
+            self._appts.clear()
+            self._appt_key.clear()
+            self._dates_loaded.clear()
+            self._keys_loaded.clear()
+
+    # ---------- internals (lock held) ----------
+    def _add(self, appt_id, doctor_id, date_str, time_str):
+        if appt_id in self._appt_key:
+            self._remove(appt_id)
+        key = (doctor_id, date_str)
+        bit = minute_bit(parse_minutes(time_str))
+        self._appts.setdefault(key, {})[appt_id] = bit
+        self._appt_key[appt_id] = key
+        self._bitmaps[key] = self._bitmaps.get(key, 0) | bit
+
+    def _remove(self, appt_id):
+        key = self._appt_key.pop(appt_id, None)
+        if key is None:
+            return
+        appts = self._appts.get(key, {})
+        bit = appts.pop(appt_id, 0)
+        if bit and bit not in appts.values():
+            self._bitmaps[key] = self._bitmaps.get(key, 0) & ~bit
+
+    def _drop_key(self, key):
+        for appt_id in self._appts.pop(key, {}):
+            self._appt_key.pop(appt_id, None)
+        self._bitmaps.pop(key, None)
+        self._keys_loaded.pop(key, None)
+
+
+# Process-wide index shared by every booking frame.
+availability_index = AvailabilityIndex()
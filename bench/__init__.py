@@ -0,0 +1,12 @@
+"""
+bench
+-----
+Synthetic data generator and load benchmark for the booking workload.
+
+    python -m bench generate --sqlite bench.db --patients 50000 --appointments 1000000
+    python -m bench run --sqlite bench.db --ops 5000 --threads 8
+    python -m bench run --ops 5000 --threads 8 --json results.json   # MySQL from db_config
+
+Without --sqlite the MySQL database configured in db_config.DB_SETTINGS is
+used (point it at a scratch database: `generate` inserts a lot of rows).
+"""
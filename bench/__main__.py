@@ -0,0 +1,93 @@
+"""
+bench/__main__.py
+-----------------
+Command line entry point: `python -m bench generate|run ...`.
+"""
+
+import argparse
+import sys
+
+from query_metrics import query_metrics
+from credentials import password_hasher
+from bench.datagen import DataGenConfig, generate
+from bench.workloads import DEFAULT_MIX, run_workload, summarize, format_report, dump_json
+
+
+def parse_mix(text):
+    """'login=10,slots=40' -> {'login': 10, 'slots': 40}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    parser.add_argument("--sqlite", metavar="PATH", help="use a SQLite file instead of MySQL")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="fill the database with synthetic data")
+    gen.add_argument("--departments", type=int, default=10)
+    gen.add_argument("--doctors-per-department", type=int, default=20)
+    gen.add_argument("--patients", type=int, default=50000)
+    gen.add_argument("--appointments", type=int, default=1000000)
+    gen.add_argument("--future-days", type=int, default=14)
+    gen.add_argument("--fill-ratio", type=float, default=0.7)
+    gen.add_argument("--seed", type=int, default=42)
+
+    run = sub.add_parser("run", help="replay the workload and report latencies")
+    run.add_argument("--ops", type=int, default=5000)
+    run.add_argument("--threads", type=int, default=4)
+    run.add_argument("--mix", type=parse_mix, default=None,
+                     help="weights, e.g. login=10,browse=20,slots=35,book=15,rate=10,admin_list=10")
+    run.add_argument("--warm", action="store_true", help="go through the shared caches")
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    run.add_argument("--queries", action="store_true",
+                     help="also print the time spent per query call site (query_metrics)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.sqlite:
+        from bench.sqlite_backend import use_sqlite
+        use_sqlite(args.sqlite)
+    else:
+        from schema import migrate
+        migrate(verbose=False)
+
+    if args.command == "generate":
+        generate(DataGenConfig(
+            departments=args.departments,
+            doctors_per_department=args.doctors_per_department,
+            patients=args.patients,
+            appointments=args.appointments,
+            future_days=args.future_days,
+            fill_ratio=args.fill_ratio,
+            seed=args.seed,
+        ))
+        return 0
+
+    query_metrics.reset()
+    stats, wall_time = run_workload(args.ops, args.threads, args.mix, args.warm, args.seed)
+    summary = summarize(stats, wall_time)
+    print(format_report(summary, wall_time))
+    hashing = password_hasher.snapshot()
+    if hashing["hashes"]:
+        print(f"password hashing ({hashing['scheme']} {hashing['parameters']}): {hashing['hashes']} hashes, "
+              f"avg {hashing['avg_hash_ms']:.1f} ms, max {hashing['max_hash_ms']:.1f} ms, "
+              f"avg wait {hashing['avg_wait_ms']:.1f} ms")
+    if args.queries:
+        print()
+        print(query_metrics.report())
+    if args.json:
+        dump_json(summary, wall_time, args.json)
+    return 1 if any(row["errors"] for row in summary) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+bench/datagen.py
+----------------
+Synthetic clinic data for the benchmark.
+
+Fills the current database (MySQL via db_config, or the SQLite stand-in)
+with departments, doctors, patients, user accounts and appointments.
+Appointments follow the real booking rules: one per (doctor, date, slot)
+from the doctor's schedule template, past ones mostly Completed and often
+rated, future ones Scheduled. Rows are streamed in chunks with
+executemany, so millions of appointments do not need to fit in memory.
+
+Logins created: `admin` / `admin`, and `user<patient_id>` / `pass<patient_id>`.
+"""
+
+import random
+from datetime import date, timedelta
+
+from db_config import pooled_connection
+from schedule import schedule
+from ratings import reconcile_ratings
+from analytics import rebuild_rollups
+
+
+CHUNK_SIZE = 5000
+
+FIRST_NAMES = ["James", "Mary", "Wei", "Li", "Anna", "Omar", "Sofia", "Ivan", "Yuki", "Maria",
+               "John", "Fatima", "Chen", "Lucas", "Emma", "Noah", "Aisha", "Hiro", "Elena", "Ravi"]
+LAST_NAMES = ["Smith", "Wang", "Zhang", "Garcia", "Kim", "Müller", "Rossi", "Ivanova", "Sato", "Khan",
+              "Brown", "Chen", "Lopez", "Nguyen", "Silva", "Dubois", "Novak", "Haddad", "Park", "Singh"]
+SPECIALTIES = ["General", "Pediatrics", "Cardiology", "Dermatology", "Orthopedics",
+               "Neurology", "Ophthalmology", "ENT", "Gynecology", "Psychiatry"]
+
+
+class DataGenConfig:
+    """Sizes of the generated data set."""
+
+    def __init__(self, departments=10, doctors_per_department=20, patients=50000,
+                 appointments=1000000, future_days=14, fill_ratio=0.7, rated_ratio=0.6, seed=42):
+        self.departments = departments
+        self.doctors_per_department = doctors_per_department
+        self.patients = patients
+        self.appointments = appointments
+        self.future_days = future_days
+        self.fill_ratio = fill_ratio
+        self.rated_ratio = rated_ratio
+        self.seed = seed
+
+
+def _insert_chunks(cur, con, sql, rows, chunk_size=CHUNK_SIZE):
+    chunk = []
+    total = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            cur.executemany(sql, chunk)
+            con.commit()
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        cur.executemany(sql, chunk)
+        con.commit()
+        total += len(chunk)
+    return total
+
+
+def _appointment_rows(config, rng, doctor_ids, first_patient):
+    """Yield appointment rows, walking backwards from the end of the booking window."""
+    today = date.today()
+    slots_per_day = max(len(schedule.template_for(doctor_ids[0], today)), 1) if doctor_ids else 1
+    per_day = max(int(len(doctor_ids) * slots_per_day * config.fill_ratio), 1)
+    days = max(config.appointments // per_day + 1, config.future_days + 1)
+
+    produced = 0
+    # twice the estimate, in case the roster closes some days
+    for offset in range(config.future_days, config.future_days - 2 * days - 1, -1):
+        day = today + timedelta(days=offset)
+        day_str = day.isoformat()
+        past = day < today
+        for doctor_id in doctor_ids:
+            for start in schedule.template_for(doctor_id, day_str).starts:
+                if rng.random() >= config.fill_ratio:
+                    continue
+                if past:
+                    status = "Cancelled" if rng.random() < 0.05 else "Completed"
+                    rated = status == "Completed" and rng.random() < config.rated_ratio
+                    rating = rng.randint(2, 10) / 2 if rated else None
+                else:
+                    status, rating = "Scheduled", None
+                yield (first_patient + rng.randrange(config.patients), doctor_id, day_str, start, status, rating, "")
+                produced += 1
+                if produced >= config.appointments:
+                    return
+
+
+def generate(config=None, verbose=True):
+    """Insert a full synthetic data set into the (empty) current database."""
+    config = config or DataGenConfig()
+    rng = random.Random(config.seed)
+
+    def log(message):
+        if verbose:
+            print(message, flush=True)
+
+    with pooled_connection() as con:
+        cur = con.cursor()
+
+        _insert_chunks(cur, con, "INSERT INTO department (name, min_doctors, max_doctors) VALUES (%s, %s, %s)",
+                       ((f"Department {i + 1}", 1, config.doctors_per_department * 2)
+                        for i in range(config.departments)))
+        cur.execute("SELECT department_id FROM department ORDER BY department_id")
+        department_ids = [r[0] for r in cur.fetchall()]
+        log(f"departments: {len(department_ids)}")
+
+        def doctors():
+            for dept_id in department_ids:
+                for _ in range(config.doctors_per_department):
+                    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                    yield (first, last, dept_id, f"555-{rng.randint(1000, 9999)}",
+                           f"{first}.{last}@clinic.example".lower(), rng.choice(SPECIALTIES),
+                           f"{first} {last} has {rng.randint(2, 30)} years of experience.")
+        _insert_chunks(cur, con, """
+            INSERT INTO doctor (first_name, last_name, department_id, phone, email, specialty, bio)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, doctors())
+        cur.execute("SELECT doctor_id FROM doctor ORDER BY doctor_id")
+        doctor_ids = [r[0] for r in cur.fetchall()]
+        log(f"doctors: {len(doctor_ids)}")
+
+        def patients():
+            for i in range(config.patients):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                yield (first, last, rng.choice(("Male", "Female")),
+                       f"1{rng.randint(10**9, 10**10 - 1)}", f"{first}.{last}{i}@mail.example".lower())
+        count = _insert_chunks(cur, con, """
+            INSERT INTO patient (first_name, last_name, gender, phone, email)
+            VALUES (%s, %s, %s, %s, %s)
+        """, patients())
+        log(f"patients: {count}")
+
+        cur.execute("INSERT INTO user_account (username, password, role, patient_id) VALUES (%s, %s, %s, %s)",
+                    ("admin", "admin", "admin", None))
+        cur.execute("SELECT MIN(patient_id) FROM patient")
+        first_patient = cur.fetchone()[0] or 1
+        _insert_chunks(cur, con, """
+            INSERT INTO user_account (username, password, role, patient_id) VALUES (%s, %s, 'client', %s)
+        """, ((f"user{pid}", f"pass{pid}", pid) for pid in range(first_patient, first_patient + config.patients)))
+        log("user accounts created")
+
+        count = _insert_chunks(cur, con, """
+            INSERT INTO appointment (patient_id, doctor_id, appointment_date, appointment_time,
+                                     status, doctor_rating, notes)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, _appointment_rows(config, rng, doctor_ids, first_patient))
+        log(f"appointments: {count}")
+
+        reconcile_ratings(cur)
+        con.commit()
+        log("rating aggregates reconciled")
+
+        rebuild_rollups(cur)
+        con.commit()
+        log("daily doctor rollups rebuilt")
@@ -0,0 +1,185 @@
+"""
+bench/sqlite_backend.py
+-----------------------
+SQLite stand-in for MySQL, so the benchmark runs without a server.
+
+`use_sqlite(path)` points the shared connection pool (db_config) at a
+SQLite file through a thin adapter that accepts the app's MySQL-flavoured
+SQL unchanged:
+
+    - %s placeholders are rewritten to ?
+    - SELECT ... FOR UPDATE loses its locking clause (SQLite locks the file)
+    - CONCAT() and NOW() are provided as SQL functions
+    - Decimal parameters are stored as REAL
+    - IntegrityError is exposed on the connection like pymysql does
+
+Numbers measured on SQLite are only comparable with other SQLite runs.
+"""
+
+import math
+import re
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+
+import db_config
+
+
+sqlite3.register_adapter(Decimal, float)
+
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS department (
+        department_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        min_doctors INTEGER NOT NULL DEFAULT 0,
+        max_doctors INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS doctor (
+        doctor_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        department_id INTEGER NOT NULL REFERENCES department (department_id),
+        phone TEXT,
+        email TEXT,
+        specialty TEXT,
+        bio TEXT,
+        avg_rating REAL,
+        rating_sum REAL NOT NULL DEFAULT 0,
+        rating_count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS patient (
+        patient_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        gender TEXT,
+        phone TEXT,
+        email TEXT
+    );
+    CREATE TABLE IF NOT EXISTS appointment (
+        appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id INTEGER NOT NULL REFERENCES patient (patient_id),
+        doctor_id INTEGER NOT NULL REFERENCES doctor (doctor_id),
+        appointment_date TEXT NOT NULL,
+        appointment_time TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'Scheduled',
+        doctor_rating REAL,
+        notes TEXT
+    );
+    CREATE TABLE IF NOT EXISTS user_account (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL DEFAULT 'client',
+        patient_id INTEGER REFERENCES patient (patient_id)
+    );
+
+    -- same indexes as schema.py
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_appointment_slot
+        ON appointment (doctor_id, appointment_date, appointment_time);
+    CREATE INDEX IF NOT EXISTS idx_appointment_patient_date
+        ON appointment (patient_id, appointment_date DESC, appointment_time DESC);
+    CREATE INDEX IF NOT EXISTS idx_appointment_date_time
+        ON appointment (appointment_date, appointment_time, appointment_id);
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_user_account_username ON user_account (username);
+    CREATE INDEX IF NOT EXISTS idx_doctor_department ON doctor (department_id);
+    CREATE INDEX IF NOT EXISTS idx_doctor_department_rating
+        ON doctor (department_id, avg_rating, specialty, last_name, first_name);
+    CREATE INDEX IF NOT EXISTS idx_patient_name ON patient (last_name, first_name);
+    CREATE INDEX IF NOT EXISTS idx_patient_first_name ON patient (first_name);
+    CREATE INDEX IF NOT EXISTS idx_patient_phone ON patient (phone);
+    CREATE INDEX IF NOT EXISTS idx_patient_email ON patient (email);
+
+    CREATE TABLE IF NOT EXISTS doctor_daily_stats (
+        doctor_id INTEGER NOT NULL,
+        stat_date TEXT NOT NULL,
+        department_id INTEGER NOT NULL,
+        booked INTEGER NOT NULL DEFAULT 0,
+        scheduled INTEGER NOT NULL DEFAULT 0,
+        completed INTEGER NOT NULL DEFAULT 0,
+        cancelled INTEGER NOT NULL DEFAULT 0,
+        no_show INTEGER NOT NULL DEFAULT 0,
+        rated INTEGER NOT NULL DEFAULT 0,
+        rating_sum NUMERIC NOT NULL DEFAULT 0,
+        rating_1 INTEGER NOT NULL DEFAULT 0,
+        rating_2 INTEGER NOT NULL DEFAULT 0,
+        rating_3 INTEGER NOT NULL DEFAULT 0,
+        rating_4 INTEGER NOT NULL DEFAULT 0,
+        rating_5 INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (doctor_id, stat_date)
+    );
+    CREATE INDEX IF NOT EXISTS idx_stats_date_department ON doctor_daily_stats (stat_date, department_id);
+"""
+
+_FOR_UPDATE_RE = re.compile(r"\s+FOR\s+UPDATE\b", re.I)
+_ON_DUPLICATE_RE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_VALUES_FN_RE = re.compile(r"\bVALUES\((\w+)\)", re.I)
+
+
+def translate(sql):
+    """MySQL-flavoured SQL from the app -> SQLite."""
+    sql = _FOR_UPDATE_RE.sub("", sql).replace("%s", "?")
+    parts = _ON_DUPLICATE_RE.split(sql, 1)
+    if len(parts) == 2:
+        # INSERT ... ON DUPLICATE KEY UPDATE c = c + VALUES(c) -> upsert on the primary key
+        sql = parts[0] + "ON CONFLICT DO UPDATE SET" + _VALUES_FN_RE.sub(r"excluded.\1", parts[1])
+    return sql
+
+
+class SQLiteCursor:
+    def __init__(self, connection):
+        self._cursor = connection.cursor()
+
+    def execute(self, sql, params=()):
+        return self._cursor.execute(translate(sql), tuple(params or ()))
+
+    def executemany(self, sql, seq):
+        return self._cursor.executemany(translate(sql), seq)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SQLiteConnection:
+    """Just enough of the pymysql connection API for db_config's pool."""
+
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, path):
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        self._con.create_function("CONCAT", -1, lambda *parts: "".join("" if p is None else str(p) for p in parts))
+        self._con.create_function("NOW", 0, lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self._con.create_function("FLOOR", 1, lambda x: None if x is None else math.floor(x))
+        self._con.create_function("LEAST", -1, lambda *xs: None if None in xs else min(xs))
+        self._con.create_function("GREATEST", -1, lambda *xs: None if None in xs else max(xs))
+
+    def cursor(self, *args):
+        return SQLiteCursor(self._con)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        self._con.commit()
+
+    def rollback(self):
+        self._con.rollback()
+
+    def close(self):
+        self._con.close()
+
+
+def create_schema(path):
+    con = sqlite3.connect(path)
+    try:
+        con.executescript(SQLITE_SCHEMA)
+        con.commit()
+    finally:
+        con.close()
+
+
+def use_sqlite(path, max_size=db_config.POOL_MAX_SIZE):
+    """Create the schema if needed and route db_config's pool to the SQLite file."""
+    create_schema(path)
+    db_config.configure_pool(connect=lambda: SQLiteConnection(path), max_size=max_size)
@@ -0,0 +1,229 @@
+"""
+bench/workloads.py
+------------------
+Replays the booking workload against the current database and reports
+latency percentiles and throughput per operation.
+
+Every operation calls the same service code the GUI runs on its worker
+threads (services.py), so the benchmark measures the real SQL:
+
+    login      AccountRepo.authenticate (one password hash per login)
+    browse     reference_cache doctors of a department + department_availability
+    slots      AvailabilityIndex.booked_slots (one doctor/date)
+    book       AppointmentService.book
+    rate       RatingService.history + submit
+    admin_list AppointmentService.page (first + next page)
+
+By default the shared caches are bypassed ("cold"), so each operation
+reaches the database; pass warm=True to measure the cached paths instead.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from db_config import pooled_connection
+from availability import AvailabilityIndex, availability_index
+from reference_cache import ReferenceCache, reference_cache
+from schedule import schedule
+from services import account_repo, appointment_service, doctor_repo, rating_service
+
+
+DEFAULT_MIX = {
+    "login": 10,
+    "browse": 20,
+    "slots": 35,
+    "book": 15,
+    "rate": 10,
+    "admin_list": 10,
+}
+BOOKING_WINDOW_DAYS = 4
+PERCENTILES = (50, 95, 99)
+
+
+class WorkloadContext:
+    """Id ranges of the data set plus the caches the operations use."""
+
+    def __init__(self, warm=False):
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("SELECT department_id FROM department")
+            self.department_ids = [r[0] for r in cur.fetchall()]
+            cur.execute("SELECT doctor_id FROM doctor")
+            self.doctor_ids = [r[0] for r in cur.fetchall()]
+            cur.execute("SELECT MIN(patient_id), MAX(patient_id) FROM patient")
+            self.patient_range = cur.fetchone()
+        if not self.department_ids or not self.doctor_ids or self.patient_range[0] is None:
+            raise RuntimeError("The database is empty; run `python -m bench generate` first.")
+
+        self.warm = warm
+        self.index = availability_index if warm else AvailabilityIndex(ttl=0)
+        self.reference = reference_cache if warm else ReferenceCache(ttl=0)
+        today = date.today()
+        self.dates = [(today + timedelta(days=i)).isoformat() for i in range(BOOKING_WINDOW_DAYS)]
+
+    def random_patient(self, rng):
+        low, high = self.patient_range
+        return rng.randint(low, high)
+
+
+# ---------------- operations ----------------
+
+def op_login(ctx, rng):
+    # datagen stores plaintext passwords; the first login of each account rehashes it
+    patient = ctx.random_patient(rng)
+    return account_repo.authenticate(f"user{patient}", f"pass{patient}") is not None
+
+
+def op_browse(ctx, rng):
+    dept_id = rng.choice(ctx.department_ids)
+    doctors = ctx.reference.doctors_for_department(dept_id)
+    ctx.index.department_availability(dept_id, ctx.dates, [d[0] for d in doctors] if ctx.warm else None)
+    # the cards as the booking frames request them (filter bar applied by the query)
+    doctor_repo.cards(dept_id, rng.choice((None, 3.0, 4.0)), sort=rng.choice(("rating", "name")))
+    return True
+
+
+def op_slots(ctx, rng):
+    ctx.index.booked_slots(rng.choice(ctx.doctor_ids), rng.choice(ctx.dates))
+    return True
+
+
+def op_book(ctx, rng):
+    doctor_id = rng.choice(ctx.doctor_ids)
+    day = rng.choice(ctx.dates[1:] or ctx.dates)
+    starts = schedule.template_for(doctor_id, day).starts
+    if not starts:
+        return False
+    result = appointment_service.book(ctx.random_patient(rng), doctor_id, day, rng.choice(starts), "bench")
+    return result.ok
+
+
+def op_rate(ctx, rng):
+    patient_id = ctx.random_patient(rng)
+    today = date.today().isoformat()
+    for row in rating_service.history(patient_id):
+        if row.doctor_rating is None and row.appointment_date < today:
+            return rating_service.submit(patient_id, row.appointment_id, str(rng.randint(2, 10) / 2))
+    return False
+
+
+def op_admin_list(ctx, rng):
+    page = appointment_service.page()
+    if page.full and page.rows:
+        appointment_service.page(page.rows[-1].cursor, "older")
+    return True
+
+
+OPERATIONS = {
+    "login": op_login,
+    "browse": op_browse,
+    "slots": op_slots,
+    "book": op_book,
+    "rate": op_rate,
+    "admin_list": op_admin_list,
+}
+
+
+# ---------------- runner ----------------
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class OperationStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.misses = 0   # ran fine but had nothing to do (e.g. slot taken, nothing to rate)
+
+
+def run_workload(total_ops=5000, threads=4, mix=None, warm=False, seed=1):
+    """
+    Run `total_ops` operations drawn from `mix` on `threads` threads.
+    Returns (stats by operation name, wall time in seconds).
+    """
+    mix = mix or DEFAULT_MIX
+    names = [name for name in mix if mix[name] > 0]
+    weights = [mix[name] for name in names]
+    ctx = WorkloadContext(warm=warm)
+    stats = {name: OperationStats() for name in names}
+    lock = threading.Lock()
+    remaining = [total_ops]
+
+    def worker(worker_seed):
+        rng = random.Random(worker_seed)
+        local = {name: OperationStats() for name in names}
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = OPERATIONS[name](ctx, rng)
+            except Exception:
+                local[name].errors += 1
+                continue
+            local[name].latencies.append(time.perf_counter() - started)
+            if not ok:
+                local[name].misses += 1
+        with lock:
+            for name, s in local.items():
+                stats[name].latencies.extend(s.latencies)
+                stats[name].errors += s.errors
+                stats[name].misses += s.misses
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(seed + i,), daemon=True) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return stats, time.perf_counter() - started
+
+
+def summarize(stats, wall_time):
+    """[{op, count, errors, misses, ops_per_sec, p50_ms, p95_ms, p99_ms, max_ms}, ...]"""
+    summary = []
+    for name, s in stats.items():
+        values = sorted(s.latencies)
+        row = {
+            "op": name,
+            "count": len(values),
+            "errors": s.errors,
+            "misses": s.misses,
+            "ops_per_sec": round(len(values) / wall_time, 1) if wall_time else 0.0,
+        }
+        for pct in PERCENTILES:
+            row[f"p{pct}_ms"] = round(percentile(values, pct) * 1000, 2)
+        row["max_ms"] = round(values[-1] * 1000, 2) if values else 0.0
+        summary.append(row)
+    return summary
+
+
+def format_report(summary, wall_time):
+    header = f"{'operation':<12}{'count':>8}{'err':>6}{'miss':>6}{'ops/s':>9}" + \
+             "".join(f"{'p' + str(p) + ' ms':>10}" for p in PERCENTILES) + f"{'max ms':>10}"
+    lines = [header, "-" * len(header)]
+    for row in summary:
+        lines.append(f"{row['op']:<12}{row['count']:>8}{row['errors']:>6}{row['misses']:>6}"
+                     f"{row['ops_per_sec']:>9}" +
+                     "".join(f"{row[f'p{p}_ms']:>10}" for p in PERCENTILES) + f"{row['max_ms']:>10}")
+    total = sum(row["count"] for row in summary)
+    lines.append("-" * len(header))
+    lines.append(f"{total} operations in {wall_time:.2f} s ({total / wall_time if wall_time else 0:.1f} ops/s)")
+    return "\n".join(lines)
+
+
+def dump_json(summary, wall_time, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"wall_time_s": round(wall_time, 3), "operations": summary}, f, indent=2)
@@ -0,0 +1,148 @@
+"""
+booking.py
+----------
+Race-free appointment booking.
+
+The booking frames used to INSERT straight away and show the raw driver
+exception when two clients grabbed the same slot. `book_appointment()`
+reserves (doctor_id, date, time) atomically instead:
+
+    1. if the shared availability index already knows the slot is taken,
+       the conflict is answered from memory (no DB round trip, so a burst
+       of clients clicking the same popular slot does not hammer MySQL)
+    2. otherwise the row is INSERTed; the unique slot index
+       (SLOT_UNIQUE_INDEX_DDL) makes the insert itself the reservation, so
+       there is no read-then-write window and no retry loop
+    3. a duplicate-key error is turned into a BookingResult with
+       `conflict=True` and a few alternative free slots; the index is
+       refreshed for that doctor/date so later attempts fail fast
+
+Database assumptions:
+    - UNIQUE (doctor_id, appointment_date, appointment_time) on appointment
+"""
+
+from datetime import datetime, timedelta
+
+from db_config import pooled_connection
+from availability import availability_index, format_slot_date, format_slot_time
+from schedule import schedule, parse_minutes
+from ratings import apply_rating_change
+from analytics import apply_appointment_change
+
+
+SLOT_UNIQUE_INDEX_DDL = (
+    "CREATE UNIQUE INDEX uq_appointment_slot "
+    "ON appointment (doctor_id, appointment_date, appointment_time)"
+)
+
+ALTERNATIVE_LIMIT = 5
+ALTERNATIVE_DAYS = 7
+
+
+class BookingResult:
+    """Outcome of a booking attempt."""
+
+    def __init__(self, ok, appointment_id=None, conflict=False, message="", alternatives=()):
+        self.ok = ok
+        self.appointment_id = appointment_id
+        self.conflict = conflict
+        self.message = message
+        self.alternatives = list(alternatives)   # [('YYYY-MM-DD', 'HH:MM'), ...]
+        self.rating_changed = False
+
+    def __repr__(self):
+        return (f"BookingResult(ok={self.ok}, appointment_id={self.appointment_id}, "
+                f"conflict={self.conflict}, alternatives={self.alternatives})")
+
+    def describe_alternatives(self):
+        """Human readable list of the alternatives, for message boxes."""
+        return "\n".join(f"  {d}  {t}" for d, t in self.alternatives)
+
+
+def find_alternatives(doctor_id, appointment_date, appointment_time=None,
+                      limit=ALTERNATIVE_LIMIT, days=ALTERNATIVE_DAYS):
+    """
+    Free slots of the same doctor, nearest first: later on the same day,
+    then the following days. Served from the availability index.
+    """
+    date_str = format_slot_date(appointment_date)
+    after = parse_minutes(format_slot_time(appointment_time)) if appointment_time is not None else -1
+    day = datetime.strptime(date_str, "%Y-%m-%d").date()
+    today = datetime.now().date()
+
+    found = []
+    for offset in range(days):
+        current = (day + timedelta(days=offset)).isoformat()
+        if current < today.isoformat():
+            continue
+        template = schedule.template_for(doctor_id, current)
+        if not template.slots:
+            continue
+        booked = availability_index.booked_slots(doctor_id, current)
+        for (start_min, _), start in zip(template.spans, template.starts):
+            if offset == 0 and start_min <= after:
+                continue
+            if start not in booked:
+                found.append((current, start))
+                if len(found) >= limit:
+                    return found
+    return found
+
+
+def _conflict(doctor_id, date_str, time_str, message):
+    return BookingResult(False, conflict=True, message=message,
+                         alternatives=find_alternatives(doctor_id, date_str, time_str))
+
+
+def book_appointment(patient_id, doctor_id, appointment_date, appointment_time,
+                     notes="", status=None, doctor_rating=None):
+    """
+    Reserve the slot and insert the appointment in one statement.
+
+    Returns a BookingResult; only unexpected database errors are raised.
+    Safe to call from a worker thread.
+    """
+    date_str = format_slot_date(appointment_date)
+    time_str = format_slot_time(appointment_time)
+
+    template = schedule.template_for(doctor_id, date_str)
+    if time_str not in template.start_index:
+        return BookingResult(False, message=f"{time_str} is not a bookable slot for this doctor on {date_str}.",
+                             alternatives=find_alternatives(doctor_id, date_str, None))
+
+    if availability_index.is_cached(doctor_id, date_str) and \
+            time_str in availability_index.booked_slots(doctor_id, date_str):
+        return _conflict(doctor_id, date_str, time_str, "This time slot is already booked.")
+
+    columns = ["patient_id", "doctor_id", "appointment_date", "appointment_time", "notes"]
+    values = [patient_id, doctor_id, date_str, time_str, notes]
+    if status is not None:
+        columns.append("status")
+        values.append(status)
+    if doctor_rating is not None:
+        columns.append("doctor_rating")
+        values.append(doctor_rating)
+
+    with pooled_connection() as con:
+        cur = con.cursor()
+        try:
+            cur.execute(f"""
+                INSERT INTO appointment ({", ".join(columns)})
+                VALUES ({", ".join(["%s"] * len(values))})
+            """, tuple(values))
+        except con.IntegrityError:
+            con.rollback()
+            # Someone else won the slot: pick up their booking, then answer from memory
+            availability_index.refresh(doctor_id, date_str)
+            if time_str not in availability_index.booked_slots(doctor_id, date_str):
+                raise   # not a slot clash (e.g. unknown patient/doctor)
+            return _conflict(doctor_id, date_str, time_str, "This time slot was just booked by someone else.")
+        new_appt_id = cur.lastrowid
+        rating_changed = apply_rating_change(cur, doctor_id, None, doctor_rating)
+        apply_appointment_change(cur, None, (doctor_id, date_str, status or "Scheduled", doctor_rating))
+        con.commit()
+
+    availability_index.record_booking(new_appt_id, doctor_id, date_str, time_str)
+    result = BookingResult(True, appointment_id=new_appt_id, message="Appointment booked.")
+    result.rating_changed = rating_changed
+    return result
@@ -0,0 +1,290 @@
+"""
+booking_widgets.py
+------------------
+Recycled widget grids for the booking frames (client + admin).
+
+render_doctors / render_slots used to destroy every card and slot button
+and build new Frames, Labels and Buttons on each department, rating
+filter, date or doctor change. These views keep a pool of widgets instead:
+
+    - DoctorCardGrid: one card (Frame + 5 Labels) per pool slot; show()
+      reconfigures text/colours of the first N cards and grid_remove()s
+      the rest, creating new cards only when a department is larger than
+      any shown before
+    - SlotButtonGrid: one Button per slot; show() only changes text,
+      colour, state and relief
+
+Widgets are only ever re-gridded when they change visibility, so switching
+filters or dates does not rebuild the layout (and does not flicker).
+
+Doctor cards arrive without bios (services.DoctorCard); the bio of a card
+is fetched through db_executor the first time it is hovered or selected
+and kept in the grid until clear_bios().
+"""
+
+from tkinter import *
+
+from db_executor import db_executor
+
+
+CARD_COLUMNS = 3
+SLOT_COLUMNS = 3
+CARD_BG = "white"
+CARD_SELECTED_BG = "#d6e9ff"
+
+# Doctor filter bar choices (the frames pass them on to DoctorRepo.cards)
+ALL_OPTION = "All"
+MIN_RATING_OPTIONS = [ALL_OPTION, "5.0", "4.5", "4.0", "3.5", "3.0", "2.5", "2.0", "1.5", "1.0"]
+SORT_OPTIONS = {"Rating": "rating", "Name": "name"}
+
+
+class _DoctorCard:
+    """Widgets of one pooled doctor card plus the doctor it currently shows."""
+
+    def __init__(self, parent, on_click, on_hover):
+        self.doctor_id = None
+        self.display = ""
+        self.frame = Frame(parent, bd=2, relief=RIDGE, bg=CARD_BG, padx=8, pady=6, width=220)
+        self.name_label = Label(self.frame, font=("Arial", 10, "bold"), bg=CARD_BG)
+        self.specialty_label = Label(self.frame, bg=CARD_BG, fg="black")
+        self.bio_label = Label(self.frame, bg=CARD_BG, wraplength=200, justify=LEFT)
+        self.rating_label = Label(self.frame, bg=CARD_BG, fg="blue")
+        self.badge_label = Label(self.frame, bg=CARD_BG)
+        self.labels = (self.name_label, self.specialty_label, self.bio_label,
+                       self.rating_label, self.badge_label)
+        for label in (self.name_label, self.specialty_label, self.rating_label):
+            label.pack(anchor="w")
+        self.badge_shown = False
+        self.bio_shown = False
+
+        for widget in (self.frame,) + self.labels:
+            widget.bind("<Button-1>", lambda e: on_click(self))
+        self.frame.bind("<Enter>", lambda e: on_hover(self))
+
+    def set_bio(self, bio):
+        """Show the bio under the specialty; None (not loaded yet) or "" hides it."""
+        if not bio:
+            if self.bio_shown:
+                self.bio_label.pack_forget()
+                self.bio_shown = False
+            return
+        self.bio_label.config(text=f"Bio: {bio}")
+        if not self.bio_shown:
+            self.bio_label.pack(anchor="w", after=self.specialty_label)
+            self.bio_shown = True
+
+    def set_background(self, bg):
+        if self.frame.cget("bg") == bg:
+            return
+        self.frame.config(bg=bg)
+        for label in self.labels:
+            label.config(bg=bg)
+
+    def set_badge(self, text, fg):
+        if text is None:
+            if self.badge_shown:
+                self.badge_label.pack_forget()
+                self.badge_shown = False
+            return
+        self.badge_label.config(text=text, fg=fg)
+        if not self.badge_shown:
+            self.badge_label.pack(anchor="w")
+            self.badge_shown = True
+
+
+class DoctorCardGrid:
+    """
+    Grid of doctor cards built from a reusable pool.
+
+    on_select(doctor_id, display) is called when a card is clicked.
+    load_bio(doctor_id) -> str runs on a db_executor worker the first time a
+    card is hovered or selected.
+    """
+
+    def __init__(self, parent, on_select, load_bio=None, columns=CARD_COLUMNS):
+        self.on_select = on_select
+        self.load_bio = load_bio
+        self.columns = columns
+        self.cards = []
+        self.visible = 0
+        self.selected_id = None
+        self.bios = {}          # doctor_id -> bio text, loaded on demand
+        self.bio_pending = set()
+
+        self.message = Label(parent, bg="white", fg="gray")
+        self.grid_frame = Frame(parent, bg="white")
+        for col in range(columns):
+            self.grid_frame.grid_columnconfigure(col, weight=1)
+        self.showing_grid = None
+
+    def show_message(self, text):
+        """Hide the cards and show a hint instead."""
+        self.message.config(text=text)
+        if self.showing_grid is not False:
+            self.grid_frame.pack_forget()
+            self.message.pack(anchor="w")
+            self.showing_grid = False
+
+    def show(self, doctors, selected_id=None, badge=None):
+        """
+        Show services.DoctorCard rows (bios already loaded are shown too).
+
+        selected_id: doctor whose card is highlighted.
+        badge: optional callable(doctor_id) -> (text, colour) or None.
+        """
+        self.selected_id = selected_id
+        if not doctors:
+            self.show_message("No doctors match the selected filters")
+            return
+        if self.showing_grid is not True:
+            self.message.pack_forget()
+            self.grid_frame.pack(anchor="w", fill=X)
+            self.showing_grid = True
+
+        while len(self.cards) < len(doctors):
+            self.cards.append(_DoctorCard(self.grid_frame, self._clicked, self._hovered))
+
+        for idx, doc in enumerate(doctors):
+            doctor_id = doc.doctor_id
+            card = self.cards[idx]
+            card.doctor_id = doctor_id
+            card.display = doc.display
+            rating_text = "N/A" if doc.avg_rating is None else f"{doc.avg_rating:.1f}"
+            card.name_label.config(text=card.display)
+            card.specialty_label.config(text=f"Specialty: {doc.specialty}")
+            card.set_bio(self.bios.get(doctor_id))
+            card.rating_label.config(text=f"Avg Rating: {rating_text}")
+            badge_info = badge(doctor_id) if badge else None
+            card.set_badge(*(badge_info or (None, None)))
+            card.set_background(CARD_SELECTED_BG if doctor_id == self.selected_id else CARD_BG)
+            if idx >= self.visible:
+                row, col = divmod(idx, self.columns)
+                card.frame.grid(row=row, column=col, padx=5, pady=5, sticky="nsew")
+
+        for card in self.cards[len(doctors):self.visible]:
+            card.frame.grid_remove()
+            card.doctor_id = None
+        self.visible = len(doctors)
+
+    def set_selected(self, doctor_id):
+        """Highlight the card of `doctor_id` (None clears the highlight)."""
+        self.selected_id = doctor_id
+        for card in self.cards[:self.visible]:
+            card.set_background(CARD_SELECTED_BG if card.doctor_id == doctor_id else CARD_BG)
+
+    def request_bio(self, doctor_id):
+        """Load the bio of `doctor_id` in the background unless it is known or on its way."""
+        if (self.load_bio is None or doctor_id is None
+                or doctor_id in self.bios or doctor_id in self.bio_pending):
+            return
+        self.bio_pending.add(doctor_id)
+        db_executor.submit(
+            self.grid_frame, self.load_bio, doctor_id,
+            on_done=lambda bio: self._bio_loaded(doctor_id, bio),
+            on_error=lambda exc: self.bio_pending.discard(doctor_id),
+        )
+
+    def clear_bios(self):
+        """Forget loaded bios (after doctors were edited); visible cards refetch on hover."""
+        self.bios.clear()
+        for card in self.cards[:self.visible]:
+            card.set_bio(None)
+
+    def _bio_loaded(self, doctor_id, bio):
+        self.bio_pending.discard(doctor_id)
+        self.bios[doctor_id] = bio
+        for card in self.cards[:self.visible]:
+            if card.doctor_id == doctor_id:
+                card.set_bio(bio)
+
+    def _hovered(self, card):
+        self.request_bio(card.doctor_id)
+
+    def _clicked(self, card):
+        if card.doctor_id is not None:
+            self.set_selected(card.doctor_id)
+            self.request_bio(card.doctor_id)
+            self.on_select(card.doctor_id, card.display)
+
+
+class SlotButtonGrid:
+    """
+    Grid of slot buttons built from a reusable pool.
+
+    on_pick(start) is called when a free slot is clicked.
+    """
+
+    def __init__(self, parent, on_pick, columns=SLOT_COLUMNS):
+        self.on_pick = on_pick
+        self.columns = columns
+        self.buttons = []
+        self.starts = []
+        self.visible = 0
+        self.selected_start = None
+
+        self.message = Label(parent, bg="white", fg="gray")
+        self.grid_frame = Frame(parent, bg="white", padx=2, pady=2)
+        for col in range(columns):
+            self.grid_frame.grid_columnconfigure(col, weight=1)
+        self.showing_grid = None
+
+    def show_message(self, text):
+        """Hide the buttons and show a hint instead."""
+        self.message.config(text=text)
+        if self.showing_grid is not False:
+            self.grid_frame.pack_forget()
+            self.message.pack(anchor="w")
+            self.showing_grid = False
+
+    def show(self, slots, booked, caption, selected_start=None):
+        """
+        slots: [(start, end), ...] 'HH:MM' strings in grid order.
+        booked: set of booked start times.
+        caption: second line of each button (the doctor's name).
+        """
+        if self.showing_grid is not True:
+            self.message.pack_forget()
+            self.grid_frame.pack(anchor="w")
+            self.showing_grid = True
+
+        while len(self.buttons) < len(slots):
+            idx = len(self.buttons)
+            self.buttons.append(Button(self.grid_frame, width=20, justify=CENTER,
+                                       command=lambda i=idx: self._clicked(i)))
+
+        self.starts = [start for start, _ in slots]
+        self.selected_start = selected_start
+        for idx, (start, end) in enumerate(slots):
+            btn = self.buttons[idx]
+            text = f"{start}~{end}\n{caption}"
+            if start in booked:
+                btn.config(text=text, state=DISABLED, bg="black", fg="white",
+                           disabledforeground="white", relief=RAISED, bd=2)
+            else:
+                selected = start == selected_start
+                btn.config(text=text, state=NORMAL, bg="green", fg="black",
+                           activebackground="darkgreen",
+                           relief=SUNKEN if selected else RAISED, bd=3 if selected else 2)
+            if idx >= self.visible:
+                row, col = divmod(idx, self.columns)
+                btn.grid(row=row, column=col, padx=4, pady=4, sticky="ew")
+
+        for btn in self.buttons[len(slots):self.visible]:
+            btn.grid_remove()
+        self.visible = len(slots)
+
+    def set_selected(self, start):
+        """Sink the button of `start` (None clears the selection)."""
+        previous = self.selected_start
+        self.selected_start = start
+        for idx, slot_start in enumerate(self.starts[:self.visible]):
+            if slot_start == previous and slot_start != start:
+                self.buttons[idx].config(relief=RAISED, bd=2)
+            elif slot_start == start:
+                self.buttons[idx].config(relief=SUNKEN, bd=3)
+
+    def _clicked(self, idx):
+        if idx < len(self.starts):
+            start = self.starts[idx]
+            self.set_selected(start)
+            self.on_pick(start)
@@ -0,0 +1,270 @@
+"""
+bulk_import.py
+--------------
+Streaming import of patients (and optionally their client logins) from
+CSV or JSONL files.
+
+The Register screen and the Patients tab insert one row per click, which
+does not scale to onboarding another clinic's records. This reads the file
+a chunk at a time, validates every row, and loads each chunk in one
+transaction through AccountRepo.register_batch (executemany inserts):
+
+    python bulk_import.py partner_patients.csv
+    python bulk_import.py patients.jsonl --chunk-size 5000 --errors rejected.csv
+    python bulk_import.py patients.csv --dry-run       # validate only
+
+Columns / keys (header names are case-insensitive):
+
+    first_name, last_name          required
+    gender                         Male / Female / empty
+    phone, email                   optional
+    username, password             optional; both or neither. A password
+                                   already in a credentials.py hash form is
+                                   stored as is, anything else is hashed
+
+Bad rows never stop the import. They are reported with their line number:
+    - validation errors (missing names, too long, bad gender or email, ...)
+    - usernames used twice in the file or already taken
+    - rows the database rejects: a failing chunk is rolled back and
+      retried row by row, so only the offending rows are lost
+
+Hashing passwords dominates when accounts are imported (tens of ms per
+row at the default scrypt cost); it runs on HASH_WORKERS threads, within
+the concurrency cap of credentials.password_hasher.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from credentials import password_hasher
+from services import account_repo
+
+
+CHUNK_SIZE = 1000
+HASH_WORKERS = 4
+MAX_REPORTED_ERRORS = 10000   # errors kept in memory; further ones are only counted
+
+# Column widths from schema.BASE_TABLES_DDL
+FIELD_LIMITS = {"first_name": 50, "last_name": 50, "gender": 10, "phone": 30, "email": 100,
+                "username": 50}
+GENDERS = {"male": "Male", "female": "Female", "m": "Male", "f": "Female"}
+
+
+class ImportRowError(ValueError):
+    """A row that cannot be imported; the message is shown in the report."""
+
+
+class ImportReport:
+    """Counts and per-row errors of one import run."""
+
+    def __init__(self, path, dry_run=False):
+        self.path = path
+        self.dry_run = dry_run
+        self.rows = 0
+        self.imported = 0
+        self.accounts = 0
+        self.failed = 0
+        self.errors = []     # [(line, message)], at most MAX_REPORTED_ERRORS
+        self.seconds = 0.0
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self):
+        verb = "valid" if self.dry_run else "imported"
+        rate = self.rows / self.seconds if self.seconds else 0.0
+        return (f"{os.path.basename(self.path)}: {self.rows} rows read, {self.imported} patients {verb} "
+                f"({self.accounts} with a login), {self.failed} rejected, "
+                f"{self.seconds:.1f} s ({rate:.0f} rows/s)")
+
+    def write_errors(self, path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["line", "error"])
+            writer.writerows(self.errors)
+
+
+# ---------------- reading ----------------
+
+def read_rows(path):
+    """Yield (line, dict or ImportRowError) for every record of a .csv or .jsonl file."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if ext == ".csv":
+            reader = csv.DictReader(f)
+            reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames or []]
+            for raw in reader:
+                yield reader.line_num, raw
+        elif ext in (".jsonl", ".ndjson"):
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    raw = json.loads(line)
+                except ValueError as e:
+                    yield line_no, ImportRowError(f"invalid JSON: {e}")
+                    continue
+                if not isinstance(raw, dict):
+                    yield line_no, ImportRowError("expected a JSON object")
+                    continue
+                yield line_no, {str(k).strip().lower(): v for k, v in raw.items()}
+        else:
+            raise ValueError(f"unsupported file type {ext!r} (use .csv or .jsonl)")
+
+
+def _text(raw, field):
+    value = raw.get(field)
+    value = "" if value is None else str(value).strip()
+    if len(value) > FIELD_LIMITS.get(field, len(value)):
+        raise ImportRowError(f"{field} is longer than {FIELD_LIMITS[field]} characters")
+    return value
+
+
+def parse_row(raw):
+    """
+    Validate one record. Returns ((first, last, gender, phone, email),
+    (username, password) or None); raises ImportRowError.
+    """
+    first, last = _text(raw, "first_name"), _text(raw, "last_name")
+    if not first or not last:
+        raise ImportRowError("first_name and last_name are required")
+    gender = _text(raw, "gender")
+    if gender:
+        if gender.lower() not in GENDERS:
+            raise ImportRowError(f"unknown gender {gender!r}")
+        gender = GENDERS[gender.lower()]
+    phone, email = _text(raw, "phone"), _text(raw, "email")
+    if email and ("@" not in email or email.startswith("@") or email.endswith("@")):
+        raise ImportRowError(f"invalid email {email!r}")
+
+    username = _text(raw, "username")
+    password = raw.get("password")
+    password = "" if password is None else str(password)
+    if bool(username) != bool(password):
+        raise ImportRowError("username and password must be given together")
+    account = (username, password) if username else None
+    return (first, last, gender or None, phone or None, email or None), account
+
+
+# ---------------- loading ----------------
+
+class PatientImporter:
+    """Validates and loads one file chunk by chunk (see the module docstring)."""
+
+    def __init__(self, chunk_size=CHUNK_SIZE, dry_run=False, hash_workers=HASH_WORKERS):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.hash_workers = hash_workers
+
+    def run(self, path, on_progress=None):
+        """Import `path`; on_progress(report) is called after every chunk."""
+        report = ImportReport(path, self.dry_run)
+        started = time.perf_counter()
+        seen_usernames = set()
+        chunk = []   # [(line, patient, account)]
+        with ThreadPoolExecutor(max_workers=self.hash_workers, thread_name_prefix="import-hash") as pool:
+            for line, raw in read_rows(path):
+                report.rows += 1
+                try:
+                    if isinstance(raw, ImportRowError):
+                        raise raw
+                    patient, account = parse_row(raw)
+                    if account is not None:
+                        if account[0] in seen_usernames:
+                            raise ImportRowError(f"username {account[0]!r} appears more than once in the file")
+                        seen_usernames.add(account[0])
+                except ImportRowError as e:
+                    report.add_error(line, str(e))
+                    continue
+                chunk.append((line, patient, account))
+                if len(chunk) >= self.chunk_size:
+                    self._load_chunk(chunk, report, pool)
+                    chunk = []
+                    if on_progress:
+                        on_progress(report)
+            if chunk:
+                self._load_chunk(chunk, report, pool)
+                if on_progress:
+                    on_progress(report)
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def _load_chunk(self, chunk, report, pool):
+        taken = account_repo.existing_usernames(account[0] for _, _, account in chunk if account)
+        rows = []
+        for line, patient, account in chunk:
+            if account is not None and account[0] in taken:
+                report.add_error(line, f"username {account[0]!r} is already taken")
+            else:
+                rows.append((line, patient, account))
+        if self.dry_run:
+            self._count(rows, report)
+            return
+
+        # Hash the chunk's passwords in parallel (hashlib releases the GIL)
+        hashed = list(pool.map(self._stored_password, [account[1] if account else None
+                                                      for _, _, account in rows]))
+        records = [(patient, (account[0], stored) if account else None)
+                   for (_, patient, account), stored in zip(rows, hashed)]
+        try:
+            account_repo.register_batch(records)
+        except Exception:
+            # Find the offending rows: retry one row per transaction
+            for (line, _, _), record in zip(rows, records):
+                try:
+                    account_repo.register_batch([record])
+                except Exception as e:
+                    report.add_error(line, f"database rejected the row: {e}")
+                else:
+                    self._count([(line, record[0], record[1])], report)
+            return
+        self._count(rows, report)
+
+    @staticmethod
+    def _stored_password(password):
+        if password is None:
+            return None
+        return password if password_hasher.is_hash(password) else password_hasher.hash(password)
+
+    @staticmethod
+    def _count(rows, report):
+        report.imported += len(rows)
+        report.accounts += sum(1 for _, _, account in rows if account is not None)
+
+
+def import_file(path, chunk_size=CHUNK_SIZE, dry_run=False, on_progress=None):
+    """Shortcut for PatientImporter(...).run(path)."""
+    return PatientImporter(chunk_size, dry_run).run(path, on_progress)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python bulk_import.py", description="Import patients from CSV / JSONL.")
+    parser.add_argument("path", help=".csv or .jsonl file")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    parser.add_argument("--errors", metavar="PATH", help="write the rejected rows (line, error) as CSV")
+    args = parser.parse_args(argv)
+
+    def progress(report):
+        print(f"  {report.rows} rows read, {report.imported} imported, {report.failed} rejected", flush=True)
+
+    report = import_file(args.path, args.chunk_size, args.dry_run, progress)
+    print(report.summary())
+    for line, message in report.errors[:20]:
+        print(f"  line {line}: {message}")
+    if report.failed > 20:
+        print(f"  ... {report.failed - 20} more")
+    if args.errors:
+        report.write_errors(args.errors)
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
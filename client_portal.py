@@ -12,23 +12,38 @@ ClientPortal now receives `user_info` from MainApp, which includes:
 We pass the patient_id to AppointmentClientFrame so that:
     - Patient is fixed (no drop-down)
     - Client can only see and manage their own appointments.
+
+Tabs are built lazily on first selection (the Rate Doctor tab's history
+query only runs once the tab is opened); department data is warmed up in
+the background after the first tab is shown.
+
+Opened through session.session_manager, "Return to Login" only hides the
+window (`on_return`), and the visit history is shared with the session's
+other windows (`context`).
 """
 
 from tkinter import *
 from tkinter import ttk
+
+from db_executor import db_executor
+from reference_cache import reference_cache
 from frames_appointment_client import AppointmentClientFrame
 from frames_rating_client import RatingClientFrame
 
 
+WARM_UP_DELAY_MS = 300
+
+
 class ClientPortal:
     """
     Client portal main GUI: simple appointment booking interface.
     It is bound to a single patient (the logged-in client).
     """
 
-    def __init__(self, root, user_info):
+    def __init__(self, root, user_info, warm_up=True, context=None, on_return=None):
         self.root = root
         self.user_info = user_info
+        self.context = context
         self.patient_id = user_info.get("patient_id")
 
         self.root.title(f"Clinic Client Portal - {user_info.get('username', '')}")
@@ -45,7 +60,7 @@ class ClientPortal:
         title.pack(fill=X)
         # Return to Login Button
         Button(root, text="Return to Login", bg="#FF6666", fg="white",
-               command=root.destroy).pack(side=TOP, anchor="ne", padx=10, pady=5)
+               command=on_return or root.destroy).pack(side=TOP, anchor="ne", padx=10, pady=5)
 
         main_frame = Frame(root, bg="white")
         main_frame.pack(fill=BOTH, expand=True)
@@ -55,23 +70,40 @@ class ClientPortal:
         notebook.pack(fill=BOTH, expand=True)
         self.notebook = notebook
 
-        appointment_tab = Frame(notebook, bg="white")
-        rate_tab = Frame(notebook, bg="white")
+        self.appointment_tab = Frame(notebook, bg="white")
+        self.rate_tab = Frame(notebook, bg="white")
 
-        notebook.add(appointment_tab, text="Appointments")
-        notebook.add(rate_tab, text="Rate Doctor")
+        notebook.add(self.appointment_tab, text="Appointments")
+        notebook.add(self.rate_tab, text="Rate Doctor")
 
-        # Tab content
-        AppointmentClientFrame(appointment_tab, patient_id=self.patient_id)
-        # Keep reference so we can trigger a refresh when the tab is shown
-        self.rate_frame = RatingClientFrame(rate_tab, patient_id=self.patient_id)
+        # Tab content is built on first selection
+        self.appointment_frame = None
+        self.rate_frame = None
 
-        # Auto-refresh the rating tab when the user switches to it
+        # Build tabs lazily and auto-refresh the rating tab when the user switches to it
         notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.show_tab(notebook.select())
+
+        if warm_up:
+            root.after(WARM_UP_DELAY_MS, self.warm_up)
 
     def on_tab_changed(self, event):
-        """Refresh the Rate Doctor tab when it becomes active."""
-        selected = event.widget.select()
-        tab_text = event.widget.tab(selected, "text")
-        if tab_text == "Rate Doctor":
-            self.rate_frame.force_refresh()
+        """Build a tab the first time it is shown; refresh the Rate Doctor tab when it becomes active."""
+        self.show_tab(event.widget.select())
+
+    def show_tab(self, selected):
+        tab_text = self.notebook.tab(selected, "text")
+        if tab_text == "Appointments":
+            if self.appointment_frame is None:
+                self.appointment_frame = AppointmentClientFrame(self.appointment_tab, patient_id=self.patient_id)
+        elif tab_text == "Rate Doctor":
+            if self.rate_frame is None:
+                # A new frame loads its history on construction
+                self.rate_frame = RatingClientFrame(self.rate_tab, patient_id=self.patient_id,
+                                                    context=self.context)
+            else:
+                self.rate_frame.force_refresh()
+
+    def warm_up(self):
+        """Load department/doctor reference data in the background."""
+        db_executor.submit(self.notebook, reference_cache.warm, ("department", "doctor"), on_error=None)
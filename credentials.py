@@ -0,0 +1,250 @@
+"""
+credentials.py
+--------------
+Salted password hashing for user_account.password.
+
+Passwords used to be stored and compared in plaintext. They are now kept as
+self-describing strings, so the work factor can change without a flag day:
+
+    scrypt$16384$8$1$<salt b64>$<hash b64>
+    pbkdf2_sha256$600000$<salt b64>$<hash b64>
+
+    password_hasher.hash(password)              -> stored string
+    password_hasher.verify(password, stored)    -> bool (constant time)
+    password_hasher.needs_rehash(stored)        -> True for plaintext or old parameters
+
+AccountRepo.authenticate() verifies on the caller's thread (the login screen
+runs it through db_executor) and rewrites the stored hash when it was made
+with other parameters, so legacy plaintext rows are upgraded on their next
+login.
+
+The cost is chosen with environment variables and should be measured on the
+server with `python credentials.py bench` before it is changed:
+
+    CLINIC_PASSWORD_SCHEME       scrypt (default) or pbkdf2_sha256
+    CLINIC_SCRYPT_N              CPU/memory cost, a power of two (16384 = 16 MiB per hash)
+    CLINIC_SCRYPT_R / _P         block size / parallelism (8 / 1)
+    CLINIC_PBKDF2_ITERATIONS     iterations of PBKDF2-HMAC-SHA256 (600000)
+    CLINIC_MAX_CONCURRENT_HASHES hashes computed at the same time (default 2)
+
+The concurrency cap keeps a burst of logins (shift change) from running
+dozens of 16 MiB scrypt computations at once: extra logins queue for a
+slot, so each one costs a predictable amount of CPU and memory. The time
+spent waiting and hashing is kept in `password_hasher.snapshot()`.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import threading
+import time
+
+
+SCRYPT = "scrypt"
+PBKDF2 = "pbkdf2_sha256"
+
+DEFAULT_SCHEME = SCRYPT if hasattr(hashlib, "scrypt") else PBKDF2
+DEFAULT_SCRYPT_N = 2 ** 14
+DEFAULT_SCRYPT_R = 8
+DEFAULT_SCRYPT_P = 1
+DEFAULT_PBKDF2_ITERATIONS = 600_000
+DEFAULT_MAX_CONCURRENT = 2
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+# Width of user_account.password needed for the longest stored form (schema migration 7)
+PASSWORD_COLUMN_DDL = "ALTER TABLE user_account MODIFY password VARCHAR(255) NOT NULL"
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords with one configured scheme and work factor."""
+
+    def __init__(self, scheme=DEFAULT_SCHEME, scrypt_n=DEFAULT_SCRYPT_N, scrypt_r=DEFAULT_SCRYPT_R,
+                 scrypt_p=DEFAULT_SCRYPT_P, pbkdf2_iterations=DEFAULT_PBKDF2_ITERATIONS,
+                 max_concurrent=DEFAULT_MAX_CONCURRENT):
+        if scheme not in (SCRYPT, PBKDF2):
+            raise ValueError(f"unknown password scheme: {scheme}")
+        if scrypt_n < 2 or scrypt_n & (scrypt_n - 1):
+            raise ValueError("scrypt N must be a power of two")
+        self.scheme = scheme
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._stats_lock = threading.Lock()
+        self._hashes = 0
+        self._hash_time = 0.0
+        self._max_hash_time = 0.0
+        self._wait_time = 0.0
+        self._dummy = None   # hash compared against when the user does not exist
+
+    @classmethod
+    def from_environment(cls):
+        env = os.environ.get
+        return cls(
+            scheme=env("CLINIC_PASSWORD_SCHEME", DEFAULT_SCHEME),
+            scrypt_n=int(env("CLINIC_SCRYPT_N", DEFAULT_SCRYPT_N)),
+            scrypt_r=int(env("CLINIC_SCRYPT_R", DEFAULT_SCRYPT_R)),
+            scrypt_p=int(env("CLINIC_SCRYPT_P", DEFAULT_SCRYPT_P)),
+            pbkdf2_iterations=int(env("CLINIC_PBKDF2_ITERATIONS", DEFAULT_PBKDF2_ITERATIONS)),
+            max_concurrent=int(env("CLINIC_MAX_CONCURRENT_HASHES", DEFAULT_MAX_CONCURRENT)),
+        )
+
+    # ---------- public API ----------
+    def hash(self, password):
+        """Stored form of `password` with a fresh salt and the configured parameters."""
+        salt = os.urandom(SALT_BYTES)
+        if self.scheme == SCRYPT:
+            params = (self.scrypt_n, self.scrypt_r, self.scrypt_p)
+            digest = self._derive(SCRYPT, params, password, salt)
+            return f"{SCRYPT}${params[0]}${params[1]}${params[2]}${_b64(salt)}${_b64(digest)}"
+        digest = self._derive(PBKDF2, (self.pbkdf2_iterations,), password, salt)
+        return f"{PBKDF2}${self.pbkdf2_iterations}${_b64(salt)}${_b64(digest)}"
+
+    def verify(self, password, stored):
+        """
+        True if `password` matches `stored`. A stored value that is not a
+        hash is a legacy plaintext password. stored=None (unknown user) still
+        costs one hash, so the answer time does not reveal valid usernames.
+        """
+        if stored is None:
+            if self._dummy is None:
+                self._dummy = self.hash("")
+            # Same work as a real check, but never a match. (Comparing against a
+            # hash of "" is not enough: HMAC zero-pads keys, so "" == "\0".)
+            scheme, params, salt, expected = self._parse(self._dummy)
+            self._derive(scheme, params, password, salt, len(expected))
+            return False
+        parsed = self._parse(stored)
+        if parsed is None:
+            return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+        scheme, params, salt, expected = parsed
+        return hmac.compare_digest(self._derive(scheme, params, password, salt, len(expected)), expected)
+
+    def needs_rehash(self, stored):
+        """True when `stored` is plaintext or was hashed with other parameters than the configured ones."""
+        parsed = self._parse(stored)
+        if parsed is None:
+            return True
+        scheme, params, _, _ = parsed
+        if scheme != self.scheme:
+            return True
+        if scheme == SCRYPT:
+            return params != (self.scrypt_n, self.scrypt_r, self.scrypt_p)
+        return params != (self.pbkdf2_iterations,)
+
+    def is_hash(self, stored):
+        """True if `stored` is already in one of the hashed forms (not plaintext)."""
+        return self._parse(stored) is not None
+
+    def snapshot(self):
+        """Hash count and timings (ms) since start, for reports and /metrics."""
+        with self._stats_lock:
+            count = self._hashes
+            return {
+                "scheme": self.scheme,
+                "parameters": self.describe(),
+                "hashes": count,
+                "avg_hash_ms": round(self._hash_time * 1000 / count, 3) if count else 0.0,
+                "max_hash_ms": round(self._max_hash_time * 1000, 3),
+                "avg_wait_ms": round(self._wait_time * 1000 / count, 3) if count else 0.0,
+            }
+
+    def describe(self):
+        if self.scheme == SCRYPT:
+            return f"N={self.scrypt_n} r={self.scrypt_r} p={self.scrypt_p}"
+        return f"iterations={self.pbkdf2_iterations}"
+
+    # ---------- internals ----------
+    @staticmethod
+    def _parse(stored):
+        """(scheme, params, salt, digest) or None for plaintext / unknown formats."""
+        parts = stored.split("$")
+        try:
+            if parts[0] == SCRYPT and len(parts) == 6:
+                return SCRYPT, tuple(int(x) for x in parts[1:4]), _unb64(parts[4]), _unb64(parts[5])
+            if parts[0] == PBKDF2 and len(parts) == 4:
+                return PBKDF2, (int(parts[1]),), _unb64(parts[2]), _unb64(parts[3])
+        except ValueError:
+            return None
+        return None
+
+    def _derive(self, scheme, params, password, salt, length=HASH_BYTES):
+        queued = time.perf_counter()
+        with self._slots:
+            started = time.perf_counter()
+            if scheme == SCRYPT:
+                n, r, p = params
+                digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                                        maxmem=max(64 * 2 ** 20, 256 * n * r * p), dklen=length)
+            else:
+                digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, params[0], length)
+            finished = time.perf_counter()
+        with self._stats_lock:
+            self._hashes += 1
+            self._hash_time += finished - started
+            self._wait_time += started - queued
+            if finished - started > self._max_hash_time:
+                self._max_hash_time = finished - started
+        return digest
+
+
+def benchmark(hasher, rounds=5):
+    """Median and max milliseconds per hash for `hasher`'s parameters."""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        hasher.hash("benchmark-password")
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {"parameters": f"{hasher.scheme} {hasher.describe()}",
+            "median_ms": round(timings[len(timings) // 2], 2), "max_ms": round(timings[-1], 2)}
+
+
+def main(argv):
+    """
+    python credentials.py bench [rounds]   # time the configured and neighbouring work factors
+    python credentials.py hash PASSWORD    # print the stored form (e.g. to seed an admin account)
+    """
+    command = argv[1] if len(argv) > 1 else "bench"
+    if command == "hash" and len(argv) == 3:
+        print(password_hasher.hash(argv[2]))
+        return 0
+    if command != "bench":
+        print(main.__doc__)
+        return 2
+
+    rounds = int(argv[2]) if len(argv) > 2 else 5
+    h = password_hasher
+    if h.scheme == SCRYPT:
+        candidates = [PasswordHasher(SCRYPT, scrypt_n=n, scrypt_r=h.scrypt_r, scrypt_p=h.scrypt_p)
+                      for n in (h.scrypt_n // 2, h.scrypt_n, h.scrypt_n * 2) if n >= 2]
+    else:
+        candidates = [PasswordHasher(PBKDF2, pbkdf2_iterations=i)
+                      for i in (h.pbkdf2_iterations // 2, h.pbkdf2_iterations, h.pbkdf2_iterations * 2)]
+    print(f"{'parameters':<36}{'median ms':>11}{'max ms':>9}")
+    for candidate in candidates:
+        result = benchmark(candidate, rounds)
+        marker = "  <- configured" if candidate.describe() == h.describe() else ""
+        print(f"{result['parameters']:<36}{result['median_ms']:>11.1f}{result['max_ms']:>9.1f}{marker}")
+    return 0
+
+
+# Process-wide hasher configured from the environment.
+password_hasher = PasswordHasher.from_environment()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,28 +1,334 @@
-
 """
 db_config.py
 ------------
 Central place to configure and create MySQL connections.
 
 All other modules import `get_connection()` from here.
+
+Connections are handed out from a bounded pool instead of opening a new
+TCP + auth handshake on every call:
+    - `get_connection()` checks out a pooled connection; calling `.close()`
+      on it returns it to the pool (existing frame code keeps working).
+    - `pooled_connection()` is the context-manager form and is preferred
+      for new code:
+
+          with pooled_connection() as con:
+              cur = con.cursor()
+              ...
+
+The pool health-checks connections on checkout, evicts connections that
+sat idle too long and recycles connections older than `max_lifetime`.
+
+Cursors of pooled connections are wrapped in query_metrics.TracingCursor
+and checkouts are timed, so every statement shows up in
+`query_metrics.query_metrics` with its call site (see query_metrics.py).
 """
 
+import threading
+import time
+from contextlib import contextmanager
+
 import pymysql
 
+from query_metrics import query_metrics, TracingCursor, call_site
 
-def get_connection():
+
+DB_SETTINGS = {
+    "host": "localhost",
+    "user": "root",          # TODO: change to your MySQL user
+    "password": "1308245",   # TODO: change to your MySQL password
+    "database": "clinic_app",
+    "charset": "utf8mb4",
+}
+
+# Pool tuning (seconds / connection counts)
+POOL_MAX_SIZE = 8
+POOL_CHECKOUT_TIMEOUT = 10.0
+POOL_IDLE_TIMEOUT = 300.0
+POOL_MAX_LIFETIME = 3600.0
+POOL_PING_AFTER = 5.0   # skip the health-check ping for connections used very recently
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+def open_raw_connection():
     """
-    Create and return a new MySQL connection.
+    Create and return a new (unpooled) MySQL connection.
 
     IMPORTANT:
-        - Change `user`, `password`, and (if needed) `host` to match your local setup.
+        - Change `user`, `password`, and (if needed) `host` in DB_SETTINGS
+          to match your local setup.
         - The database name should match your schema (here we assume `clinic_app`).
     """
-    return pymysql.connect(
-        host="localhost",
-        user="root",          # TODO: change to your MySQL user
-        password="1308245",   # TODO: change to your MySQL password
-        database="clinic_app",
-        charset="utf8mb4",
-        cursorclass=pymysql.cursors.Cursor,
-    )
+    return pymysql.connect(cursorclass=pymysql.cursors.Cursor, **DB_SETTINGS)
+
+
+class _PoolEntry:
+    """A raw connection plus the timestamps the pool needs to manage it."""
+
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledConnection:
+    """
+    Thin proxy around a checked-out connection.
+
+    Behaves like the underlying DB-API connection, except that `close()`
+    hands the connection back to the pool instead of closing the socket.
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    @property
+    def closed(self):
+        return self._entry is None
+
+    def close(self):
+        if self._entry is None:
+            return
+        entry, self._entry = self._entry, None
+        self._pool._release(entry)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self.__getattr__("cursor")(*args, **kwargs)
+        if query_metrics.enabled:
+            return TracingCursor(cursor, query_metrics)
+        return cursor
+
+    def __getattr__(self, name):
+        entry = self.__dict__.get("_entry")
+        if entry is None:
+            raise pymysql.err.InterfaceError(0, "Connection already returned to the pool")
+        return getattr(entry.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # Safety net for code paths that forget to close(): return the
+        # connection rather than leaking a pool slot.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of database connections.
+
+    - At most `max_size` connections exist at once (idle + checked out).
+    - Checkout blocks up to `timeout` seconds when the pool is exhausted.
+    - Idle connections older than `idle_timeout` are closed on checkout.
+    - Connections older than `max_lifetime` are recycled on return.
+    - A connection that was idle for more than `ping_after` seconds is
+      pinged before being handed out; dead ones are replaced transparently.
+    """
+
+    def __init__(self, connect=open_raw_connection, max_size=POOL_MAX_SIZE,
+                 timeout=POOL_CHECKOUT_TIMEOUT, idle_timeout=POOL_IDLE_TIMEOUT,
+                 max_lifetime=POOL_MAX_LIFETIME, ping_after=POOL_PING_AFTER):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+
+        self._idle = []          # stack of _PoolEntry, most recently used last
+        self._size = 0           # idle + checked out
+        self._closed = False     # set by close_all(); returned connections are closed
+        self._cond = threading.Condition(threading.Lock())
+
+    # ---------- checkout / return ----------
+    def acquire(self):
+        """Check out a connection, waiting if the pool is exhausted."""
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._evict_idle_locked()
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"No database connection available after {self.timeout:.1f}s "
+                        f"(pool size {self.max_size})."
+                    )
+                self._cond.wait(remaining)
+
+        if entry is None:
+            entry = self._open_entry()
+        elif not self._is_healthy(entry):
+            self._close_raw(entry)
+            entry = self._open_entry()
+        if query_metrics.enabled:
+            query_metrics.record_checkout(call_site(2), time.perf_counter() - started)
+        return PooledConnection(self, entry)
+
+    @contextmanager
+    def connection(self):
+        """Context manager: check out a connection and always return it."""
+        con = self.acquire()
+        try:
+            yield con
+        finally:
+            con.close()
+
+    def _release(self, entry):
+        """Return a connection; roll back any uncommitted work first."""
+        if self._closed:
+            self._discard(entry)
+            return
+        try:
+            entry.raw.rollback()
+        except Exception:
+            self._discard(entry)
+            return
+
+        now = time.monotonic()
+        if now - entry.created_at > self.max_lifetime:
+            self._discard(entry)
+            return
+
+        entry.last_used = now
+        with self._cond:
+            if not self._closed:
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+        self._discard(entry)   # close_all() ran while it was being returned
+
+    # ---------- maintenance ----------
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on return)."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_raw(entry)
+
+    def stats(self):
+        """Return a small dict describing the pool state."""
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            }
+
+    def _open_entry(self):
+        try:
+            return _PoolEntry(self._connect())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _is_healthy(self, entry):
+        now = time.monotonic()
+        if now - entry.created_at > self.max_lifetime:
+            return False
+        if now - entry.last_used < self.ping_after:
+            return True
+        try:
+            entry.raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle_locked(self):
+        """Drop idle connections unused for longer than idle_timeout (lock held)."""
+        if not self._idle:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        keep = [e for e in self._idle if e.last_used >= cutoff]
+        stale = [e for e in self._idle if e.last_used < cutoff]
+        if stale:
+            self._idle = keep
+            self._size -= len(stale)
+            for entry in stale:
+                self._close_raw(entry)
+
+    def _discard(self, entry):
+        self._close_raw(entry)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close_raw(entry):
+        try:
+            entry.raw.close()
+        except Exception:
+            pass
+
+
+_pool = ConnectionPool()
+
+
+def get_pool():
+    """Return the process-wide connection pool."""
+    return _pool
+
+
+def configure_pool(**kwargs):
+    """
+    Replace the process-wide pool (e.g. different size or connect factory).
+
+    Accepts the same keyword arguments as ConnectionPool.
+    """
+    global _pool
+    old = _pool
+    _pool = ConnectionPool(**kwargs)
+    old.close_all()
+    return _pool
+
+
+def get_connection():
+    """
+    Check out a connection from the pool.
+
+    Callers must call `.close()` when done; that returns the connection to
+    the pool (uncommitted work is rolled back).
+    """
+    return _pool.acquire()
+
+
+def pooled_connection():
+    """Context manager form of get_connection()."""
+    return _pool.connection()
+
+
+def streaming_cursor(con):
+    """
+    Unbuffered cursor (pymysql SSCursor): rows are read from the server as
+    they are fetched instead of all at once by execute(). Fetch with
+    fetchmany() and close the cursor before running another statement on
+    the same connection.
+    """
+    return con.cursor(pymysql.cursors.SSCursor)
@@ -0,0 +1,133 @@
+"""
+db_executor.py
+--------------
+Runs database work off the Tk event-loop thread.
+
+Frames submit a plain function (no Tk calls inside!) together with
+`on_done` / `on_error` callbacks:
+
+    db_executor.submit(widget, fetch_rows, dept_id,
+                       on_done=self.show_rows, key=(id(self), "rows"))
+
+The function runs on a small worker thread pool. Its result is handed back
+to the Tk thread by a short `after()` polling loop, where the callback
+runs, so callbacks may touch widgets freely.
+
+Requests that share a `key` supersede each other: submitting a new request
+(or calling `cancel(key)`) drops the result of any older request with the
+same key, e.g. a slot fetch for a doctor the user already clicked away from.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox, TclError
+
+from ui_profiler import ui_profiler
+
+
+DB_WORKERS = 4
+POLL_INTERVAL_MS = 20
+
+
+def show_db_error(exc):
+    """Default error callback: show the exception in a dialog."""
+    messagebox.showerror("Error", f"Database operation failed.\n\n{exc}")
+
+
+class DbExecutor:
+    """Thread pool for DB calls with result delivery on the Tk thread."""
+
+    def __init__(self, max_workers=DB_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._results = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._generation = {}   # key -> generation of the latest request
+        self._pending = 0       # submitted but not yet delivered
+        self._poll_widget = None
+
+    def submit(self, widget, fn, *args, on_done=None, on_error=show_db_error, key=None):
+        """
+        Run fn(*args) on a worker thread.
+
+        widget:   any widget of the requesting frame; the callbacks are skipped
+                  if it has been destroyed by the time the result arrives.
+        on_done:  called with fn's return value on the Tk thread.
+        on_error: called with the exception on the Tk thread.
+        key:      optional hashable; a newer request with the same key
+                  supersedes this one.
+        Must be called from the Tk thread.
+        """
+        with self._lock:
+            generation = None
+            if key is not None:
+                generation = self._generation.get(key, 0) + 1
+                self._generation[key] = generation
+            self._pending += 1
+
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(
+            lambda f: self._results.put((widget, key, generation, f, on_done, on_error))
+        )
+        self._ensure_polling(widget)
+        return future
+
+    def cancel(self, key):
+        """Drop the result of any in-flight request with this key."""
+        with self._lock:
+            if key in self._generation:
+                self._generation[key] += 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- delivery on the Tk thread ----------
+    def _ensure_polling(self, widget):
+        if self._poll_widget is not None:
+            return
+        self._poll_widget = widget._root()
+        self._poll_widget.after(POLL_INTERVAL_MS, self._drain)
+
+    def _drain(self):
+        while True:
+            try:
+                widget, key, generation, future, on_done, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            with self._lock:
+                self._pending -= 1
+                superseded = key is not None and self._generation.get(key) != generation
+
+            if superseded or future.cancelled() or not self._alive(widget):
+                continue
+
+            exc = future.exception()
+            try:
+                # timed as their own handlers when the UI profiler is on
+                if exc is not None:
+                    if on_error:
+                        ui_profiler.call(on_error, exc)
+                elif on_done:
+                    ui_profiler.call(on_done, future.result())
+            except Exception as callback_exc:
+                show_db_error(callback_exc)
+
+        with self._lock:
+            idle = self._pending == 0
+        root = self._poll_widget
+        if idle or not self._alive(root):
+            self._poll_widget = None
+        else:
+            root.after(POLL_INTERVAL_MS, self._drain)
+
+    @staticmethod
+    def _alive(widget):
+        try:
+            return bool(widget.winfo_exists())
+        except TclError:
+            return False
+
+
+# Process-wide executor shared by every frame.
+db_executor = DbExecutor()
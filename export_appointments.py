@@ -0,0 +1,159 @@
+"""
+export_appointments.py
+----------------------
+Streams appointments to a CSV or Parquet file in constant memory.
+
+Rows come from AppointmentService.export_batches, which reads through an
+unbuffered server-side cursor (pymysql SSCursor) a batch at a time. Each
+batch is written out before the next one is fetched, so a monthly report
+over millions of appointments never sits in a Python list.
+
+    python export_appointments.py january.csv --from 2025-01-01 --to 2025-01-31
+    python export_appointments.py cardiology.csv.gz --department 3
+    python export_appointments.py dr7.parquet --doctor 7
+
+Formats (picked from the file name, or --format):
+    .csv / .csv.gz   one row per appointment, header first
+    .parquet         columnar, one row group per ROW_GROUP_SIZE rows,
+                     zstd-compressed; needs the optional pyarrow package
+
+Dates are written as YYYY-MM-DD, times as HH:MM, ratings as decimals.
+"""
+
+import argparse
+import csv
+import gzip
+import sys
+import time
+
+from availability import format_slot_date, format_slot_time
+from services import appointment_service, EXPORT_COLUMNS
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:   # Parquet export is optional
+    pyarrow = None
+
+
+ROW_GROUP_SIZE = 50000
+
+CSV = "csv"
+PARQUET = "parquet"
+
+
+def format_for(path):
+    return PARQUET if path.lower().endswith(".parquet") else CSV
+
+
+def _normalize(row):
+    """Driver values -> plain str / int / float (the same for CSV and Parquet)."""
+    (appointment_id, appt_date, appt_time, status, rating, notes, patient_id, patient_first,
+     patient_last, doctor_id, doctor_first, doctor_last, department_id, department_name) = row
+    return (appointment_id, format_slot_date(appt_date), format_slot_time(appt_time), status,
+            None if rating is None else float(rating), notes, patient_id, patient_first, patient_last,
+            doctor_id, doctor_first, doctor_last, department_id, department_name)
+
+
+class CsvSink:
+    def __init__(self, path):
+        opener = gzip.open if path.lower().endswith(".gz") else open
+        self._file = opener(path, "wt", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """Buffers up to ROW_GROUP_SIZE rows column-wise, then writes them as one row group."""
+
+    def __init__(self, path, row_group_size=ROW_GROUP_SIZE):
+        if pyarrow is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow); use a .csv file instead.")
+        pa = pyarrow
+        self.schema = pa.schema([
+            ("appointment_id", pa.int64()), ("appointment_date", pa.string()),
+            ("appointment_time", pa.string()), ("status", pa.string()),
+            ("doctor_rating", pa.float64()), ("notes", pa.string()),
+            ("patient_id", pa.int64()), ("patient_first_name", pa.string()),
+            ("patient_last_name", pa.string()), ("doctor_id", pa.int64()),
+            ("doctor_first_name", pa.string()), ("doctor_last_name", pa.string()),
+            ("department_id", pa.int64()), ("department_name", pa.string()),
+        ])
+        self.row_group_size = row_group_size
+        self._writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+        self._columns = [[] for _ in EXPORT_COLUMNS]
+        self._buffered = 0
+
+    def write(self, rows):
+        for row in rows:
+            for column, value in zip(self._columns, row):
+                column.append(value)
+        self._buffered += len(rows)
+        if self._buffered >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        table = pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(self._columns, self.schema)],
+            schema=self.schema,
+        )
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self._columns = [[] for _ in EXPORT_COLUMNS]
+        self._buffered = 0
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def export(path, date_from=None, date_to=None, department_id=None, doctor_id=None,
+           fmt=None, on_progress=None):
+    """
+    Write the matching appointments to `path`; returns the number of rows.
+    on_progress(rows_written) is called after every fetched batch.
+    """
+    sink = ParquetSink(path) if (fmt or format_for(path)) == PARQUET else CsvSink(path)
+    written = 0
+    try:
+        for batch in appointment_service.export_batches(date_from, date_to, department_id, doctor_id):
+            sink.write([_normalize(row) for row in batch])
+            written += len(batch)
+            if on_progress:
+                on_progress(written)
+    finally:
+        sink.close()
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python export_appointments.py",
+                                     description="Export appointments to CSV or Parquet.")
+    parser.add_argument("path", help="output file (.csv, .csv.gz or .parquet)")
+    parser.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD", help="first appointment date")
+    parser.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD", help="last appointment date (inclusive)")
+    parser.add_argument("--department", type=int, help="department_id")
+    parser.add_argument("--doctor", type=int, help="doctor_id")
+    parser.add_argument("--format", choices=(CSV, PARQUET), help="default: from the file name")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        rows = export(args.path, args.date_from, args.date_to, args.department, args.doctor, args.format)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 2
+    seconds = time.perf_counter() - started
+    print(f"{rows} appointments written to {args.path} in {seconds:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+frames_analytics.py
+-------------------
+Contains the AnalyticsFrame class: utilization, no-show and rating figures
+per department and per doctor for a date range.
+
+The figures come from the doctor_daily_stats rollups (analytics.py), so a
+report over months of appointments reads one small row per doctor and day
+instead of scanning the appointment table.
+"""
+
+from datetime import date, timedelta
+from tkinter import *
+from tkinter import ttk, messagebox
+
+import analytics
+from availability import format_slot_date
+from db_executor import db_executor
+from reference_cache import reference_cache
+from booking_widgets import ALL_OPTION
+
+
+DEFAULT_RANGE_DAYS = 30
+
+
+def _percent(value):
+    return "-" if value is None else f"{value * 100:.1f}%"
+
+
+def _rating(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+class AnalyticsFrame:
+    """
+    Admin tab: pick a date range (and optionally a department), then
+    Refresh to load the department summary and the per-doctor detail.
+    """
+
+    def __init__(self, parent):
+        today = date.today()
+        self.from_var = StringVar(value=format_slot_date(today - timedelta(days=DEFAULT_RANGE_DAYS)))
+        self.to_var = StringVar(value=format_slot_date(today))
+        self.dept_var = StringVar(value=ALL_OPTION)
+        self.dept_ids = {}   # combo text -> department_id
+
+        form = Frame(parent, bg="white")
+        form.pack(side=TOP, fill=X)
+
+        Label(form, text="From (YYYY-MM-DD)", bg="white").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        Entry(form, textvariable=self.from_var, width=12).grid(row=0, column=1, padx=5, pady=5)
+        Label(form, text="To", bg="white").grid(row=0, column=2, padx=5, pady=5, sticky="w")
+        Entry(form, textvariable=self.to_var, width=12).grid(row=0, column=3, padx=5, pady=5)
+        Label(form, text="Department", bg="white").grid(row=0, column=4, padx=5, pady=5, sticky="w")
+        self.dept_combo = ttk.Combobox(form, textvariable=self.dept_var, state="readonly", width=24,
+                                       values=[ALL_OPTION])
+        self.dept_combo.grid(row=0, column=5, padx=5, pady=5)
+        self.dept_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+        self.refresh_button = Button(form, text="Refresh", width=10, command=self.refresh)
+        self.refresh_button.grid(row=0, column=6, padx=10, pady=5)
+        self.summary_var = StringVar()
+        Label(form, textvariable=self.summary_var, bg="white", fg="grey").grid(
+            row=0, column=7, padx=5, pady=5, sticky="w")
+
+        self.dept_tree = self._make_tree(parent, "Departments", 6, [
+            ("department", "Department", 200), ("doctors", "Doctors", 70), ("capacity", "Slots", 80),
+            ("booked", "Booked", 80), ("utilization", "Utilization", 90), ("completed", "Completed", 90),
+            ("cancelled", "Cancelled", 90), ("no_show", "No-show", 80), ("no_show_rate", "No-show rate", 100),
+            ("avg_rating", "Avg rating", 90),
+        ])
+        self.doctor_tree = self._make_tree(parent, "Doctors", 12, [
+            ("doctor", "Doctor", 200), ("capacity", "Slots", 80), ("booked", "Booked", 80),
+            ("utilization", "Utilization", 90), ("scheduled", "Scheduled", 90), ("completed", "Completed", 90),
+            ("cancelled", "Cancelled", 90), ("no_show", "No-show", 80), ("no_show_rate", "No-show rate", 100),
+            ("avg_rating", "Avg rating", 90), ("ratings", "Ratings 1/2/3/4/5", 140),
+        ])
+
+        db_executor.submit(self.dept_combo, self.query_departments, on_done=self.show_departments)
+        self.refresh()
+
+    @staticmethod
+    def _make_tree(parent, title, height, columns):
+        box = LabelFrame(parent, text=title, bg="white")
+        box.pack(fill=BOTH, expand=True, padx=5, pady=5)
+        tree = ttk.Treeview(box, columns=[c[0] for c in columns], show="headings", height=height)
+        for name, heading, width in columns:
+            tree.heading(name, text=heading)
+            tree.column(name, width=width, anchor="w" if name in ("department", "doctor") else "e")
+        vsb = Scrollbar(box, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side=LEFT, fill=BOTH, expand=True)
+        vsb.pack(side=RIGHT, fill=Y)
+        return tree
+
+    # ---------- departments ----------
+    def query_departments(self):
+        """Worker thread: (department_id, name) rows from the shared reference cache."""
+        return [(d[0], d[1]) for d in reference_cache.departments()]
+
+    def show_departments(self, rows):
+        self.dept_ids = {f"{dept_id} - {name}": dept_id for dept_id, name in rows}
+        self.dept_combo["values"] = [ALL_OPTION] + list(self.dept_ids)
+
+    # ---------- reports ----------
+    def refresh(self):
+        """Validate the range, then load both reports in the background."""
+        try:
+            date_from = date.fromisoformat(self.from_var.get().strip())
+            date_to = date.fromisoformat(self.to_var.get().strip())
+        except ValueError:
+            messagebox.showwarning("Warning", "Dates must be in YYYY-MM-DD format.")
+            return
+        if date_from > date_to:
+            messagebox.showwarning("Warning", "'From' must not be after 'To'.")
+            return
+
+        dept_id = self.dept_ids.get(self.dept_var.get())
+        self.refresh_button.config(state=DISABLED)
+        self.summary_var.set("Loading...")
+        db_executor.submit(self.dept_tree, self.query_reports, date_from, date_to, dept_id,
+                           on_done=self.show_reports, on_error=self.show_load_error, key=(id(self), "report"))
+
+    def query_reports(self, date_from, date_to, dept_id):
+        """Worker thread: (department rows, doctor rows) for the range."""
+        doctors = analytics.doctor_report(date_from, date_to, dept_id)
+        return analytics.summarize_departments(doctors, dept_id), doctors
+
+    def show_reports(self, result):
+        departments, doctors = result
+        self.dept_tree.delete(*self.dept_tree.get_children())
+        for d in departments:
+            self.dept_tree.insert("", END, values=(
+                f"{d.department_id} - {d.department_name}", d.doctors, d.capacity, d.booked,
+                _percent(d.utilization), d.completed, d.cancelled, d.no_show,
+                _percent(d.no_show_rate), _rating(d.avg_rating),
+            ))
+        self.doctor_tree.delete(*self.doctor_tree.get_children())
+        for d in doctors:
+            self.doctor_tree.insert("", END, values=(
+                d.doctor_display, d.capacity, d.booked, _percent(d.utilization), d.scheduled,
+                d.completed, d.cancelled, d.no_show, _percent(d.no_show_rate), _rating(d.avg_rating),
+                "/".join(str(n) for n in d.ratings),
+            ))
+        booked = sum(d.booked for d in departments)
+        capacity = sum(d.capacity for d in departments)
+        self.summary_var.set(f"{booked} booked of {capacity} slots")
+        self.refresh_button.config(state=NORMAL)
+
+    def show_load_error(self, error):
+        self.summary_var.set("")
+        self.refresh_button.config(state=NORMAL)
+        messagebox.showerror("Error", f"Failed to load the analytics.\n\n{error}")
@@ -3,23 +3,44 @@ frames_appointment_admin.py
 ---------------------------
 Admin appointment management
 - Department -> Doctor cascading filter (card grid)
-- Full CRUD with slot grid + min rating filter
+- Full CRUD with slot grid + min rating / specialty filter and sort order
+  (applied by the doctor query; bios are loaded when a card is hovered)
+- Patient is chosen with a type-ahead search (see patient_picker)
+- Appointment list is paged with keyset pagination on
+  (appointment_date, appointment_time, appointment_id) as the user scrolls;
+  at most MAX_WINDOW_PAGES pages are kept in memory at once.
+- "Export..." asks for a date range (plus department / selected doctor) and
+  streams those appointments to CSV / Parquet (export_appointments)
 """
 
 from tkinter import *
-from tkinter import ttk, messagebox
-from datetime import date, datetime, timedelta
-from db_config import get_connection
-
+from tkinter import ttk, messagebox, filedialog
+from datetime import date, timedelta
+from availability import availability_index
+from table_sync import TreeviewSync
+from db_executor import db_executor
+from reference_cache import reference_cache
+from booking_widgets import DoctorCardGrid, SlotButtonGrid, ALL_OPTION, MIN_RATING_OPTIONS, SORT_OPTIONS
+from schedule import schedule
+from patient_picker import PatientPicker
+from services import appointment_service, doctor_repo
+from export_appointments import export as export_appointments
+
+
+# Appointment list paging
+PAGE_SIZE = 200
+MAX_WINDOW_PAGES = 5
+SCROLL_LOAD_MARGIN = 0.1   # fetch the next page when within 10% of either end
 
 class AppointmentAdminFrame:
     """Admin-facing appointment CRUD with doctor card grid + slot grid."""
 
-    def __init__(self, parent):
+    def __init__(self, parent, context=None):
+        self.context = context   # session.SessionContext shared with the user's other windows
+
         # Form variables
         self.appointment_id_var = StringVar()
         self.department_var = StringVar()
-        self.patient_var = StringVar()
         self.date_var = StringVar()
         self.time_var = StringVar()
         self.status_var = StringVar(value="Scheduled")
@@ -27,18 +48,22 @@ class AppointmentAdminFrame:
         self.notes_var = StringVar()
 
         # Doctor grid state
-        self.min_rating_var = StringVar(value="All")
+        self.min_rating_var = StringVar(value=ALL_OPTION)
+        self.specialty_var = StringVar(value=ALL_OPTION)
+        self.sort_var = StringVar(value="Rating")
         self.selected_doctor_id = None
         self.selected_doctor_display = ""
-        self.selected_doctor_card = None
-        self.selected_slot_btn = None
         self.current_row_doctor_id = None
-        self.doctor_grid_frame = None
+
+        # Appointment list window (keyset paging)
+        self.window_rows = []      # table rows currently loaded, newest first
+        self.has_older = False     # more rows exist below the window
+        self.has_newer = False     # rows were dropped above the window
+        self.paging_busy = False
 
         # Cached lists
         self.departments = []
         self.doctors = []
-        self.patients = []
 
         # ------------------- Layout: header + form -------------------
         header = Frame(parent, bg="white")
@@ -58,8 +83,8 @@ class AppointmentAdminFrame:
         Entry(form, textvariable=self.appointment_id_var, width=12, state="readonly").grid(row=0, column=1, padx=4, pady=2, sticky="w")
 
         Label(form, text="Patient", bg="white").grid(row=0, column=2, sticky="w")
-        self.patient_combo = ttk.Combobox(form, textvariable=self.patient_var, state="readonly", width=28)
-        self.patient_combo.grid(row=0, column=3, padx=4, pady=2, sticky="w")
+        self.patient_picker = PatientPicker(form, width=28)
+        self.patient_picker.grid(row=0, column=3, padx=4, pady=2, sticky="w")
 
         Label(form, text="Department", bg="white").grid(row=0, column=4, sticky="w")
         self.dept_combo = ttk.Combobox(form, textvariable=self.department_var, state="readonly", width=25)
@@ -78,7 +103,7 @@ class AppointmentAdminFrame:
 
         Label(form, text="Status", bg="white").grid(row=1, column=4, sticky="w")
         self.status_combo = ttk.Combobox(form, textvariable=self.status_var, state="readonly", width=18,
-                                         values=["Scheduled", "Completed", "Cancelled"])
+                                         values=["Scheduled", "Completed", "Cancelled", "No-show"])
         self.status_combo.grid(row=1, column=5, padx=4, pady=2, sticky="w")
 
         # Row 2
@@ -98,14 +123,38 @@ class AppointmentAdminFrame:
         Button(btn_frame, text="Update", width=12, command=self.update_appointment).pack(pady=2)
         Button(btn_frame, text="Delete", width=12, command=self.delete_selected).pack(pady=2)
         Button(btn_frame, text="Clear", width=12, command=self.clear_form).pack(pady=2)
+        self.export_button = Button(btn_frame, text="Export...", width=12, command=self.export_range)
+        self.export_button.pack(pady=2)
 
         # ----------- doctor grid + rating filter -----------
         self.doctor_container = Frame(parent, bg="white")
         self.doctor_container.pack(fill=X, padx=10, pady=(5, 0), anchor="w")
 
+        # Filter bar (built once; the card grid below is recycled)
+        filter_frame = Frame(self.doctor_container, bg="white")
+        filter_frame.pack(anchor="w", pady=(0, 5), fill=X)
+        Label(filter_frame, text="Min Rating", bg="white").pack(side=LEFT)
+        rating_combo = ttk.Combobox(filter_frame, textvariable=self.min_rating_var,
+                                    state="readonly", width=8,
+                                    values=MIN_RATING_OPTIONS)
+        rating_combo.pack(side=LEFT, padx=5)
+        rating_combo.bind("<<ComboboxSelected>>", self.on_doctor_filter_change)
+        Label(filter_frame, text="Specialty", bg="white").pack(side=LEFT, padx=(10, 0))
+        self.specialty_combo = ttk.Combobox(filter_frame, textvariable=self.specialty_var,
+                                            state="readonly", width=18, values=[ALL_OPTION])
+        self.specialty_combo.pack(side=LEFT, padx=5)
+        self.specialty_combo.bind("<<ComboboxSelected>>", self.on_doctor_filter_change)
+        Label(filter_frame, text="Sort by", bg="white").pack(side=LEFT, padx=(10, 0))
+        sort_combo = ttk.Combobox(filter_frame, textvariable=self.sort_var,
+                                  state="readonly", width=8, values=list(SORT_OPTIONS))
+        sort_combo.pack(side=LEFT, padx=5)
+        sort_combo.bind("<<ComboboxSelected>>", self.on_doctor_filter_change)
+        self.card_grid = DoctorCardGrid(self.doctor_container, self.select_doctor, load_bio=doctor_repo.bio)
+
         # ----------- slot container under doctor grid -----------
         self.slot_container = Frame(parent, bg="white")
         self.slot_container.pack(fill=X, padx=10, pady=(5, 0), anchor="w")
+        self.slot_grid = SlotButtonGrid(self.slot_container, self.set_time)
 
         # ----------- appointment table -----------
         table = Frame(parent, bg="white")
@@ -130,20 +179,26 @@ class AppointmentAdminFrame:
             self.tree.heading(col, text=text)
             self.tree.column(col, width=width, anchor="w")
 
+        self.table_sync = TreeviewSync(self.tree)
+
         vsb = Scrollbar(table, orient=VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=vsb.set)
+        self.vsb = vsb
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
         self.tree.pack(side=LEFT, fill=BOTH, expand=True)
         vsb.pack(side=RIGHT, fill=Y)
 
         self.tree.bind("<<TreeviewSelect>>", self.on_select_row)
 
+        # Keep combos and cards in step with edits made in other tabs
+        reference_cache.subscribe("department", self.load_departments, widget=self.dept_combo)
+        reference_cache.subscribe("doctor", self.on_doctors_changed, widget=self.doctor_container)
+
         # Initial loads
         self.init_dates()
         self.load_departments()
-        self.load_patients()
         self.render_doctors()
         self.render_slots()
-        self.refresh_table()
+        self.refresh_table(shared=True)
 
     # ---------------- helpers ----------------
 
@@ -152,34 +207,71 @@ class AppointmentAdminFrame:
         dates = [(today + timedelta(days=i)).isoformat() for i in range(4)]
         self.date_combo["values"] = dates
         self.date_var.set(dates[0])
+        # One bulk query fills the slot index for the whole booking window
+        db_executor.submit(self.slot_container, availability_index.load_dates, dates,
+                           on_done=lambda _: self.render_doctors())
 
     def load_departments(self):
-        con = get_connection()
-        cur = con.cursor()
-        cur.execute("SELECT department_id, name FROM department")
-        self.departments = cur.fetchall()
-        con.close()
+        db_executor.submit(self.dept_combo, self.query_departments, on_done=self.show_departments)
+
+    def query_departments(self):
+        """Worker thread: (department_id, name) rows from the shared reference cache."""
+        return [(d[0], d[1]) for d in reference_cache.departments()]
+
+    def show_departments(self, rows):
+        self.departments = rows
         self.dept_combo["values"] = [f"{d[0]} - {d[1]}" for d in self.departments]
 
-    def load_patients(self):
-        con = get_connection()
-        cur = con.cursor()
-        cur.execute("SELECT patient_id, first_name, last_name FROM patient")
-        self.patients = cur.fetchall()
-        con.close()
-        self.patient_combo["values"] = [f"{p[0]} - {p[1]} {p[2]}" for p in self.patients]
-
-    def load_doctors_for_department(self, dept_id):
-        """Load doctors for a department including specialty, bio, and rating."""
-        con = get_connection()
-        cur = con.cursor()
-        cur.execute("""
-            SELECT doctor_id, first_name, last_name, specialty, bio, avg_rating
-            FROM doctor
-            WHERE department_id=%s
-        """, (dept_id,))
-        self.doctors = cur.fetchall()
-        con.close()
+    def load_doctors_for_department(self, dept_id, then=None, new_department=True):
+        """
+        Load the doctor cards matching the filter bar in the background;
+        `then()` runs once self.doctors is set. For a new department the
+        specialty choices and booked slots are (re)loaded as well.
+        """
+        rating = self.min_rating_var.get()
+        min_rating = None if rating == ALL_OPTION else float(rating)
+        specialty = None if self.specialty_var.get() == ALL_OPTION else self.specialty_var.get()
+        sort = SORT_OPTIONS[self.sort_var.get()]
+
+        def done(result):
+            self.doctors, specialties = result
+            if specialties is not None:
+                self.specialty_combo["values"] = [ALL_OPTION] + specialties
+            if then:
+                then()
+        db_executor.submit(self.doctor_container, self.query_doctors_for_department,
+                           dept_id, self.availability_dates() if new_department else None,
+                           min_rating, specialty, sort,
+                           on_done=done, key=(id(self), "doctors"))
+
+    def query_doctors_for_department(self, dept_id, dates, min_rating, specialty, sort):
+        """
+        Worker thread: (cards, specialties). The cards are filtered and sorted
+        by the doctor query. With `dates` (a new department), the department's
+        specialties are read from the reference cache and the booked slots of
+        every offered date are loaded in one query; otherwise specialties is None.
+        """
+        specialties = None
+        if dates is not None:
+            doctors = doctor_repo.for_department(dept_id, dates)
+            specialties = sorted({d.specialty for d in doctors if d.specialty})
+        return doctor_repo.cards(dept_id, min_rating, specialty, sort), specialties
+
+    def availability_dates(self):
+        """Dates offered in the date combo plus the currently chosen date."""
+        dates = list(self.date_combo["values"])
+        if self.date_var.get() and self.date_var.get() not in dates:
+            dates.append(self.date_var.get())
+        return dates
+
+    def on_doctors_changed(self):
+        """Reference cache hook: reload the shown department's doctor cards (e.g. new ratings)."""
+        try:
+            dept_id = int(self.department_var.get().split("-")[0].strip())
+        except Exception:
+            return
+        self.card_grid.clear_bios()
+        self.load_doctors_for_department(dept_id, then=self.render_doctors)
 
     def on_department_change(self, _):
         """Handle department selection: load doctors, reset selections, refresh UI."""
@@ -187,272 +279,248 @@ class AppointmentAdminFrame:
             dept_id = int(self.department_var.get().split("-")[0].strip())
         except Exception:
             return
-        self.load_doctors_for_department(dept_id)
-        self.min_rating_var.set("All")
+        self.reset_doctor_filters()
         self.clear_doctor_selection()
-        self.render_doctors()
-        self.render_slots()
 
-    def on_min_rating_change(self, _):
-        """Update doctor grid based on rating filter and clear selections if needed."""
-        filtered_ids = {doc[0] for doc in self.get_filtered_doctors()}
-        if self.selected_doctor_id and self.selected_doctor_id not in filtered_ids:
-            self.clear_doctor_selection()
-        self.render_doctors()
-        self.render_slots()
+        def show():
+            self.render_doctors()
+            self.render_slots()
+        self.load_doctors_for_department(dept_id, then=show)
+
+    def on_doctor_filter_change(self, _):
+        """Re-query the doctor cards for the filter bar and clear the selection if it dropped out."""
+        try:
+            dept_id = int(self.department_var.get().split("-")[0].strip())
+        except Exception:
+            return
+
+        def show():
+            if self.selected_doctor_id and self.selected_doctor_id not in {d.doctor_id for d in self.doctors}:
+                self.clear_doctor_selection()
+            self.render_doctors()
+            self.render_slots()
+        self.load_doctors_for_department(dept_id, then=show, new_department=False)
+
+    def reset_doctor_filters(self):
+        self.min_rating_var.set(ALL_OPTION)
+        self.specialty_var.set(ALL_OPTION)
 
     def on_date_change(self, _):
         self.clear_time_selection()
+        self.render_doctors()
         self.render_slots()
 
     def clear_doctor_selection(self):
         """Reset doctor selection and slot highlight."""
         self.selected_doctor_id = None
         self.selected_doctor_display = ""
-        if self.selected_doctor_card:
-            self.reset_card_style(self.selected_doctor_card)
-        self.selected_doctor_card = None
+        self.card_grid.set_selected(None)
         self.clear_time_selection()
 
     def clear_time_selection(self):
         """Reset chosen time and selected slot highlight."""
         self.time_var.set("")
-        if self.selected_slot_btn:
-            self.selected_slot_btn.config(relief=RAISED, bd=2)
-            self.selected_slot_btn = None
+        self.slot_grid.set_selected(None)
 
     def render_doctors(self):
-        """Render doctor cards with rating filter and selection highlight."""
-        for child in self.doctor_container.winfo_children():
-            child.destroy()
-        self.selected_doctor_card = None
-        self.doctor_grid_frame = None
-
-        # Rating filter bar
-        filter_frame = Frame(self.doctor_container, bg="white")
-        filter_frame.pack(anchor="w", pady=(0, 5), fill=X)
-        Label(filter_frame, text="Min Rating", bg="white").pack(side=LEFT)
-        rating_combo = ttk.Combobox(filter_frame, textvariable=self.min_rating_var,
-                                    state="readonly", width=8,
-                                    values=["All", "5.0", "4.5", "4.0", "3.5", "3.0", "2.5", "2.0", "1.5", "1.0"])
-        rating_combo.pack(side=LEFT, padx=5)
-        rating_combo.bind("<<ComboboxSelected>>", self.on_min_rating_change)
-
+        """Show the doctor cards for the current department, filter and date (widgets are reused)."""
         if not self.department_var.get():
-            Label(self.doctor_container, text="Select department to view doctors",
-                  bg="white", fg="gray").pack(anchor="w")
+            self.card_grid.show_message("Select department to view doctors")
             return
+        self.card_grid.show(self.doctors, self.selected_doctor_id, self.free_slot_badge)
 
-        filtered = self.get_filtered_doctors()
-        if not filtered:
-            Label(self.doctor_container, text="No doctors match the selected filters",
-                  bg="white", fg="gray").pack(anchor="w")
-            return
+    def free_slot_badge(self, doctor_id):
+        """(text, colour) for a card's free-slot badge, or None when not cached yet."""
+        free = availability_index.free_slot_count(doctor_id, self.date_var.get(), load=False)
+        if free is None:
+            return None
+        return f"{free} free slots on {self.date_var.get()}", "green" if free else "gray"
 
-        grid = Frame(self.doctor_container, bg="white")
-        grid.pack(anchor="w", fill=X)
-        self.doctor_grid_frame = grid
-
-        for idx, doc in enumerate(filtered):
-            doctor_id, first, last, specialty, bio, avg_rating = doc
-            display = f"{doctor_id} - {first} {last}"
-            rating_text = "N/A" if avg_rating is None else f"{avg_rating:.1f}"
-
-            card = Frame(grid, bd=2, relief=RIDGE, bg="white", padx=8, pady=6, width=220)
-            Label(card, text=display, font=("Arial", 10, "bold"), bg="white").pack(anchor="w")
-            Label(card, text=f"Specialty: {specialty}", bg="white", fg="black").pack(anchor="w")
-            Label(card, text=f"Bio: {bio}", bg="white", wraplength=200, justify=LEFT).pack(anchor="w")
-            Label(card, text=f"Avg Rating: {rating_text}", bg="white", fg="blue").pack(anchor="w")
-
-            card.bind("<Button-1>", lambda e, d_id=doctor_id, disp=display, c=card: self.select_doctor(d_id, disp, c))
-            for child in card.winfo_children():
-                child.bind("<Button-1>", lambda e, d_id=doctor_id, disp=display, c=card: self.select_doctor(d_id, disp, c))
-
-            row, col = divmod(idx, 3)
-            card.grid(row=row, column=col, padx=5, pady=5, sticky="nsew")
-
-            # Re-apply highlight if this doctor is currently selected
-            if self.selected_doctor_id == doctor_id:
-                self.highlight_selected_card(card)
-
-        for col in range(3):
-            grid.grid_columnconfigure(col, weight=1)
-
-    def get_filtered_doctors(self):
-        """Return doctors filtered by the current minimum rating."""
-        value = self.min_rating_var.get()
-        min_rating = 0 if value == "All" else float(value)
-        filtered = []
-        for doc in self.doctors:
-            avg_rating = doc[5] or 0
-            if avg_rating >= min_rating:
-                filtered.append(doc)
-        return filtered
-
-    def select_doctor(self, doctor_id, display, card_widget):
+    def select_doctor(self, doctor_id, display):
         """Handle doctor card click: mark selection, clear time, refresh slots."""
         self.selected_doctor_id = doctor_id
         self.selected_doctor_display = display
-        self.highlight_selected_card(card_widget)
         self.clear_time_selection()
         self.render_slots()
 
-    def highlight_selected_card(self, card_widget):
-        """Highlight chosen doctor card and reset the previous one."""
-        if self.selected_doctor_card and self.selected_doctor_card != card_widget:
-            self.reset_card_style(self.selected_doctor_card)
-        self.selected_doctor_card = card_widget
-        card_widget.config(bg="#d6e9ff")
-        for child in card_widget.winfo_children():
-            child.config(bg="#d6e9ff")
-
-    def reset_card_style(self, card_widget):
-        """Return doctor card to default style."""
-        card_widget.config(bg="white")
-        for child in card_widget.winfo_children():
-            child.config(bg="white")
-
     def render_slots(self):
         """Render inline slot grid or hint based on doctor/date selection."""
-        for child in self.slot_container.winfo_children():
-            child.destroy()
-        self.selected_slot_btn = None
+        slots_key = (id(self), "slots")
 
         if not self.selected_doctor_id or not self.date_var.get():
-            Label(self.slot_container, text="Select doctor and date to view available slots",
-                  bg="white", fg="gray").pack(anchor="w")
+            db_executor.cancel(slots_key)
+            self.slot_grid.show_message("Select doctor and date to view available slots")
             return
 
         exclude_appt_id = None
         if self.appointment_id_var.get().isdigit():
             exclude_appt_id = int(self.appointment_id_var.get())
-        booked_slots = self.fetch_booked_slots(self.selected_doctor_id, self.date_var.get(), exclude_appt_id)
-
-        slot_frame = Frame(self.slot_container, bg="white", padx=2, pady=2)
-        slot_frame.pack(anchor="w")
-
-        slots = self.build_slots()
-        for idx, (start, end) in enumerate(slots):
-            text = f"{start}~{end}\n{self.selected_doctor_display}"
-            is_booked = start in booked_slots
-            btn = Button(slot_frame, text=text, width=20, justify=CENTER)
-            if is_booked:
-                btn.config(state=DISABLED, bg="black", fg="white", disabledforeground="white")
-            else:
-                btn.config(bg="green", activebackground="darkgreen",
-                           command=lambda s=start, b=btn: self.set_time_and_highlight(s, b))
-                if self.time_var.get() == start:
-                    self._highlight_selected_button(btn)
-            row, col = divmod(idx, 3)
-            btn.grid(row=row, column=col, padx=4, pady=4, sticky="ew")
-
-        for col in range(3):
-            slot_frame.grid_columnconfigure(col, weight=1)
-
-    def build_slots(self):
-        """Return list of (start, end) strings for allowed 30-minute slots."""
-        fmt = "%H:%M"
-        slots = []
-        start = datetime.strptime("09:00", fmt)
-        noon = datetime.strptime("12:00", fmt)
-        while start < noon:
-            end = start + timedelta(minutes=30)
-            slots.append((start.strftime(fmt), end.strftime(fmt)))
-            start = end
-
-        start = datetime.strptime("13:00", fmt)
-        close = datetime.strptime("16:00", fmt)
-        while start < close:
-            end = start + timedelta(minutes=30)
-            slots.append((start.strftime(fmt), end.strftime(fmt)))
-            start = end
-        return slots
+        args = (self.selected_doctor_id, self.date_var.get(), exclude_appt_id)
+
+        if availability_index.is_cached(self.selected_doctor_id, self.date_var.get()):
+            db_executor.cancel(slots_key)
+            self.draw_slots(self.fetch_booked_slots(*args))
+            return
+
+        self.slot_grid.show_message("Loading available slots...")
+        db_executor.submit(self.slot_container, self.fetch_booked_slots, *args,
+                           on_done=self.draw_slots, key=slots_key)
+
+    def draw_slots(self, booked_slots):
+        """Show the slot buttons for the selected doctor given the booked start times."""
+        template = schedule.template_for(self.selected_doctor_id, self.date_var.get())
+        if not template.slots:
+            self.slot_grid.show_message("No clinic hours for this doctor on the selected date")
+            return
+        self.slot_grid.show(template.slots, booked_slots, self.selected_doctor_display,
+                            self.time_var.get() or None)
 
     def fetch_booked_slots(self, doctor_id, appointment_date, exclude_appt_id=None):
-        """Fetch booked start times (HH:MM) for the doctor on the given date."""
-        con = get_connection()
-        cur = con.cursor()
-        query = """
-            SELECT appointment_time
-            FROM appointment
-            WHERE doctor_id=%s AND appointment_date=%s
-        """
-        params = [doctor_id, appointment_date]
-        if exclude_appt_id:
-            query += " AND appointment_id<>%s"
-            params.append(exclude_appt_id)
-        cur.execute(query, tuple(params))
-        rows = cur.fetchall()
-        con.close()
-
-        booked = set()
-        for (time_value,) in rows:
-            if hasattr(time_value, "strftime"):
-                formatted = time_value.strftime("%H:%M")
-            else:
-                formatted = str(time_value)[:5]
-            booked.add(formatted)
-        return booked
-
-    def _highlight_selected_button(self, btn):
-        if self.selected_slot_btn and self.selected_slot_btn != btn:
-            self.selected_slot_btn.config(relief=RAISED, bd=2)
-        self.selected_slot_btn = btn
-        self.selected_slot_btn.config(relief=SUNKEN, bd=3)
-
-    def set_time_and_highlight(self, start_time, btn):
+        """Return booked start times (HH:MM) for the doctor on the given date (from the shared index)."""
+        return appointment_service.booked_slots(doctor_id, appointment_date, exclude_appt_id)
+
+    def set_time(self, start_time):
+        """Slot button callback (the grid already sank the clicked button)."""
         self.time_var.set(start_time)
-        self._highlight_selected_button(btn)
 
     # ---------------- CRUD ----------------
 
-    def refresh_table(self):
-        """Load all appointments into the table."""
+    def fetch_appointment_page(self, key=None, direction="older", inclusive=False, limit=PAGE_SIZE):
+        """
+        Worker thread: one page of appointments relative to a keyset cursor
+        (see AppointmentService.page). Returns table rows (newest first) and
+        whether the page was full.
+        """
+        page = appointment_service.page(key, direction, inclusive, limit)
+        table_rows = []
+        for r in page.rows:
+            rating_text = "" if r.doctor_rating is None else f"{r.doctor_rating:.1f}"
+            # columns 0-8 are shown; doctor/department ids, the raw keyset and patient id ride along hidden
+            table_rows.append((r.appointment_id, r.patient_display, r.department_display, r.doctor_display,
+                               r.appointment_date, r.appointment_time, r.status, rating_text, r.notes,
+                               r.doctor_id, r.department_id, r.cursor, r.patient_id))
+        return table_rows, page.full
+
+    def show_window(self):
+        """Push the current window of rows into the Treeview."""
+        self.table_sync.sync(self.window_rows, columns=9,
+                             tags=lambda r: (f"doctor:{r[9]}", f"dept:{r[10]}", f"patient:{r[12]}"))
+
+    def fetch_first_page(self, shared):
+        """
+        Worker thread: the newest page. With a session context, shared=True
+        reuses a page another window of the session loaded moments ago.
+        """
+        if self.context is None:
+            return self.fetch_appointment_page()
+        if shared:
+            return self.context.fetch("appointment_first_page", self.fetch_appointment_page)
+        result = self.fetch_appointment_page()
+        self.context.put("appointment_first_page", result)
+        return result
+
+    def refresh_table(self, shared=False):
+        """Reload the currently loaded window of appointments (newest page on first load)."""
+        # Supersedes any scroll page in flight (same key), whose callback will then
+        # never run; the reload owns the flag until it lands and blocks new scroll pages
+        self.paging_busy = True
+        if not self.window_rows:
+            def first(result):
+                self.paging_busy = False
+                rows, self.has_older = result
+                self.window_rows = list(rows)   # the shared list is never modified in place
+                self.show_window()
+            db_executor.submit(self.tree, self.fetch_first_page, shared,
+                               on_done=first, on_error=self.show_load_error, key=(id(self), "page"))
+            return
+        if self.has_newer:
+            # Re-read the same stretch of the list, starting at the window's first row
+            args = (self.window_rows[0][11], "older", True, len(self.window_rows))
+        else:
+            args = (None, "older", False, max(PAGE_SIZE, len(self.window_rows)))
+
+        def done(result):
+            self.paging_busy = False
+            self.window_rows, self.has_older = result
+            self.show_window()
+        db_executor.submit(self.tree, self.fetch_appointment_page, *args,
+                           on_done=done, on_error=self.show_load_error, key=(id(self), "page"))
+
+    def export_range(self):
+        """Ask for the range to export (dates, department, doctor), then export it."""
+        dept_id = None
         try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("""
-                SELECT a.appointment_id,
-                       CONCAT(p.patient_id, ' - ', p.first_name, ' ', p.last_name) AS patient_display,
-                       CONCAT(dep.department_id, ' - ', dep.name) AS department_display,
-                       CONCAT(d.doctor_id, ' - ', d.first_name, ' ', d.last_name) AS doctor_display,
-                       a.appointment_date,
-                       a.appointment_time,
-                       a.status,
-                       a.doctor_rating,
-                       COALESCE(a.notes, ''),
-                       d.doctor_id,
-                       dep.department_id
-                FROM appointment a
-                JOIN patient p ON a.patient_id = p.patient_id
-                JOIN doctor d ON a.doctor_id = d.doctor_id
-                JOIN department dep ON d.department_id = dep.department_id
-                ORDER BY a.appointment_date DESC, a.appointment_time DESC
-            """)
-            rows = cur.fetchall()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load appointments.\n\n{e}")
+            dept_id = int(self.department_var.get().split("-")[0].strip())
+        except ValueError:
+            pass
+        doctor = (self.selected_doctor_id, self.selected_doctor_display) if self.selected_doctor_id else None
+        _ExportDialog(self.tree, self.departments, dept_id, doctor, on_ok=self.export_to_file)
+
+    def export_to_file(self, date_from, date_to, department_id, doctor_id):
+        """Stream the chosen appointments to a file picked by the user (in the background)."""
+        path = filedialog.asksaveasfilename(
+            title="Export appointments",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Compressed CSV", "*.csv.gz"), ("Parquet", "*.parquet")],
+        )
+        if not path:
             return
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
-
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        for r in rows:
-            (appt_id, patient_display, dept_display, doctor_display,
-             appt_date, appt_time, status, doctor_rating, notes, doctor_id, dept_id) = r
-            rating_text = "" if doctor_rating is None else f"{float(doctor_rating):.1f}"
-            time_text = str(appt_time)[:5]
-            self.tree.insert(
-                "",
-                END,
-                values=(appt_id, patient_display, dept_display, doctor_display, str(appt_date), time_text, status, rating_text, notes),
-                tags=(f"doctor:{doctor_id}", f"dept:{dept_id}"),
-            )
+
+        def done(rows):
+            self.export_button.config(state=NORMAL)
+            messagebox.showinfo("Export finished", f"{rows} appointments written to\n{path}")
+
+        def failed(e):
+            self.export_button.config(state=NORMAL)
+            messagebox.showerror("Error", f"Export failed.\n\n{e}")
+
+        self.export_button.config(state=DISABLED)
+        db_executor.submit(self.tree, export_appointments, path, date_from, date_to, department_id, doctor_id,
+                           on_done=done, on_error=failed)
+
+    def show_load_error(self, exc):
+        self.paging_busy = False
+        messagebox.showerror("Error", f"Failed to load appointments.\n\n{exc}")
+
+    def on_tree_scroll(self, first, last):
+        """Scrollbar callback: update the bar and page in more rows near either end."""
+        self.vsb.set(first, last)
+        if self.paging_busy or not self.window_rows:
+            return
+        if float(last) >= 1 - SCROLL_LOAD_MARGIN and self.has_older:
+            self.paging_busy = True
+            db_executor.submit(self.tree, self.fetch_appointment_page, self.window_rows[-1][11], "older",
+                               on_done=self.append_older_page, on_error=self.show_load_error,
+                               key=(id(self), "page"))
+        elif float(first) <= SCROLL_LOAD_MARGIN and self.has_newer:
+            self.paging_busy = True
+            db_executor.submit(self.tree, self.fetch_appointment_page, self.window_rows[0][11], "newer",
+                               on_done=self.prepend_newer_page, on_error=self.show_load_error,
+                               key=(id(self), "page"))
+
+    def append_older_page(self, result):
+        """Append the next older page; drop pages from the top beyond the window size."""
+        rows, full = result
+        self.paging_busy = False
+        self.has_older = full
+        self.window_rows.extend(rows)
+        excess = len(self.window_rows) - PAGE_SIZE * MAX_WINDOW_PAGES
+        if excess > 0:
+            del self.window_rows[:excess]
+            self.has_newer = True
+        self.show_window()
+
+    def prepend_newer_page(self, result):
+        """Prepend the next newer page; drop pages from the bottom beyond the window size."""
+        rows, full = result
+        self.paging_busy = False
+        self.has_newer = full
+        self.window_rows[:0] = rows
+        excess = len(self.window_rows) - PAGE_SIZE * MAX_WINDOW_PAGES
+        if excess > 0:
+            del self.window_rows[-excess:]
+            self.has_older = True
+        self.show_window()
 
     def on_select_row(self, _):
         """Populate form fields when selecting a row in the table."""
@@ -470,14 +538,17 @@ class AppointmentAdminFrame:
 
         doctor_id = None
         dept_id = None
+        patient_id = None
         for tag in tags:
             if tag.startswith("doctor:"):
                 doctor_id = int(tag.split(":", 1)[1])
             elif tag.startswith("dept:"):
                 dept_id = int(tag.split(":", 1)[1])
+            elif tag.startswith("patient:"):
+                patient_id = int(tag.split(":", 1)[1])
 
         self.appointment_id_var.set(str(appt_id))
-        self.patient_var.set(patient_display)
+        self.patient_picker.set_patient(patient_id, patient_display)
         self.department_var.set(dept_display)
         self.date_var.set(str(appt_date))
         self.time_var.set(str(appt_time)[:5])
@@ -487,35 +558,32 @@ class AppointmentAdminFrame:
 
         self.current_row_doctor_id = doctor_id
 
-        if dept_id:
-            self.load_doctors_for_department(dept_id)
-            self.min_rating_var.set("All")
-            self.render_doctors()
-
         if doctor_id:
+            # render_doctors re-applies the card highlight for the selected doctor
             self.selected_doctor_id = doctor_id
             self.selected_doctor_display = doctor_display
-            if self.doctor_grid_frame:
-                for card in self.doctor_grid_frame.winfo_children():
-                    if card.winfo_children():
-                        first_label = card.winfo_children()[0]
-                        if doctor_display == first_label.cget("text"):
-                            self.highlight_selected_card(card)
-                            break
 
-        self.render_slots()
+        if dept_id:
+            self.reset_doctor_filters()
+
+            def show():
+                self.render_doctors()
+                self.render_slots()
+            self.load_doctors_for_department(dept_id, then=show)
+        else:
+            self.render_slots()
 
     def clear_form(self):
         """Clear form fields and selections."""
         self.appointment_id_var.set("")
-        self.patient_var.set("")
+        self.patient_picker.clear()
         self.department_var.set("")
         self.date_var.set(self.date_combo["values"][0] if self.date_combo["values"] else "")
         self.time_var.set("")
         self.status_var.set("Scheduled")
         self.doctor_rating_var.set("")
         self.notes_var.set("")
-        self.min_rating_var.set("All")
+        self.reset_doctor_filters()
         self.current_row_doctor_id = None
         self.clear_doctor_selection()
         self.render_doctors()
@@ -523,87 +591,67 @@ class AppointmentAdminFrame:
         self.tree.selection_remove(self.tree.selection())
 
     def add_appointment(self):
-        patient_display = self.patient_var.get().strip()
-        if not patient_display or not self.selected_doctor_id or not self.date_var.get() or not self.time_var.get():
+        patient_id = self.patient_picker.get_patient_id()
+        if patient_id is None or not self.selected_doctor_id or not self.date_var.get() or not self.time_var.get():
             messagebox.showwarning("Missing", "Please choose patient, doctor, date, and time.")
             return
-        try:
-            patient_id = int(patient_display.split("-")[0].strip())
-        except Exception:
-            messagebox.showwarning("Error", "Invalid patient selection.")
-            return
 
         doctor_rating = self.doctor_rating_var.get().strip() or None
-
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("""
-                INSERT INTO appointment (patient_id, doctor_id, appointment_date, appointment_time, status, doctor_rating, notes)
-                VALUES (%s,%s,%s,%s,%s,%s,%s)
-            """, (patient_id, self.selected_doctor_id,
-                  self.date_var.get(), self.time_var.get(),
-                  self.status_var.get(), doctor_rating, self.notes_var.get()))
-
-            if doctor_rating is not None:
-                self.recompute_avg_for_doctor(cur, self.selected_doctor_id)
-
-            con.commit()
+        args = (patient_id, self.selected_doctor_id, self.date_var.get(), self.time_var.get(),
+                self.notes_var.get(), self.status_var.get(), doctor_rating)
+
+        def done(result):
+            if not result.ok:
+                self.show_unavailable(result)
+                return
+            if result.rating_changed:
+                reference_cache.invalidate("doctor")
             messagebox.showinfo("Success", "Appointment added.")
             self.refresh_table()
             self.clear_form()
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, appointment_service.book, *args,
+                           on_done=done, on_error=lambda e: messagebox.showerror("Error", str(e)))
 
     def update_appointment(self):
         appt_id = self.appointment_id_var.get().strip()
         if not appt_id:
             messagebox.showwarning("Missing", "Select an appointment to update.")
             return
-        patient_display = self.patient_var.get().strip()
-        if not patient_display or not self.selected_doctor_id or not self.date_var.get() or not self.time_var.get():
+        patient_id = self.patient_picker.get_patient_id()
+        if patient_id is None or not self.selected_doctor_id or not self.date_var.get() or not self.time_var.get():
             messagebox.showwarning("Missing", "Please choose patient, doctor, date, and time.")
             return
-        try:
-            patient_id = int(patient_display.split("-")[0].strip())
-        except Exception:
-            messagebox.showwarning("Error", "Invalid patient selection.")
-            return
 
         doctor_rating = self.doctor_rating_var.get().strip() or None
-        old_doctor_id = self.current_row_doctor_id
-
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("""
-                UPDATE appointment
-                SET patient_id=%s, doctor_id=%s, appointment_date=%s,
-                    appointment_time=%s, status=%s, doctor_rating=%s, notes=%s
-                WHERE appointment_id=%s
-            """, (patient_id, self.selected_doctor_id, self.date_var.get(),
-                  self.time_var.get(), self.status_var.get(), doctor_rating, self.notes_var.get(), appt_id))
-
-            if old_doctor_id:
-                self.recompute_avg_for_doctor(cur, old_doctor_id)
-            self.recompute_avg_for_doctor(cur, self.selected_doctor_id)
-
-            con.commit()
+        args = (appt_id, patient_id, self.selected_doctor_id, self.date_var.get(), self.time_var.get(),
+                self.status_var.get(), doctor_rating, self.notes_var.get())
+
+        def done(change):
+            if not change.found:
+                messagebox.showinfo("Info", "This appointment no longer exists.")
+                return
+            if not change.ok:
+                self.show_unavailable(change)
+                return
+            if change.rating_changed:
+                reference_cache.invalidate("doctor")
             messagebox.showinfo("Success", "Appointment updated.")
             self.refresh_table()
             self.clear_form()
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, appointment_service.update, *args,
+                           on_done=done, on_error=lambda e: messagebox.showerror("Error", str(e)))
+
+    def show_unavailable(self, result):
+        """A booking or move was refused: explain, list the alternatives, redraw the slots."""
+        text = result.message
+        if result.alternatives:
+            text += f"\n\nFree slots with this doctor:\n{result.describe_alternatives()}"
+        messagebox.showwarning("Unavailable", text)
+        self.clear_time_selection()
+        self.render_doctors()
+        self.render_slots()
 
     def delete_selected(self):
         appt_id = self.appointment_id_var.get().strip()
@@ -613,33 +661,68 @@ class AppointmentAdminFrame:
         if not messagebox.askyesno("Confirm", "Delete this appointment?"):
             return
 
-        doctor_id = self.selected_doctor_id or self.current_row_doctor_id
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("DELETE FROM appointment WHERE appointment_id=%s", (appt_id,))
-            if doctor_id:
-                self.recompute_avg_for_doctor(cur, doctor_id)
-            con.commit()
+        def done(change):
+            if change.rating_changed:
+                reference_cache.invalidate("doctor")
             messagebox.showinfo("Deleted", "Appointment deleted.")
             self.refresh_table()
             self.clear_form()
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
-
-    def recompute_avg_for_doctor(self, cursor, doctor_id):
-        """Recompute doctor.avg_rating from appointment ratings."""
-        cursor.execute("""
-            UPDATE doctor d
-            SET d.avg_rating = (
-                SELECT AVG(a.doctor_rating)
-                FROM appointment a
-                WHERE a.doctor_id = d.doctor_id AND a.doctor_rating IS NOT NULL
-            )
-            WHERE d.doctor_id = %s
-        """, (doctor_id,))
+
+        db_executor.submit(self.tree, appointment_service.delete, appt_id,
+                           on_done=done, on_error=lambda e: messagebox.showerror("Error", str(e)))
+
+
+class _ExportDialog:
+    """
+    Modal range prompt for the Export button: From / To (required, this
+    month by default), department and optionally only the selected doctor.
+    on_ok(date_from, date_to, department_id or None, doctor_id or None).
+    """
+
+    def __init__(self, parent, departments, department_id, doctor, on_ok):
+        self.on_ok = on_ok
+        self.dept_ids = {f"{d[0]} - {d[1]}": d[0] for d in departments}
+        today = date.today()
+        self.from_var = StringVar(value=today.replace(day=1).isoformat())
+        self.to_var = StringVar(value=today.isoformat())
+        self.dept_var = StringVar(value=next((text for text, i in self.dept_ids.items() if i == department_id),
+                                             ALL_OPTION))
+        self.doctor_id = doctor[0] if doctor else None
+        self.only_doctor_var = BooleanVar(value=False)
+
+        self.window = win = Toplevel(parent)
+        win.title("Export appointments")
+        win.configure(bg="white")
+        win.transient(parent.winfo_toplevel())
+        win.resizable(False, False)
+
+        Label(win, text="From (YYYY-MM-DD)", bg="white").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        Entry(win, textvariable=self.from_var, width=12).grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        Label(win, text="To", bg="white").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        Entry(win, textvariable=self.to_var, width=12).grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        Label(win, text="Department", bg="white").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        ttk.Combobox(win, textvariable=self.dept_var, state="readonly", width=24,
+                     values=[ALL_OPTION] + list(self.dept_ids)).grid(row=2, column=1, padx=5, pady=5)
+        if doctor:
+            Checkbutton(win, text=f"Only {doctor[1]}", variable=self.only_doctor_var,
+                        bg="white").grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+
+        buttons = Frame(win, bg="white")
+        buttons.grid(row=4, column=0, columnspan=2, pady=10)
+        Button(buttons, text="Export...", width=10, command=self.ok).pack(side=LEFT, padx=5)
+        Button(buttons, text="Cancel", width=10, command=win.destroy).pack(side=LEFT, padx=5)
+        win.grab_set()
+
+    def ok(self):
+        try:
+            date_from = date.fromisoformat(self.from_var.get().strip())
+            date_to = date.fromisoformat(self.to_var.get().strip())
+        except ValueError:
+            messagebox.showwarning("Warning", "Dates must be in YYYY-MM-DD format.", parent=self.window)
+            return
+        if date_from > date_to:
+            messagebox.showwarning("Warning", "'From' must not be after 'To'.", parent=self.window)
+            return
+        doctor_id = self.doctor_id if self.only_doctor_var.get() else None
+        self.window.destroy()
+        self.on_ok(date_from.isoformat(), date_to.isoformat(), self.dept_ids.get(self.dept_var.get()), doctor_id)
@@ -2,14 +2,20 @@
 frames_appointment_client.py
 ----------------------------
 Client appointment booking frame
-- Department -> Doctor cascading filter
+- Department -> Doctor cascading filter (min rating / specialty / sort are
+  applied by the doctor query; bios are loaded when a card is hovered)
 - Client bound to ONE patient_id
 """
 
 from tkinter import *
 from tkinter import ttk, messagebox
-from datetime import date, datetime, timedelta
-from db_config import get_connection
+from datetime import date, timedelta
+from availability import availability_index
+from db_executor import db_executor
+from reference_cache import reference_cache
+from booking_widgets import DoctorCardGrid, SlotButtonGrid, ALL_OPTION, MIN_RATING_OPTIONS, SORT_OPTIONS
+from schedule import schedule
+from services import appointment_service, doctor_repo
 
 
 class AppointmentClientFrame:
@@ -21,11 +27,11 @@ class AppointmentClientFrame:
         self.date_var = StringVar()
         self.time_var = StringVar()
         self.notes_var = StringVar()
-        self.rating_var = StringVar(value="All")
-        self.selected_slot_btn = None
+        self.rating_var = StringVar(value=ALL_OPTION)
+        self.specialty_var = StringVar(value=ALL_OPTION)
+        self.sort_var = StringVar(value="Rating")
         self.selected_doctor_id = None
         self.selected_doctor_display = ""
-        self.selected_doctor_card = None
 
         self.departments = []
         self.doctors = []
@@ -68,9 +74,32 @@ class AppointmentClientFrame:
         self.doctor_container = Frame(parent, bg="white")
         self.doctor_container.pack(fill=X, padx=10, pady=(5, 0), anchor="w")
 
+        # Filter bar (built once; the card grid below is recycled)
+        filter_frame = Frame(self.doctor_container, bg="white")
+        filter_frame.pack(anchor="w", pady=(0, 5), fill=X)
+        Label(filter_frame, text="Min Rating", bg="white").pack(side=LEFT)
+        rating_combo = ttk.Combobox(filter_frame, textvariable=self.rating_var,
+                                    state="readonly", width=8, values=MIN_RATING_OPTIONS)
+        rating_combo.pack(side=LEFT, padx=5)
+        rating_combo.bind("<<ComboboxSelected>>", self.on_filter_change)
+        Label(filter_frame, text="Specialty", bg="white").pack(side=LEFT, padx=(10, 0))
+        self.specialty_combo = ttk.Combobox(filter_frame, textvariable=self.specialty_var,
+                                            state="readonly", width=18, values=[ALL_OPTION])
+        self.specialty_combo.pack(side=LEFT, padx=5)
+        self.specialty_combo.bind("<<ComboboxSelected>>", self.on_filter_change)
+        Label(filter_frame, text="Sort by", bg="white").pack(side=LEFT, padx=(10, 0))
+        sort_combo = ttk.Combobox(filter_frame, textvariable=self.sort_var,
+                                  state="readonly", width=8, values=list(SORT_OPTIONS))
+        sort_combo.pack(side=LEFT, padx=5)
+        sort_combo.bind("<<ComboboxSelected>>", self.on_filter_change)
+        self.card_grid = DoctorCardGrid(self.doctor_container, self.select_doctor, load_bio=doctor_repo.bio)
+
         # ----------- slot container under doctor grid -----------
         self.slot_container = Frame(parent, bg="white")
         self.slot_container.pack(fill=X, padx=10, pady=(5, 0), anchor="w")
+        self.slot_grid = SlotButtonGrid(self.slot_container, self.set_time)
+
+        reference_cache.subscribe("department", self.load_departments, widget=self.dept_combo)
 
         self.init_dates()
         self.load_departments()
@@ -84,250 +113,172 @@ class AppointmentClientFrame:
         dates = [(today + timedelta(days=i)).isoformat() for i in range(4)]
         self.date_combo["values"] = dates
         self.date_var.set(dates[0])
+        # One bulk query fills the slot index for the whole booking window
+        db_executor.submit(self.slot_container, availability_index.load_dates, dates,
+                           on_done=lambda _: self.render_doctors())
 
     def load_departments(self):
-        con = get_connection()
-        cur = con.cursor()
-        cur.execute("SELECT department_id, name FROM department")
-        self.departments = cur.fetchall()
-        con.close()
+        db_executor.submit(self.dept_combo, self.query_departments, on_done=self.show_departments)
 
+    def query_departments(self):
+        """Worker thread: (department_id, name) rows from the shared reference cache."""
+        return [(d[0], d[1]) for d in reference_cache.departments()]
+
+    def show_departments(self, rows):
+        self.departments = rows
         self.dept_combo["values"] = [f"{d[0]} - {d[1]}" for d in self.departments]
 
     def on_department_change(self, _):
         """Handle department selection: load doctors, reset selections, and refresh UI."""
         dept_id = int(self.department_var.get().split("-")[0])
-        self.load_doctors_for_department(dept_id)
-        self.rating_var.set("All")
+        self.rating_var.set(ALL_OPTION)
+        self.specialty_var.set(ALL_OPTION)
         self.selected_doctor_id = None
         self.selected_doctor_display = ""
-        self.selected_doctor_card = None
+        self.card_grid.set_selected(None)
         self.clear_time_selection()
-        self.render_doctors()
-        self.render_slots()
+
+        def show():
+            self.render_doctors()
+            self.render_slots()
+        self.load_doctors_for_department(dept_id, then=show)
 
     def on_date_change(self, _):
         self.clear_time_selection()
+        self.render_doctors()
         self.render_slots()
 
     def clear_time_selection(self):
         """Reset chosen time and selected slot highlight."""
         self.time_var.set("")
-        if self.selected_slot_btn:
-            self.selected_slot_btn.config(relief=RAISED, bd=2)
-            self.selected_slot_btn = None
-
-    def load_doctors_for_department(self, dept_id):
-        """Load doctors for a department including specialty, bio, and rating."""
-        con = get_connection()
-        cur = con.cursor()
-        cur.execute("""
-            SELECT doctor_id, first_name, last_name, specialty, bio, avg_rating
-            FROM doctor
-            WHERE department_id=%s
-        """, (dept_id,))
-        self.doctors = cur.fetchall()
-        con.close()
+        self.slot_grid.set_selected(None)
+
+    def load_doctors_for_department(self, dept_id, then=None, new_department=True):
+        """
+        Load the doctor cards matching the filter bar in the background;
+        `then()` runs once self.doctors is set. For a new department the
+        specialty choices and booked slots are (re)loaded as well.
+        """
+        rating = self.rating_var.get()
+        min_rating = None if rating == ALL_OPTION else float(rating)
+        specialty = None if self.specialty_var.get() == ALL_OPTION else self.specialty_var.get()
+        sort = SORT_OPTIONS[self.sort_var.get()]
+
+        def done(result):
+            self.doctors, specialties = result
+            if specialties is not None:
+                self.specialty_combo["values"] = [ALL_OPTION] + specialties
+            if then:
+                then()
+        db_executor.submit(self.doctor_container, self.query_doctors_for_department,
+                           dept_id, list(self.date_combo["values"]) if new_department else None,
+                           min_rating, specialty, sort,
+                           on_done=done, key=(id(self), "doctors"))
+
+    def query_doctors_for_department(self, dept_id, dates, min_rating, specialty, sort):
+        """
+        Worker thread: (cards, specialties). The cards are filtered and sorted
+        by the doctor query. With `dates` (a new department), the department's
+        specialties are read from the reference cache and the booked slots of
+        every offered date are loaded in one query; otherwise specialties is None.
+        """
+        specialties = None
+        if dates is not None:
+            doctors = doctor_repo.for_department(dept_id, dates)
+            specialties = sorted({d.specialty for d in doctors if d.specialty})
+        return doctor_repo.cards(dept_id, min_rating, specialty, sort), specialties
 
     def render_doctors(self):
-        """Render doctor cards with rating filter and selection highlight."""
-        for child in self.doctor_container.winfo_children():
-            child.destroy()
-
-        # Rating filter bar
-        filter_frame = Frame(self.doctor_container, bg="white")
-        filter_frame.pack(anchor="w", pady=(0, 5), fill=X)
-        Label(filter_frame, text="Min Rating", bg="white").pack(side=LEFT)
-        rating_combo = ttk.Combobox(filter_frame, textvariable=self.rating_var,
-                                    state="readonly", width=8,
-                                    values=["All", "5.0", "4.5", "4.0", "3.5", "3.0", "2.5", "2.0", "1.5", "1.0"])
-        rating_combo.pack(side=LEFT, padx=5)
-        rating_combo.bind("<<ComboboxSelected>>", self.on_rating_change)
-
+        """Show the doctor cards for the current department, filter and date (widgets are reused)."""
         if not self.department_var.get():
-            Label(self.doctor_container, text="Select department to view doctors",
-                  bg="white", fg="gray").pack(anchor="w")
+            self.card_grid.show_message("Select department to view doctors")
             return
+        self.card_grid.show(self.doctors, self.selected_doctor_id, self.free_slot_badge)
 
-        filtered = self.get_filtered_doctors()
-        if not filtered:
-            Label(self.doctor_container, text="No doctors match the selected filters",
-                  bg="white", fg="gray").pack(anchor="w")
-            return
+    def free_slot_badge(self, doctor_id):
+        """(text, colour) for a card's free-slot badge, or None when not cached yet."""
+        free = availability_index.free_slot_count(doctor_id, self.date_var.get(), load=False)
+        if free is None:
+            return None
+        return f"{free} free slots on {self.date_var.get()}", "green" if free else "gray"
 
-        grid = Frame(self.doctor_container, bg="white")
-        grid.pack(anchor="w", fill=X)
-
-        for idx, doc in enumerate(filtered):
-            doctor_id, first, last, specialty, bio, avg_rating = doc
-            display = f"{doctor_id} - {first} {last}"
-            rating_text = "N/A" if avg_rating is None else f"{avg_rating:.1f}"
-
-            card = Frame(grid, bd=2, relief=RIDGE, bg="white", padx=8, pady=6, width=220)
-            Label(card, text=display, font=("Arial", 10, "bold"), bg="white").pack(anchor="w")
-            Label(card, text=f"Specialty: {specialty}", bg="white", fg="black").pack(anchor="w")
-            Label(card, text=f"Bio: {bio}", bg="white", wraplength=200, justify=LEFT).pack(anchor="w")
-            Label(card, text=f"Avg Rating: {rating_text}", bg="white", fg="blue").pack(anchor="w")
-
-            card.bind("<Button-1>", lambda e, d_id=doctor_id, disp=display, c=card: self.select_doctor(d_id, disp, c))
-            for child in card.winfo_children():
-                child.bind("<Button-1>", lambda e, d_id=doctor_id, disp=display, c=card: self.select_doctor(d_id, disp, c))
-
-            row, col = divmod(idx, 3)
-            card.grid(row=row, column=col, padx=5, pady=5, sticky="nsew")
-
-            # Re-apply highlight if this doctor is currently selected
-            if self.selected_doctor_id == doctor_id:
-                self.highlight_selected_card(card)
-
-        for col in range(3):
-            grid.grid_columnconfigure(col, weight=1)
-
-    def on_rating_change(self, _):
-        """Update doctor grid based on rating filter and clear selections if needed."""
-        filtered_ids = {doc[0] for doc in self.get_filtered_doctors()}
-        if self.selected_doctor_id and self.selected_doctor_id not in filtered_ids:
-            self.selected_doctor_id = None
-            self.selected_doctor_display = ""
-            self.selected_doctor_card = None
-            self.clear_time_selection()
-        self.render_doctors()
-        self.render_slots()
+    def on_filter_change(self, _):
+        """Re-query the doctor cards for the filter bar and clear the selection if it dropped out."""
+        if not self.department_var.get():
+            return
+        dept_id = int(self.department_var.get().split("-")[0])
 
-    def get_filtered_doctors(self):
-        """Return doctors filtered by the current minimum rating."""
-        value = self.rating_var.get()
-        min_rating = 0 if value == "All" else float(value)
-        filtered = []
-        for doc in self.doctors:
-            avg_rating = doc[5] or 0
-            if avg_rating >= min_rating:
-                filtered.append(doc)
-        return filtered
-
-    def select_doctor(self, doctor_id, display, card_widget):
+        def show():
+            if self.selected_doctor_id and self.selected_doctor_id not in {d.doctor_id for d in self.doctors}:
+                self.selected_doctor_id = None
+                self.selected_doctor_display = ""
+                self.card_grid.set_selected(None)
+                self.clear_time_selection()
+            self.render_doctors()
+            self.render_slots()
+        self.load_doctors_for_department(dept_id, then=show, new_department=False)
+
+    def select_doctor(self, doctor_id, display):
         """Handle doctor card click: mark selection, clear time, refresh slots."""
         self.selected_doctor_id = doctor_id
         self.selected_doctor_display = display
-        self.highlight_selected_card(card_widget)
         self.clear_time_selection()
         self.render_slots()
 
-    def highlight_selected_card(self, card_widget):
-        """Highlight chosen doctor card and reset the previous one."""
-        if self.selected_doctor_card and self.selected_doctor_card != card_widget:
-            self.reset_card_style(self.selected_doctor_card)
-        self.selected_doctor_card = card_widget
-        card_widget.config(bg="#d6e9ff")
-        for child in card_widget.winfo_children():
-            child.config(bg="#d6e9ff")
-
-    def reset_card_style(self, card_widget):
-        """Return doctor card to default style."""
-        card_widget.config(bg="white")
-        for child in card_widget.winfo_children():
-            child.config(bg="white")
-
     def render_slots(self):
         """Render inline slot grid or hint based on doctor/date selection."""
-        for child in self.slot_container.winfo_children():
-            child.destroy()
+        slots_key = (id(self), "slots")
 
         if not self.selected_doctor_id or not self.date_var.get():
-            Label(self.slot_container, text="Select doctor and date to view available slots",
-                  bg="white", fg="gray").pack(anchor="w")
+            db_executor.cancel(slots_key)
+            self.slot_grid.show_message("Select doctor and date to view available slots")
             return
 
-        booked_slots = self.fetch_booked_slots(self.selected_doctor_id, self.date_var.get())
+        if availability_index.is_cached(self.selected_doctor_id, self.date_var.get()):
+            db_executor.cancel(slots_key)
+            self.draw_slots(self.fetch_booked_slots(self.selected_doctor_id, self.date_var.get()))
+            return
 
-        slot_frame = Frame(self.slot_container, bg="white", padx=2, pady=2)
-        slot_frame.pack(anchor="w")
+        self.slot_grid.show_message("Loading available slots...")
+        db_executor.submit(self.slot_container, self.fetch_booked_slots,
+                           self.selected_doctor_id, self.date_var.get(),
+                           on_done=self.draw_slots, key=slots_key)
 
-        slots = self.build_slots()
-        for idx, (start, end) in enumerate(slots):
-            text = f"{start}~{end}\n{self.selected_doctor_display}"
-            is_booked = start in booked_slots
-            btn = Button(slot_frame, text=text, width=20, justify=CENTER)
-            if is_booked:
-                btn.config(state=DISABLED, bg="black", fg="white", disabledforeground="white")
-            else:
-                btn.config(bg="green", activebackground="darkgreen",
-                           command=lambda s=start, b=btn: self.set_time_and_highlight(s, b))
-                if self.time_var.get() == start:
-                    self._highlight_selected_button(btn)
-            row, col = divmod(idx, 3)
-            btn.grid(row=row, column=col, padx=4, pady=4, sticky="ew")
-
-        for col in range(3):
-            slot_frame.grid_columnconfigure(col, weight=1)
-
-    def build_slots(self):
-        """Return list of (start, end) strings for allowed 30-minute slots."""
-        fmt = "%H:%M"
-        slots = []
-        start = datetime.strptime("09:00", fmt)
-        noon = datetime.strptime("12:00", fmt)
-        while start < noon:
-            end = start + timedelta(minutes=30)
-            slots.append((start.strftime(fmt), end.strftime(fmt)))
-            start = end
-
-        start = datetime.strptime("13:00", fmt)
-        close = datetime.strptime("16:00", fmt)
-        while start < close:
-            end = start + timedelta(minutes=30)
-            slots.append((start.strftime(fmt), end.strftime(fmt)))
-            start = end
-        return slots
+    def draw_slots(self, booked_slots):
+        """Show the slot buttons for the selected doctor given the booked start times."""
+        template = schedule.template_for(self.selected_doctor_id, self.date_var.get())
+        if not template.slots:
+            self.slot_grid.show_message("No clinic hours for this doctor on the selected date")
+            return
+        self.slot_grid.show(template.slots, booked_slots, self.selected_doctor_display,
+                            self.time_var.get() or None)
 
     def fetch_booked_slots(self, doctor_id, appointment_date):
-        """Fetch booked start times (HH:MM) for the doctor on the given date."""
-        con = get_connection()
-        cur = con.cursor()
-        cur.execute("""
-            SELECT appointment_time
-            FROM appointment
-            WHERE doctor_id=%s AND appointment_date=%s
-        """, (doctor_id, appointment_date))
-        rows = cur.fetchall()
-        con.close()
-
-        booked = set()
-        for (time_value,) in rows:
-            if hasattr(time_value, "strftime"):
-                formatted = time_value.strftime("%H:%M")
-            else:
-                formatted = str(time_value)[:5]
-            booked.add(formatted)
-        return booked
+        """Return booked start times (HH:MM) for the doctor on the given date (from the shared index)."""
+        return appointment_service.booked_slots(doctor_id, appointment_date)
 
-    def _highlight_selected_button(self, btn):
-        if self.selected_slot_btn and self.selected_slot_btn != btn:
-            self.selected_slot_btn.config(relief=RAISED, bd=2)
-        self.selected_slot_btn = btn
-        self.selected_slot_btn.config(relief=SUNKEN, bd=3)
-
-    def set_time_and_highlight(self, start_time, btn):
+    def set_time(self, start_time):
+        """Slot button callback (the grid already sank the clicked button)."""
         self.time_var.set(start_time)
-        self._highlight_selected_button(btn)
 
     def add_appointment(self):
         if not self.selected_doctor_id or not self.time_var.get():
             messagebox.showwarning("Missing", "Please complete all fields")
             return
 
-        con = get_connection()
-        cur = con.cursor()
-        try:
-            cur.execute("""
-                INSERT INTO appointment (patient_id, doctor_id, appointment_date, appointment_time, notes)
-                VALUES (%s,%s,%s,%s,%s)
-            """, (self.patient_id, self.selected_doctor_id,
-                  self.date_var.get(), self.time_var.get(),
-                  self.notes_var.get()))
-            con.commit()
-            messagebox.showinfo("Success", "Appointment booked")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-        finally:
-            con.close()
+        args = (self.patient_id, self.selected_doctor_id, self.date_var.get(),
+                self.time_var.get(), self.notes_var.get())
+
+        def done(result):
+            if result.ok:
+                messagebox.showinfo("Success", "Appointment booked")
+            elif result.alternatives:
+                messagebox.showwarning("Unavailable", f"{result.message}\n\nFree slots with this doctor:\n"
+                                                      f"{result.describe_alternatives()}")
+            else:
+                messagebox.showwarning("Unavailable", result.message)
+            self.clear_time_selection()
+            self.render_doctors()
+            self.render_slots()
+        db_executor.submit(self.slot_container, appointment_service.book, *args,
+                           on_done=done, on_error=lambda e: messagebox.showerror("Error", str(e)))
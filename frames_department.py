@@ -7,11 +7,16 @@ Contains the DepartmentFrame class, which manages the `department` table.
 This frame is used in the Admin portal to:
 - Add / Update / Delete departments
 - View all departments in a Treeview
+
+Loads and writes run on db_executor; the Tk thread only updates widgets.
 """
 
 from tkinter import *
 from tkinter import ttk, messagebox
-from db_config import get_connection
+from services import department_repo
+from db_executor import db_executor
+from table_sync import TreeviewSync
+from reference_cache import reference_cache
 
 
 class DepartmentFrame:
@@ -55,7 +60,7 @@ class DepartmentFrame:
         Button(btn_frame, text="Update", width=10, command=self.update_department).pack(pady=2)
         Button(btn_frame, text="Delete", width=10, command=self.delete_department).pack(pady=2)
         Button(btn_frame, text="Clear", width=10, command=self.clear_form).pack(pady=2)
-        Button(btn_frame, text="Refresh", width=10, command=self.fetch_departments).pack(pady=2)
+        Button(btn_frame, text="Refresh", width=10, command=self.reload_departments).pack(pady=2)
 
         # Table for department list
         table_frame = Frame(parent, bg="lightgrey")
@@ -76,6 +81,8 @@ class DepartmentFrame:
         self.tree.column("min", width=100)
         self.tree.column("max", width=100)
 
+        self.table_sync = TreeviewSync(self.tree)
+
         vsb = Scrollbar(table_frame, orient=VERTICAL, command=self.tree.yview)
         self.tree.configure(yscrollcommand=vsb.set)
 
@@ -85,30 +92,22 @@ class DepartmentFrame:
         # Bind click to load row into form
         self.tree.bind("<ButtonRelease-1>", self.on_row_select)
 
+        # Reload whenever any tab changes departments (including this one)
+        reference_cache.subscribe("department", self.fetch_departments, widget=self.tree)
+
         # Initial load
         self.fetch_departments()
 
     # ---------- CRUD operations ----------
     def fetch_departments(self):
-        """Fetch all departments from DB and display in the Treeview."""
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("SELECT department_id, name, min_doctors, max_doctors FROM department")
-            rows = cur.fetchall()
-
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            for row in rows:
-                self.tree.insert("", END, values=row)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to fetch departments.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+        """Show all departments (from the shared reference cache) in the Treeview."""
+        db_executor.submit(self.tree, reference_cache.departments, on_done=self.table_sync.sync,
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to fetch departments.\n\n{e}"),
+                           key=(id(self), "rows"))
+
+    def reload_departments(self):
+        """Refresh button: drop the cached departments and reload them from the DB."""
+        reference_cache.invalidate("department")
 
     def add_department(self):
         """Insert a new department row into the DB."""
@@ -127,22 +126,13 @@ class DepartmentFrame:
             messagebox.showwarning("Warning", "Min/Max doctors must be integers.")
             return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            sql = "INSERT INTO department (name, min_doctors, max_doctors) VALUES (%s, %s, %s)"
-            cur.execute(sql, (name, min_val, max_val))
-            con.commit()
+        def done(_):
             messagebox.showinfo("Success", "Department added successfully.")
-            self.fetch_departments()
+            reference_cache.invalidate("department")
             self.clear_form()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to add department.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, department_repo.create, name, min_val, max_val, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to add department.\n\n{e}"))
 
     def on_row_select(self, event):
         """Load selected row into the form fields."""
@@ -187,31 +177,16 @@ class DepartmentFrame:
             messagebox.showwarning("Warning", "Min/Max doctors must be integers.")
             return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            sql = """
-                UPDATE department
-                SET name = %s, min_doctors = %s, max_doctors = %s
-                WHERE department_id = %s
-            """
-            cur.execute(sql, (name, min_val, max_val, dep_id))
-            con.commit()
-
-            if cur.rowcount:
+        def done(found):
+            if found:
                 messagebox.showinfo("Success", "Department updated successfully.")
             else:
                 messagebox.showinfo("Info", "No department found with this ID.")
-
-            self.fetch_departments()
+            reference_cache.invalidate("department")
             self.clear_form()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update department.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, department_repo.update, dep_id, name, min_val, max_val, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to update department.\n\n{e}"))
 
     def delete_department(self):
         """Delete the selected department row by ID."""
@@ -223,26 +198,19 @@ class DepartmentFrame:
         if not messagebox.askyesno("Confirm", "Delete this department? (may fail if used by a doctor)"):
             return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("DELETE FROM department WHERE department_id = %s", (dep_id,))
-            con.commit()
-
-            if cur.rowcount:
+        def done(found):
+            if found:
                 messagebox.showinfo("Success", "Department deleted successfully.")
             else:
                 messagebox.showinfo("Info", "No department found with this ID.")
-            self.fetch_departments()
+            reference_cache.invalidate("department")
             self.clear_form()
-        except Exception as e:
+
+        def failed(e):
             messagebox.showerror(
                 "Error",
                 "Failed to delete department.\n"
                 "It might be referenced by some doctors (foreign key constraint).\n\n" + str(e)
             )
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, department_repo.delete, dep_id, on_done=done, on_error=failed)
@@ -7,11 +7,16 @@ Contains the DoctorFrame class, which manages the `doctor` table.
 This frame is used in the Admin portal to:
 - Add / Update / Delete doctors
 - View all doctors (with department name) in a Treeview
+
+Loads and writes run on db_executor; the Tk thread only updates widgets.
 """
 
 from tkinter import *
 from tkinter import ttk, messagebox
-from db_config import get_connection
+from services import doctor_repo
+from db_executor import db_executor
+from table_sync import TreeviewSync
+from reference_cache import reference_cache
 
 
 class DoctorFrame:
@@ -74,7 +79,7 @@ class DoctorFrame:
         Button(btn_frame, text="Update", width=10, command=self.update_doctor).pack(pady=2)
         Button(btn_frame, text="Delete", width=10, command=self.delete_doctor).pack(pady=2)
         Button(btn_frame, text="Clear", width=10, command=self.clear_form).pack(pady=2)
-        Button(btn_frame, text="Refresh", width=10, command=self.fetch_doctors).pack(pady=2)
+        Button(btn_frame, text="Refresh", width=10, command=self.reload_doctors).pack(pady=2)
 
         # Table
         table_frame = Frame(parent, bg="lightgrey")
@@ -99,6 +104,8 @@ class DoctorFrame:
             self.tree.heading(col, text=text)
             self.tree.column(col, width=width)
 
+        self.table_sync = TreeviewSync(self.tree)
+
         vsb = Scrollbar(table_frame, orient=VERTICAL, command=self.tree.yview)
         self.tree.configure(yscrollcommand=vsb.set)
         self.tree.pack(side=LEFT, fill=BOTH, expand=True)
@@ -106,28 +113,13 @@ class DoctorFrame:
 
         self.tree.bind("<ButtonRelease-1>", self.on_row_select)
 
+        # Department renames change the combo and the table's department column
+        reference_cache.subscribe("department", self.fetch_doctors, widget=self.tree)
+        reference_cache.subscribe("doctor", self.fetch_doctors, widget=self.tree)
+
         # Initial data
-        self.refresh_department_choices()
         self.fetch_doctors()
 
-    # ---------- Helper: load departments ----------
-    def refresh_department_choices(self):
-        """Load all departments and prepare choices for combo box."""
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("SELECT department_id, name FROM department ORDER BY name")
-            self.dep_choices = cur.fetchall()
-            display_values = [f"{row[0]} - {row[1]}" for row in self.dep_choices]
-            self.dep_combo["values"] = display_values
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load departments.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
-
     def _parse_department_id(self):
         """Extract department_id from combo string 'id - name'."""
         val = self.department_var.get().strip()
@@ -141,38 +133,31 @@ class DoctorFrame:
 
     # ---------- CRUD operations ----------
     def fetch_doctors(self):
-        """Fetch all doctors (with department name) and show them in the table."""
-        self.refresh_department_choices()
+        """Show all doctors (with department name) in the table, from the shared reference cache."""
+        db_executor.submit(self.tree, self.query_doctors, on_done=self.show_doctors,
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to fetch doctors.\n\n{e}"),
+                           key=(id(self), "rows"))
+
+    def query_doctors(self):
+        """Worker thread: (department choices sorted by name, table rows)."""
+        dep_choices = sorted(((d[0], d[1]) for d in reference_cache.departments()), key=lambda row: row[1])
+        dep_names = reference_cache.department_names()
+        rows = [
+            (doctor_id, first, last, f"{dep_id} - {dep_names[dep_id]}", phone, email, avg_rating)
+            for doctor_id, first, last, dep_id, phone, email, avg_rating, _specialty, _bio
+            in reference_cache.doctors()
+            if dep_id in dep_names
+        ]
+        return dep_choices, rows
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            sql = """
-                SELECT d.doctor_id,
-                       d.first_name,
-                       d.last_name,
-                       CONCAT(d.department_id, ' - ', dept.name) AS dep_display,
-                       d.phone,
-                       d.email,
-                       d.avg_rating
-                FROM doctor d
-                JOIN department dept ON d.department_id = dept.department_id
-            """
-            cur.execute(sql)
-            rows = cur.fetchall()
-
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            for row in rows:
-                self.tree.insert("", END, values=row)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to fetch doctors.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+    def show_doctors(self, result):
+        self.dep_choices, rows = result
+        self.dep_combo["values"] = [f"{row[0]} - {row[1]}" for row in self.dep_choices]
+        self.table_sync.sync(rows)
+
+    def reload_doctors(self):
+        """Refresh button: drop the cached doctors and reload them from the DB."""
+        reference_cache.invalidate("doctor")
 
     def add_doctor(self):
         """Insert a new doctor row."""
@@ -186,22 +171,13 @@ class DoctorFrame:
             messagebox.showwarning("Warning", "First name, last name, and department are required.")
             return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            sql = "INSERT INTO doctor (first_name, last_name, department_id, phone, email) VALUES (%s, %s, %s, %s, %s)"
-            cur.execute(sql, (first, last, dep_id, phone, email))
-            con.commit()
+        def done(_):
             messagebox.showinfo("Success", "Doctor added successfully.")
-            self.fetch_doctors()
+            reference_cache.invalidate("doctor")
             self.clear_form()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to add doctor.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, doctor_repo.create, first, last, dep_id, phone, email, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to add doctor.\n\n{e}"))
 
     def on_row_select(self, event):
         """Load selected doctor into the form."""
@@ -247,35 +223,16 @@ class DoctorFrame:
             messagebox.showwarning("Warning", "First name, last name, and department are required.")
             return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            sql = """
-                UPDATE doctor
-                SET first_name = %s,
-                    last_name = %s,
-                    department_id = %s,
-                    phone = %s,
-                    email = %s
-                WHERE doctor_id = %s
-            """
-            cur.execute(sql, (first, last, dep_id, phone, email, did))
-            con.commit()
-
-            if cur.rowcount:
+        def done(found):
+            if found:
                 messagebox.showinfo("Success", "Doctor updated successfully.")
             else:
                 messagebox.showinfo("Info", "No doctor found with this ID.")
-
-            self.fetch_doctors()
+            reference_cache.invalidate("doctor")
             self.clear_form()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update doctor.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, doctor_repo.update, did, first, last, dep_id, phone, email, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to update doctor.\n\n{e}"))
 
     def delete_doctor(self):
         """Delete selected doctor (may fail if referenced by appointments)."""
@@ -287,27 +244,19 @@ class DoctorFrame:
         if not messagebox.askyesno("Confirm", "Delete this doctor? (may fail if there are appointments)"):
             return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("DELETE FROM doctor WHERE doctor_id = %s", (did,))
-            con.commit()
-
-            if cur.rowcount:
+        def done(found):
+            if found:
                 messagebox.showinfo("Success", "Doctor deleted successfully.")
             else:
                 messagebox.showinfo("Info", "No doctor found with this ID.")
-
-            self.fetch_doctors()
+            reference_cache.invalidate("doctor")
             self.clear_form()
-        except Exception as e:
+
+        def failed(e):
             messagebox.showerror(
                 "Error",
                 "Failed to delete doctor.\n"
                 "It might be referenced by some appointments (foreign key constraint).\n\n" + str(e)
             )
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, doctor_repo.delete, did, on_done=done, on_error=failed)
@@ -6,12 +6,22 @@ Contains the PatientFrame class, which manages the `patient` table.
 
 This frame is used in the Admin portal to:
 - Add / Update / Delete patients
-- View all patients in a Treeview
+- Import patients (and their logins) from a CSV / JSONL file (bulk_import)
+- Search patients (name / phone / email prefix or id, as PatientPicker does)
+  and list the matches in a Treeview; with an empty search the newest
+  services.PATIENT_LIST_LIMIT patients are shown
+
+Loads and writes run on db_executor; the Tk thread only updates widgets.
 """
 
 from tkinter import *
-from tkinter import ttk, messagebox
-from db_config import get_connection
+from tkinter import ttk, messagebox, filedialog
+from services import patient_repo, PATIENT_LIST_LIMIT
+from bulk_import import import_file
+from db_executor import db_executor
+from table_sync import TreeviewSync
+from reference_cache import reference_cache
+from patient_picker import SEARCH_DELAY_MS
 
 
 class PatientFrame:
@@ -28,6 +38,9 @@ class PatientFrame:
         self.gender_var = StringVar()
         self.phone_var = StringVar()
         self.email_var = StringVar()
+        self.search_var = StringVar()
+        self.status_var = StringVar()
+        self._after_id = None
 
         # Form layout
         form_frame = Frame(parent, bg="white")
@@ -68,7 +81,18 @@ class PatientFrame:
         Button(btn_frame, text="Update", width=10, command=self.update_patient).pack(pady=2)
         Button(btn_frame, text="Delete", width=10, command=self.delete_patient).pack(pady=2)
         Button(btn_frame, text="Clear", width=10, command=self.clear_form).pack(pady=2)
-        Button(btn_frame, text="Refresh", width=10, command=self.fetch_patients).pack(pady=2)
+        Button(btn_frame, text="Refresh", width=10, command=self.reload_patients).pack(pady=2)
+        self.import_button = Button(btn_frame, text="Import...", width=10, command=self.import_patients)
+        self.import_button.pack(pady=2)
+
+        # Search
+        search_frame = Frame(parent, bg="white")
+        search_frame.pack(side=TOP, fill=X)
+        Label(search_frame, text="Search", bg="white").pack(side=LEFT, padx=5, pady=5)
+        search_entry = Entry(search_frame, textvariable=self.search_var, width=30)
+        search_entry.pack(side=LEFT, padx=5, pady=5)
+        search_entry.bind("<KeyRelease>", self.on_search_key)
+        Label(search_frame, textvariable=self.status_var, bg="white", fg="grey").pack(side=LEFT, padx=5)
 
         # Table
         table_frame = Frame(parent, bg="lightgrey")
@@ -90,6 +114,8 @@ class PatientFrame:
             self.tree.heading(col, text=text)
             self.tree.column(col, width=width)
 
+        self.table_sync = TreeviewSync(self.tree)
+
         vsb = Scrollbar(table_frame, orient=VERTICAL, command=self.tree.yview)
         self.tree.configure(yscrollcommand=vsb.set)
 
@@ -98,30 +124,76 @@ class PatientFrame:
 
         self.tree.bind("<ButtonRelease-1>", self.on_row_select)
 
+        # Re-run the search whenever any tab changes patients (including this one)
+        reference_cache.subscribe("patient", self.fetch_patients, widget=self.tree)
+
         # Initial load
         self.fetch_patients()
 
     # ---------- CRUD operations ----------
+    def on_search_key(self, event):
+        """Debounce typing so a burst of keys runs one search."""
+        if self._after_id is not None:
+            self.tree.after_cancel(self._after_id)
+        self._after_id = self.tree.after(SEARCH_DELAY_MS, self.fetch_patients)
+
     def fetch_patients(self):
-        """Fetch all patients and show them in the table."""
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("SELECT patient_id, first_name, last_name, gender, phone, email FROM patient")
-            rows = cur.fetchall()
-
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            for row in rows:
-                self.tree.insert("", END, values=row)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to fetch patients.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+        """Show the patients matching the search text (newest ones when it is empty)."""
+        self._after_id = None
+        text = self.search_var.get().strip()
+
+        def done(rows):
+            self.table_sync.sync(rows)
+            if len(rows) < PATIENT_LIST_LIMIT:
+                self.status_var.set(f"{len(rows)} patient(s)")
+            elif text:
+                self.status_var.set(f"First {len(rows)} matches - refine the search to see more")
+            else:
+                self.status_var.set(f"Newest {len(rows)} patients - search to find others")
+
+        db_executor.submit(self.tree, self.query_patients, text, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to fetch patients.\n\n{e}"),
+                           key=(id(self), "rows"))
+
+    @staticmethod
+    def query_patients(text):
+        """Worker thread: table rows for the search text."""
+        if text:
+            patients = patient_repo.search(text, limit=PATIENT_LIST_LIMIT)
+        else:
+            patients = patient_repo.newest()
+        return [(p.patient_id, p.first_name, p.last_name, p.gender, p.phone, p.email) for p in patients]
+
+    def import_patients(self):
+        """Bulk-load patients from a CSV / JSONL file in the background."""
+        path = filedialog.askopenfilename(
+            title="Import patients",
+            filetypes=[("Patient files", "*.csv *.jsonl *.ndjson"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+
+        def done(report):
+            self.import_button.config(state=NORMAL)
+            reference_cache.invalidate("patient")
+            details = "\n".join(f"line {line}: {message}" for line, message in report.errors[:10])
+            if report.failed > 10:
+                details += f"\n... {report.failed - 10} more"
+            if report.failed:
+                messagebox.showwarning("Import finished", f"{report.summary()}\n\n{details}")
+            else:
+                messagebox.showinfo("Import finished", report.summary())
+
+        def failed(e):
+            self.import_button.config(state=NORMAL)
+            messagebox.showerror("Error", f"Import failed.\n\n{e}")
+
+        self.import_button.config(state=DISABLED)
+        db_executor.submit(self.tree, import_file, path, on_done=done, on_error=failed)
+
+    def reload_patients(self):
+        """Refresh button: re-run the current search (and refresh other patient lists)."""
+        reference_cache.invalidate("patient")
 
     def add_patient(self):
         """Insert a new patient row."""
@@ -135,25 +207,13 @@ class PatientFrame:
             messagebox.showwarning("Warning", "First and last name are required.")
             return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            sql = """
-                INSERT INTO patient (first_name, last_name, gender, phone, email)
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            cur.execute(sql, (first, last, gender, phone, email))
-            con.commit()
+        def done(_):
             messagebox.showinfo("Success", "Patient added successfully.")
-            self.fetch_patients()
+            reference_cache.invalidate("patient")
             self.clear_form()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to add patient.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, patient_repo.create, first, last, gender, phone, email, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to add patient.\n\n{e}"))
 
     def on_row_select(self, event):
         """Load selected patient into the form."""
@@ -197,31 +257,16 @@ class PatientFrame:
             messagebox.showwarning("Warning", "First and last name are required.")
             return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            sql = """
-                UPDATE patient
-                SET first_name = %s, last_name = %s, gender = %s, phone = %s, email = %s
-                WHERE patient_id = %s
-            """
-            cur.execute(sql, (first, last, gender, phone, email, pid))
-            con.commit()
-
-            if cur.rowcount:
+        def done(found):
+            if found:
                 messagebox.showinfo("Success", "Patient updated successfully.")
             else:
                 messagebox.showinfo("Info", "No patient found with this ID.")
-
-            self.fetch_patients()
+            reference_cache.invalidate("patient")
             self.clear_form()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update patient.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, patient_repo.update, pid, first, last, gender, phone, email, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Error", f"Failed to update patient.\n\n{e}"))
 
     def delete_patient(self):
         """Delete selected patient row by ID (may fail if referenced by appointments)."""
@@ -233,27 +278,19 @@ class PatientFrame:
         if not messagebox.askyesno("Confirm", "Delete this patient? (may fail if there are appointments)"):
             return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("DELETE FROM patient WHERE patient_id = %s", (pid,))
-            con.commit()
-
-            if cur.rowcount:
+        def done(found):
+            if found:
                 messagebox.showinfo("Success", "Patient deleted successfully.")
             else:
                 messagebox.showinfo("Info", "No patient found with this ID.")
-
-            self.fetch_patients()
+            reference_cache.invalidate("patient")
             self.clear_form()
-        except Exception as e:
+
+        def failed(e):
             messagebox.showerror(
                 "Error",
                 "Failed to delete patient.\n"
                 "It might be referenced by some appointments (foreign key constraint).\n\n" + str(e)
             )
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(self.tree, patient_repo.delete, pid, on_done=done, on_error=failed)
@@ -12,13 +12,15 @@ Design:
     - Shows this patient's appointment history (with department + doctor).
     - Allows rating ONLY when doctor_rating is NULL.
     - Rating options: 5.0 down to 1.0 in steps of 0.5 (matches your UI requirement).
-    - On submit:
+    - On submit (services.RatingService.submit, on a worker thread):
         1) Update appointment.doctor_rating
-        2) Recompute doctor.avg_rating from appointment table (AVG of non-NULL ratings)
+        2) Apply the rating as a delta to doctor.rating_sum / rating_count / avg_rating
+           (see ratings.py; no AVG scan over the doctor's appointments)
 
 Database assumptions:
     - appointment has column doctor_rating DECIMAL(2,1) NULL
     - doctor has column avg_rating DECIMAL(3,2) NULL
+    - doctor has columns rating_sum / rating_count (see ratings.RATING_COLUMNS_DDL)
 """
 
 from __future__ import annotations
@@ -26,14 +28,18 @@ from __future__ import annotations
 from tkinter import *
 from tkinter import ttk, messagebox
 
-from db_config import get_connection
+from table_sync import TreeviewSync
+from db_executor import db_executor
+from reference_cache import reference_cache
+from services import rating_service, RatingHistoryRow
 
 
 class RatingClientFrame:
     """A tab for clients to rate their appointments."""
 
-    def __init__(self, parent, patient_id: int):
+    def __init__(self, parent, patient_id: int, context=None):
         self.patient_id = patient_id
+        self.context = context   # session.SessionContext shared with the user's other windows
 
         # -------------------- UI variables --------------------
         self.selected_appt_id = StringVar()
@@ -114,6 +120,8 @@ class RatingClientFrame:
         self.tree.column("time", width=90)
         self.tree.column("rating", width=110)
 
+        self.table_sync = TreeviewSync(self.tree)
+
         vsb = Scrollbar(table, orient=VERTICAL, command=self.tree.yview)
         self.tree.configure(yscrollcommand=vsb.set)
         self.tree.pack(side=LEFT, fill=BOTH, expand=True)
@@ -121,53 +129,41 @@ class RatingClientFrame:
 
         self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
-        # Initial load
-        self.refresh()
+        # Initial load (reuses a history another window of this session just loaded)
+        self.refresh(shared=True)
 
     # =========================================================
     # Data loading
     # =========================================================
-    def refresh(self) -> None:
-        """Reload this patient's appointments into the table."""
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute(
-                """
-                SELECT a.appointment_id,
-                       dep.name AS department_name,
-                       CONCAT(d.doctor_id, ' - ', d.first_name, ' ', d.last_name) AS doctor_display,
-                       a.appointment_date,
-                       a.appointment_time,
-                       a.doctor_rating,
-                       d.doctor_id
-                FROM appointment a
-                JOIN doctor d ON a.doctor_id = d.doctor_id
-                JOIN department dep ON d.department_id = dep.department_id
-                WHERE a.patient_id = %s
-                ORDER BY a.appointment_date DESC, a.appointment_time DESC
-                """,
-                (self.patient_id,),
-            )
-            rows = cur.fetchall()
-
-            # clear table
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            # insert rows; keep doctor_id hidden via tags/values mapping
-            for r in rows:
-                appt_id, dep_name, doctor_display, appt_date, appt_time, doctor_rating, doctor_id = r
-                rating_text = "" if doctor_rating is None else f"{float(doctor_rating):.1f}"
-                time_text = str(appt_time)[:5]
-                self.tree.insert("", END, values=(appt_id, dep_name, doctor_display, str(appt_date), time_text, rating_text), tags=(str(doctor_id),))
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load appointments.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+    def refresh(self, shared: bool = False) -> None:
+        """Reload this patient's appointments into the table (in the background)."""
+        db_executor.submit(
+            self.tree,
+            self.query_appointments,
+            shared,
+            on_done=self.show_appointments,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to load appointments.\n\n{e}"),
+            key=(id(self), "refresh"),
+        )
+
+    def query_appointments(self, shared: bool = False) -> list[RatingHistoryRow]:
+        """Worker thread: fetch this patient's appointments, newest first."""
+        if self.context is None:
+            return rating_service.history(self.patient_id)
+        if shared:
+            return self.context.fetch("rating_history", rating_service.history, self.patient_id)
+        rows = rating_service.history(self.patient_id)
+        self.context.put("rating_history", rows)
+        return rows
+
+    def show_appointments(self, rows: list[RatingHistoryRow]) -> None:
+        """Sync rows by appointment_id; keep doctor_id hidden via tags."""
+        table_rows = []
+        for r in rows:
+            rating_text = "" if r.doctor_rating is None else f"{r.doctor_rating:.1f}"
+            table_rows.append((r.appointment_id, r.department_name, r.doctor_display,
+                               r.appointment_date, r.appointment_time, rating_text, r.doctor_id))
+        self.table_sync.sync(table_rows, columns=6, tags=lambda r: (str(r[6]),))
 
     def force_refresh(self) -> None:
         """Allow parent tabs to force a refresh when the tab is shown."""
@@ -222,7 +218,6 @@ class RatingClientFrame:
     def submit_rating(self) -> None:
         """Submit a doctor rating for the selected appointment (only if unrated)."""
         appt_id = self.selected_appt_id.get().strip()
-        doctor_id = self.selected_doctor_id.get().strip()
         current_rating = self.selected_current_rating.get().strip()
         new_rating = self.new_rating_var.get().strip()
 
@@ -235,48 +230,28 @@ class RatingClientFrame:
         if not new_rating:
             messagebox.showwarning("Missing", "Please choose a new rating (5.0 ~ 1.0).")
             return
-        if not doctor_id:
-            messagebox.showerror("Error", "Internal error: doctor_id not found for selected row.")
-            return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-
-            # 1) Update the appointment rating
-            cur.execute(
-                """
-                UPDATE appointment
-                SET doctor_rating = %s
-                WHERE appointment_id = %s AND patient_id = %s AND doctor_rating IS NULL
-                """,
-                (new_rating, appt_id, self.patient_id),
-            )
-
-            # 2) Recompute doctor's avg_rating from all ratings
-            cur.execute(
-                """
-                UPDATE doctor d
-                SET d.avg_rating = (
-                    SELECT AVG(a.doctor_rating)
-                    FROM appointment a
-                    WHERE a.doctor_id = d.doctor_id AND a.doctor_rating IS NOT NULL
-                )
-                WHERE d.doctor_id = %s
-                """,
-                (doctor_id,),
-            )
-
-            con.commit()
+        def done(stored):
+            if not stored:
+                messagebox.showwarning("Not Allowed", "This appointment is already rated.")
+                self.refresh()
+                self.clear_selection()
+                return
+            # Doctor averages changed: let open tabs reload their doctor data
+            reference_cache.invalidate("doctor")
             messagebox.showinfo("Success", "Rating submitted and doctor average updated.")
-
             # Refresh UI
             self.refresh()
             self.clear_selection()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to submit rating.\n\n{e}")
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
+
+        db_executor.submit(
+            self.tree,
+            self.save_rating,
+            appt_id, new_rating,
+            on_done=done,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to submit rating.\n\n{e}"),
+        )
+
+    def save_rating(self, appt_id: str, new_rating: str) -> bool:
+        """Worker thread: store the rating; False if the appointment was already rated."""
+        return rating_service.submit(self.patient_id, appt_id, new_rating)
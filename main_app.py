@@ -2,7 +2,10 @@
 main_app.py (v4 - Clean Register + No Bind Patient)
 ---------------------------------------------------
 Login:
-    - username + password
+    - username + password (checked against a salted hash on a worker
+      thread, see credentials.py; the window stays responsive meanwhile)
+    - "Return to Login" only hides the portal; logging in again as the same
+      user before the session idles out shows it again (see session.py)
     - admin → AdminPortal
     - client → ClientPortal (bound patient_id)
 
@@ -18,9 +21,13 @@ NO MORE: Bind Patient dropdown
 
 from tkinter import *
 from tkinter import ttk, messagebox
-from db_config import get_connection
+from services import account_repo
+from db_executor import db_executor
+from session import session_manager
+from reference_cache import reference_cache
 from admin_portal import AdminPortal
 from client_portal import ClientPortal
+from ui_profiler import install_from_environment as install_ui_profiler
 
 
 class MainApp:
@@ -32,6 +39,7 @@ class MainApp:
 
         self.username_var = StringVar()
         self.password_var = StringVar()
+        self.busy = False   # a login / registration is being checked
 
         # Variables for registration
         self.reg_first_var = StringVar()
@@ -67,8 +75,8 @@ class MainApp:
         btn_row = Frame(self.root, bg="white")
         btn_row.pack(pady=20)
 
-        Button(btn_row, text="Login", width=12,
-               command=self.handle_login).grid(row=0, column=0, padx=10)
+        self.login_button = Button(btn_row, text="Login", width=12, command=self.handle_login)
+        self.login_button.grid(row=0, column=0, padx=10)
 
         Button(btn_row, text="Register", width=12,
                command=self.build_register_ui).grid(row=0, column=1, padx=10)
@@ -103,7 +111,8 @@ class MainApp:
             Label(frame, text=label, bg="white").grid(row=i, column=0, sticky="e", padx=5, pady=5)
             Entry(frame, textvariable=var, width=25).grid(row=i, column=1, padx=5)
 
-        Button(frame, text="Submit", width=12, command=self.handle_register).grid(row=10, column=0, pady=15)
+        self.submit_button = Button(frame, text="Submit", width=12, command=self.handle_register)
+        self.submit_button.grid(row=10, column=0, pady=15)
         Button(frame, text="Back", width=12, command=self.build_login_ui).grid(row=10, column=1, pady=15)
 
     # ---------------- LOGIN LOGIC ----------------
@@ -114,37 +123,57 @@ class MainApp:
         if not username or not password:
             messagebox.showwarning("Warning", "Enter username and password.")
             return
+        if self.busy:
+            return
+
+        self.set_busy(self.login_button, True)
+        session = session_manager.resume(username, password)
+        if session is not None:
+            # No password hash, but the account may have changed since the login
+            db_executor.submit(self.root, account_repo.find_by_username, username,
+                               on_done=lambda account: self.resume_done(session, account, password),
+                               on_error=self.login_failed)
+            return
+        self.authenticate(username, password)
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-            cur.execute("""
-                SELECT user_id, username, password, role, patient_id
-                FROM user_account WHERE username=%s
-            """, (username,))
-            row = cur.fetchone()
-        except Exception as e:
-            messagebox.showerror("Error", f"Database query failed:\n{e}")
+    def authenticate(self, username, password):
+        db_executor.submit(self.root, account_repo.authenticate, username, password,
+                           on_done=lambda account: self.login_done(account, password),
+                           on_error=self.login_failed)
+
+    def resume_done(self, session, account, password):
+        if session_manager.confirm(session, account):
+            self.set_busy(self.login_button, False)
+            session_manager.open_window(self.root, session, self.build_portal)
             return
+        # Deleted account, new role or new password: full login check
+        self.authenticate(session.username, password)
+
+    def login_failed(self, e):
+        self.set_busy(self.login_button, False)
+        messagebox.showerror("Error", f"Database query failed:\n{e}")
 
-        if not row or row[2] != password:
+    def login_done(self, account, password):
+        self.set_busy(self.login_button, False)
+        if not account:
             messagebox.showerror("Error", "Invalid username or password.")
             return
 
-        role = row[3]
         user_info = {
-            "user_id": row[0],
-            "username": row[1],
-            "role": role,
-            "patient_id": row[4],
+            "user_id": account.user_id,
+            "username": account.username,
+            "role": account.role,
+            "patient_id": account.patient_id,
         }
+        session = session_manager.start(user_info, password, account)
+        session_manager.open_window(self.root, session, self.build_portal)
 
-        if role == "admin":
-            win = Toplevel(self.root)
-            AdminPortal(win)
-        else:
-            win = Toplevel(self.root)
-            ClientPortal(win, user_info)
+    def build_portal(self, win, session):
+        """Portal for a new window of `session` (called by session_manager)."""
+        leave = lambda: session_manager.leave(win)
+        if session.user_info["role"] == "admin":
+            return AdminPortal(win, context=session.context, on_return=leave)
+        return ClientPortal(win, session.user_info, context=session.context, on_return=leave)
 
     # ---------------- REGISTER LOGIC ----------------
     def handle_register(self):
@@ -161,33 +190,35 @@ class MainApp:
         if not all(data.values()):
             messagebox.showwarning("Warning", "All fields are required.")
             return
+        if self.busy:
+            return
 
-        try:
-            con = get_connection()
-            cur = con.cursor()
-
-            # 1. Insert patient
-            cur.execute("""
-                INSERT INTO patient(first_name, last_name, gender, phone, email)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (data["first"], data["last"], data["gender"], data["phone"], data["email"]))
-            patient_id = cur.lastrowid
-
-            # 2. Insert into user_account
-            cur.execute("""
-                INSERT INTO user_account(username, password, role, patient_id)
-                VALUES (%s, %s, 'client', %s)
-            """, (data["username"], data["password"], patient_id))
-
-            con.commit()
+        def done(_):
+            self.set_busy(self.submit_button, False)
+            reference_cache.invalidate("patient")
             messagebox.showinfo("Success", "Registration successful!")
             self.build_login_ui()
 
-        except Exception as e:
+        def failed(e):
+            self.set_busy(self.submit_button, False)
             messagebox.showerror("Error", f"Registration failed:\n{e}")
 
+        # Hashing the password takes a noticeable moment; keep the window responsive
+        self.set_busy(self.submit_button, True)
+        db_executor.submit(self.root, account_repo.register_client,
+                           data["first"], data["last"], data["gender"], data["phone"],
+                           data["email"], data["username"], data["password"],
+                           on_done=done, on_error=failed)
+
+    def set_busy(self, button, busy):
+        self.busy = busy
+        self.root.config(cursor="watch" if busy else "")
+        if button.winfo_exists():   # the user may have switched screens meanwhile
+            button.config(state=DISABLED if busy else NORMAL)
+
 
 if __name__ == "__main__":
+    install_ui_profiler()   # CLINIC_UI_PROFILE=1
     root = Tk()
     MainApp(root)
     root.mainloop()
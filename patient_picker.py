@@ -0,0 +1,118 @@
+"""
+patient_picker.py
+-----------------
+Type-ahead patient search for the admin appointment form.
+
+The form used to load every patient into a read-only combobox as
+"id - first last" strings and parse the id back out with split("-").
+PatientPicker is an editable combobox instead: typing runs a bounded,
+index-friendly prefix search (debounced, on the DB executor) over
+
+    - patient_id (exact, when the text is a number)
+    - first_name / last_name (prefix; "ann sm" matches Ann Smith)
+    - phone and email (prefix)
+
+and lists at most services.PATIENT_SEARCH_LIMIT matches (PatientRepo.search).
+The chosen patient's id is kept alongside the display text, so nothing is
+parsed back out of the string.
+
+Indexes the search relies on (see services.PATIENT_SEARCH_INDEXES):
+    patient(last_name, first_name), patient(first_name), patient(phone), patient(email)
+"""
+
+from tkinter import *
+from tkinter import ttk
+
+from db_executor import db_executor
+from reference_cache import reference_cache
+from services import patient_repo
+
+
+SEARCH_DELAY_MS = 150
+
+
+def format_patient(patient):
+    """Display text for a services.Patient."""
+    contact = patient.phone or patient.email or ""
+    text = f"{patient.first_name} {patient.last_name}  #{patient.patient_id}"
+    return f"{text}  ({contact})" if contact else text
+
+
+class PatientPicker:
+    """Editable combobox that searches patients as the user types."""
+
+    def __init__(self, parent, width=28):
+        self.text_var = StringVar()
+        self.combo = ttk.Combobox(parent, textvariable=self.text_var, width=width)
+        self.results = []
+        self.patient_id = None
+        self.display = ""
+        self._after_id = None
+
+        self.combo.bind("<KeyRelease>", self.on_key)
+        self.combo.bind("<<ComboboxSelected>>", self.on_selected)
+
+        # Patient edits elsewhere may change names in the result list
+        reference_cache.subscribe("patient", self.search_now, widget=self.combo)
+
+    def grid(self, **kw):
+        self.combo.grid(**kw)
+
+    # ---------- public ----------
+    def get_patient_id(self):
+        """Id of the chosen patient, or None while the text does not match a choice."""
+        if self.patient_id is not None and self.text_var.get() == self.display:
+            return self.patient_id
+        return None
+
+    def set_patient(self, patient_id, display):
+        self.cancel_pending()
+        self.patient_id = patient_id
+        self.display = display
+        self.text_var.set(display)
+
+    def clear(self):
+        self.cancel_pending()
+        self.patient_id = None
+        self.display = ""
+        self.results = []
+        self.text_var.set("")
+        self.combo["values"] = []
+
+    # ---------- search ----------
+    def on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        if self.text_var.get() == self.display:
+            return
+        self.patient_id = None
+        if self._after_id is not None:
+            self.combo.after_cancel(self._after_id)
+        self._after_id = self.combo.after(SEARCH_DELAY_MS, self.search_now)
+
+    def search_now(self):
+        self._after_id = None
+        text = self.text_var.get()
+        if not text.strip() or text == self.display:
+            db_executor.cancel((id(self), "search"))
+            return
+        db_executor.submit(self.combo, patient_repo.search, text,
+                           on_done=self.show_results, key=(id(self), "search"))
+
+    def show_results(self, rows):
+        self.results = rows
+        self.combo["values"] = [format_patient(r) for r in rows]
+
+    def on_selected(self, _):
+        index = self.combo.current()
+        if 0 <= index < len(self.results):
+            row = self.results[index]
+            self.patient_id = row.patient_id
+            self.display = format_patient(row)
+            self.text_var.set(self.display)
+
+    def cancel_pending(self):
+        if self._after_id is not None:
+            self.combo.after_cancel(self._after_id)
+            self._after_id = None
+        db_executor.cancel((id(self), "search"))
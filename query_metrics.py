@@ -0,0 +1,388 @@
+"""
+query_metrics.py
+----------------
+Per-query timings for every database call, with call sites.
+
+db_config hands out cursors wrapped in a TracingCursor, and it times pool
+checkouts too. Each statement is recorded in the process-wide registry
+`query_metrics`:
+
+    - calls, total / max execute time, fetch time, rows and errors
+    - keyed by the normalized SQL (literals and IN lists collapsed) and
+      the call site: the app method that ran it, plus the UI or API
+      method that started the work, e.g.
+          "AppointmentAdminFrame.fetch_appointment_page > AppointmentService.page"
+    - a latency histogram per call site
+
+Statements slower than `slow_threshold` (SLOW_QUERY_MS, or the
+CLINIC_SLOW_QUERY_MS environment variable) go to the "clinic.slow_query"
+logger and to a short in-memory list. Set CLINIC_SLOW_QUERY_LOG to a file
+path to also write that log to a file. Query parameters are never logged.
+
+Reading the numbers:
+    print(query_metrics.report())          # top call sites by total time
+    query_metrics.to_json()                # full snapshot
+    query_metrics.to_prometheus()          # text exposition format
+
+The API server serves the last two at GET /metrics.json and GET /metrics.
+With CLINIC_QUERY_METRICS_DUMP=path, the JSON snapshot is written when the
+process exits. CLINIC_QUERY_METRICS=0 turns tracing off.
+"""
+
+import atexit
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+
+SLOW_QUERY_MS = 200
+SLOW_LOG_SIZE = 100
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MAX_STACK_DEPTH = 40
+
+# Modules that are plumbing, not call sites
+_PLUMBING_MODULES = {"query_metrics", "db_config", "contextlib", "threading", "concurrent.futures.thread",
+                     "asyncio.events", "asyncio.base_events", "functools"}
+# Modules whose methods start work on behalf of a user (the "origin" of a call site)
+_ORIGIN_PREFIXES = ("frames_", "admin_portal", "client_portal", "main_app", "patient_picker",
+                    "api_server", "bench.")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.I)
+
+slow_log = logging.getLogger("clinic.slow_query")
+
+
+def normalize_sql(sql):
+    """Collapse whitespace, literals and IN (...) placeholder lists, so equal queries share one key."""
+    sql = _WHITESPACE_RE.sub(" ", sql).strip()
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return sql
+
+
+def _qualified_name(frame):
+    code = frame.f_code
+    name = getattr(code, "co_qualname", None)
+    if name and "<locals>" not in name:
+        return name
+    owner = frame.f_locals.get("self")
+    if owner is not None:
+        return f"{type(owner).__name__}.{code.co_name}"
+    return code.co_name
+
+
+def call_site(skip=1):
+    """
+    "Origin > site" for the current stack: `site` is the innermost app
+    method outside the DB plumbing; `origin` is the nearest frame / portal /
+    API method above it (left out when the site is itself one of those).
+    """
+    frame = sys._getframe(skip)
+    site = None
+    depth = 0
+    while frame is not None and depth < MAX_STACK_DEPTH:
+        module = frame.f_globals.get("__name__", "")
+        if module not in _PLUMBING_MODULES:
+            if site is None:
+                site = _qualified_name(frame)
+                if module.startswith(_ORIGIN_PREFIXES):
+                    return site
+            elif module.startswith(_ORIGIN_PREFIXES):
+                return f"{_qualified_name(frame)} > {site}"
+        frame = frame.f_back
+        depth += 1
+    return site or "<unknown>"
+
+
+class _QueryStats:
+    __slots__ = ("calls", "errors", "total", "max", "fetch", "rows")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0   # execute time, seconds
+        self.max = 0.0
+        self.fetch = 0.0   # time spent in fetch*(), seconds
+        self.rows = 0
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * len(HISTOGRAM_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+
+class QueryMetrics:
+    """Thread-safe in-process registry of query and checkout timings."""
+
+    def __init__(self, enabled=True, slow_threshold=SLOW_QUERY_MS / 1000):
+        self.enabled = enabled
+        self.slow_threshold = slow_threshold
+        self._lock = threading.Lock()
+        self._queries = {}      # (site, normalized sql) -> _QueryStats
+        self._histograms = {}   # site -> _Histogram
+        self._checkouts = {}    # site -> [count, total seconds, max seconds]
+        self._slow = deque(maxlen=SLOW_LOG_SIZE)
+        self._slow_total = 0
+        self.started_at = time.time()
+
+    # ---------- recording ----------
+    def record_query(self, site, sql, seconds, rows=0, error=False):
+        key = (site, normalize_sql(sql))
+        with self._lock:
+            stats = self._queries.get(key)
+            if stats is None:
+                stats = self._queries[key] = _QueryStats()
+            stats.calls += 1
+            stats.total += seconds
+            stats.rows += rows
+            if seconds > stats.max:
+                stats.max = seconds
+            if error:
+                stats.errors += 1
+            histogram = self._histograms.get(site)
+            if histogram is None:
+                histogram = self._histograms[site] = _Histogram()
+            histogram.observe(seconds)
+        if seconds >= self.slow_threshold:
+            self._record_slow(site, key[1], seconds)
+        return key
+
+    def record_fetch(self, key, seconds, rows):
+        with self._lock:
+            stats = self._queries.get(key)
+            if stats is not None:
+                stats.fetch += seconds
+                stats.rows += rows
+
+    def record_checkout(self, site, seconds):
+        with self._lock:
+            entry = self._checkouts.get(site)
+            if entry is None:
+                entry = self._checkouts[site] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+    def _record_slow(self, site, sql, seconds):
+        entry = {"at": time.strftime("%Y-%m-%d %H:%M:%S"), "site": site,
+                 "ms": round(seconds * 1000, 2), "sql": sql}
+        with self._lock:
+            self._slow.append(entry)
+            self._slow_total += 1
+        slow_log.warning("slow query %.1f ms at %s: %s", seconds * 1000, site, sql)
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._histograms.clear()
+            self._checkouts.clear()
+            self._slow.clear()
+            self._slow_total = 0
+            self.started_at = time.time()
+
+    # ---------- reading ----------
+    def snapshot(self):
+        """Plain dict of everything recorded; queries sorted by total time, slowest first."""
+        with self._lock:
+            queries = [
+                {"site": site, "sql": sql, "calls": s.calls, "errors": s.errors, "rows": s.rows,
+                 "total_ms": round(s.total * 1000, 3), "avg_ms": round(s.total * 1000 / s.calls, 3),
+                 "max_ms": round(s.max * 1000, 3), "fetch_ms": round(s.fetch * 1000, 3)}
+                for (site, sql), s in self._queries.items()
+            ]
+            checkouts = [
+                {"site": site, "count": c, "total_ms": round(t * 1000, 3), "max_ms": round(m * 1000, 3)}
+                for site, (c, t, m) in self._checkouts.items()
+            ]
+            slow = list(self._slow)
+            slow_total = self._slow_total
+        queries.sort(key=lambda q: q["total_ms"] + q["fetch_ms"], reverse=True)
+        checkouts.sort(key=lambda c: c["total_ms"], reverse=True)
+        return {"since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+                "slow_threshold_ms": round(self.slow_threshold * 1000, 3),
+                "queries": queries, "checkouts": checkouts,
+                "slow_queries_total": slow_total, "slow_queries": slow}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+
+    def report(self, limit=15):
+        """Text table of the call sites that spent the most time in the database."""
+        by_site = {}
+        for q in self.snapshot()["queries"]:
+            row = by_site.setdefault(q["site"], [0, 0.0, 0.0, 0])
+            row[0] += q["calls"]
+            row[1] += q["total_ms"] + q["fetch_ms"]
+            row[2] = max(row[2], q["max_ms"])
+            row[3] += q["rows"]
+        rows = sorted(by_site.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        width = max([len(site) for site, _ in rows] + [9])
+        lines = [f"{'call site':<{width}}{'calls':>8}{'total ms':>12}{'avg ms':>9}{'max ms':>9}{'rows':>10}",
+                 "-" * (width + 48)]
+        for site, (calls, total, worst, nrows) in rows:
+            lines.append(f"{site:<{width}}{calls:>8}{total:>12.1f}{total / calls:>9.2f}{worst:>9.2f}{nrows:>10}")
+        return "\n".join(lines)
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (per call site; SQL text is kept out of the labels)."""
+        with self._lock:
+            sites = {}
+            for (site, _), s in self._queries.items():
+                agg = sites.setdefault(site, [0, 0, 0.0, 0.0, 0])
+                agg[0] += s.calls
+                agg[1] += s.errors
+                agg[2] += s.total
+                agg[3] += s.fetch
+                agg[4] += s.rows
+            histograms = {site: (list(h.counts), h.count, h.sum) for site, h in self._histograms.items()}
+            checkouts = {site: tuple(v) for site, v in self._checkouts.items()}
+            slow_total = self._slow_total
+
+        def label(site):
+            return site.replace("\\", "\\\\").replace('"', '\\"')
+
+        out = []
+
+        def family(name, kind, help_text, samples):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(samples)
+
+        family("clinic_db_queries_total", "counter", "Statements executed.",
+               [f'clinic_db_queries_total{{site="{label(s)}"}} {v[0]}' for s, v in sites.items()])
+        family("clinic_db_query_errors_total", "counter", "Statements that raised.",
+               [f'clinic_db_query_errors_total{{site="{label(s)}"}} {v[1]}' for s, v in sites.items()])
+        family("clinic_db_fetch_seconds_total", "counter", "Time spent fetching result rows.",
+               [f'clinic_db_fetch_seconds_total{{site="{label(s)}"}} {v[3]:.6f}' for s, v in sites.items()])
+        family("clinic_db_rows_total", "counter", "Rows fetched or affected.",
+               [f'clinic_db_rows_total{{site="{label(s)}"}} {v[4]}' for s, v in sites.items()])
+
+        samples = []
+        for site, (counts, count, total) in histograms.items():
+            cumulative = 0
+            for bound, n in zip(HISTOGRAM_BUCKETS, counts):
+                cumulative += n
+                samples.append(f'clinic_db_query_duration_seconds_bucket{{site="{label(site)}",le="{bound}"}} {cumulative}')
+            samples.append(f'clinic_db_query_duration_seconds_bucket{{site="{label(site)}",le="+Inf"}} {count}')
+            samples.append(f'clinic_db_query_duration_seconds_sum{{site="{label(site)}"}} {total:.6f}')
+            samples.append(f'clinic_db_query_duration_seconds_count{{site="{label(site)}"}} {count}')
+        family("clinic_db_query_duration_seconds", "histogram", "Statement execute time.", samples)
+
+        family("clinic_db_checkouts_total", "counter", "Connections checked out of the pool.",
+               [f'clinic_db_checkouts_total{{site="{label(s)}"}} {v[0]}' for s, v in checkouts.items()])
+        family("clinic_db_checkout_seconds_total", "counter", "Time spent waiting for a pooled connection.",
+               [f'clinic_db_checkout_seconds_total{{site="{label(s)}"}} {v[1]:.6f}' for s, v in checkouts.items()])
+        family("clinic_db_slow_queries_total", "counter", "Statements slower than the slow-query threshold.",
+               [f"clinic_db_slow_queries_total {slow_total}"])
+        return "\n".join(out) + "\n"
+
+
+class TracingCursor:
+    """DB-API cursor wrapper that reports every execute / fetch to a QueryMetrics registry."""
+
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._key = None
+
+    def execute(self, sql, params=None):
+        return self._run(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq):
+        return self._run(self._cursor.executemany, sql, seq)
+
+    def _run(self, method, sql, params):
+        site = call_site(2)
+        started = time.perf_counter()
+        try:
+            result = method(sql, params) if params is not None else method(sql)
+        except Exception:
+            self._key = None
+            self._metrics.record_query(site, sql, time.perf_counter() - started, error=True)
+            raise
+        elapsed = time.perf_counter() - started
+        # writes report affected rows now; reads count rows as they are fetched
+        rows = 0 if self._cursor.description is not None else max(self._cursor.rowcount or 0, 0)
+        self._key = self._metrics.record_query(site, sql, elapsed, rows)
+        return result
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        if self._key is not None:
+            if result is None:
+                rows = 0
+            elif isinstance(result, (list, tuple)) and (not result or isinstance(result[0], (list, tuple, dict))):
+                rows = len(result)
+            else:
+                rows = 1
+            self._metrics.record_fetch(self._key, time.perf_counter() - started, rows)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(self._cursor.fetchmany, *(() if size is None else (size,)))
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _from_environment():
+    metrics = QueryMetrics(enabled=os.environ.get("CLINIC_QUERY_METRICS", "1") != "0")
+    threshold = os.environ.get("CLINIC_SLOW_QUERY_MS")
+    if threshold:
+        metrics.slow_threshold = float(threshold) / 1000
+    log_path = os.environ.get("CLINIC_SLOW_QUERY_LOG")
+    if log_path:
+        handler = logging.FileHandler(log_path, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_log.addHandler(handler)
+    dump_path = os.environ.get("CLINIC_QUERY_METRICS_DUMP")
+    if dump_path:
+        atexit.register(metrics.dump_json, dump_path)
+    return metrics
+
+
+# Process-wide registry used by db_config.
+query_metrics = _from_environment()
@@ -0,0 +1,122 @@
+"""
+ratings.py
+----------
+Incrementally maintained doctor rating aggregates.
+
+`doctor` keeps a running `rating_sum` and `rating_count` next to
+`avg_rating`. Every rating write applies a constant-time delta instead of
+recomputing AVG(doctor_rating) over all of the doctor's appointments:
+
+    apply_rating_change(cur, doctor_id, old_rating, new_rating)
+
+    - insert with a rating:     old=None,   new=4.5
+    - rating changed:           old=3.0,    new=4.5
+    - rating removed / delete:  old=4.5,    new=None
+
+`reconcile_ratings()` rebuilds the aggregates from scratch (run it after
+bulk edits, or periodically as a safety net):
+
+    python ratings.py add-columns          # one-off: add the aggregate columns
+                                           # (also part of `python schema.py migrate`)
+    python ratings.py reconcile            # every doctor
+    python ratings.py reconcile 42         # one doctor
+
+Database assumptions (see RATING_COLUMNS_DDL):
+    - doctor.rating_sum   DECIMAL(10,1) NOT NULL DEFAULT 0
+    - doctor.rating_count INT NOT NULL DEFAULT 0
+"""
+
+import sys
+from decimal import Decimal
+
+from db_config import pooled_connection
+
+
+RATING_COLUMNS_DDL = [
+    "ALTER TABLE doctor ADD COLUMN rating_sum DECIMAL(10,1) NOT NULL DEFAULT 0",
+    "ALTER TABLE doctor ADD COLUMN rating_count INT NOT NULL DEFAULT 0",
+]
+
+# Params: count_delta, sum_delta, count_delta, sum_delta, count_delta, doctor_id
+RATING_DELTA_SQL = """
+    UPDATE doctor
+    SET avg_rating = CASE WHEN rating_count + %s > 0
+                          THEN (rating_sum + %s) / (rating_count + %s)
+                          ELSE NULL END,
+        rating_sum = rating_sum + %s,
+        rating_count = rating_count + %s
+    WHERE doctor_id = %s
+"""
+
+
+def _to_decimal(rating):
+    if rating is None or rating == "":
+        return None
+    return Decimal(str(rating))
+
+
+def apply_rating_change(cursor, doctor_id, old_rating=None, new_rating=None):
+    """
+    Apply a rating delta to doctor.rating_sum / rating_count / avg_rating.
+
+    Runs inside the caller's transaction (the caller commits). The avg is
+    assigned first and computed from explicit deltas, so the statement gives
+    the same result whether the engine evaluates SET left-to-right (MySQL)
+    or against the old row (standard SQL). Returns True if anything changed.
+    """
+    old_rating = _to_decimal(old_rating)
+    new_rating = _to_decimal(new_rating)
+
+    sum_delta = (new_rating or 0) - (old_rating or 0)
+    count_delta = (new_rating is not None) - (old_rating is not None)
+    if sum_delta == 0 and count_delta == 0:
+        return False
+
+    cursor.execute(RATING_DELTA_SQL, (count_delta, sum_delta, count_delta, sum_delta, count_delta, doctor_id))
+    return True
+
+
+def reconcile_ratings(cursor, doctor_id=None):
+    """Rebuild rating_sum / rating_count / avg_rating from the appointment table."""
+    query = """
+        UPDATE doctor
+        SET rating_sum = COALESCE((SELECT SUM(a.doctor_rating) FROM appointment a
+                                   WHERE a.doctor_id = doctor.doctor_id), 0),
+            rating_count = (SELECT COUNT(a.doctor_rating) FROM appointment a
+                            WHERE a.doctor_id = doctor.doctor_id),
+            avg_rating = (SELECT AVG(a.doctor_rating) FROM appointment a
+                          WHERE a.doctor_id = doctor.doctor_id)
+    """
+    params = ()
+    if doctor_id is not None:
+        query += " WHERE doctor_id = %s"
+        params = (doctor_id,)
+    cursor.execute(query, params)
+    return cursor.rowcount
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else ""
+    if command == "add-columns":
+        with pooled_connection() as con:
+            cur = con.cursor()
+            for ddl in RATING_COLUMNS_DDL:
+                cur.execute(ddl)
+            reconcile_ratings(cur)
+            con.commit()
+        print("Added rating_sum / rating_count and reconciled them.")
+        return 0
+    if command == "reconcile":
+        doctor_id = int(argv[2]) if len(argv) > 2 else None
+        with pooled_connection() as con:
+            cur = con.cursor()
+            count = reconcile_ratings(cur, doctor_id)
+            con.commit()
+        print(f"Reconciled rating aggregates for {count} doctor(s).")
+        return 0
+    print("usage: python ratings.py add-columns | reconcile [doctor_id]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,168 @@
+"""
+reference_cache.py
+------------------
+Process-wide cache of the small reference tables: department and doctor.
+
+Every tab used to query these tables on its own (and DoctorFrame re-read
+departments on every refresh). Now each table is loaded once and shared:
+
+    reference_cache.departments()              -> [(department_id, name, min_doctors, max_doctors), ...]
+    reference_cache.doctors()                  -> [(doctor_id, first_name, last_name, department_id,
+                                                    phone, email, avg_rating, specialty, bio), ...]
+    reference_cache.doctors_for_department(id) -> subset of doctors()
+
+The patient table is not cached: it grows with the clinic, so screens page or
+search it through services.PatientRepo. It is still a subscription topic, so
+`invalidate("patient")` tells open patient lists to re-run their query.
+
+Entries expire after REFERENCE_TTL seconds. CRUD code calls
+`reference_cache.invalidate("doctor")` etc. after a successful write; that
+drops the table and fires the callbacks registered with `subscribe()`, so
+other open tabs can refresh their combos. Call invalidate() from the Tk
+thread when subscribers touch widgets.
+"""
+
+import threading
+import time
+
+from db_config import pooled_connection
+
+
+REFERENCE_TTL = 300.0
+
+REFERENCE_QUERIES = {
+    "department": """
+        SELECT department_id, name, min_doctors, max_doctors
+        FROM department
+        ORDER BY department_id
+    """,
+    "doctor": """
+        SELECT doctor_id, first_name, last_name, department_id,
+               phone, email, avg_rating, specialty, bio
+        FROM doctor
+        ORDER BY doctor_id
+    """,
+}
+
+# Tables that are never cached but can still be invalidated / subscribed to
+NOTIFY_ONLY = ("patient",)
+
+
+class ReferenceCache:
+    """TTL cache of whole reference tables with explicit invalidation."""
+
+    def __init__(self, ttl=REFERENCE_TTL):
+        self.ttl = ttl
+        self._rows = {}        # table -> list of row tuples
+        self._loaded_at = {}   # table -> monotonic load time
+        self._derived = {}     # (table, name) -> value computed from the rows
+        self._subscribers = {table: [] for table in (*REFERENCE_QUERIES, *NOTIFY_ONLY)}
+        self._lock = threading.Lock()
+        self._load_locks = {table: threading.Lock() for table in REFERENCE_QUERIES}
+
+    # ---------- reads ----------
+    def get(self, table):
+        """Return all cached rows of `table`, loading them if missing or expired."""
+        rows = self._fresh_rows(table)
+        if rows is not None:
+            return rows
+        # One loader per table; concurrent callers wait and reuse its result
+        with self._load_locks[table]:
+            rows = self._fresh_rows(table)
+            if rows is not None:
+                return rows
+            with pooled_connection() as con:
+                cur = con.cursor()
+                cur.execute(REFERENCE_QUERIES[table])
+                rows = list(cur.fetchall())
+            with self._lock:
+                self._rows[table] = rows
+                self._loaded_at[table] = time.monotonic()
+                self._derived = {k: v for k, v in self._derived.items() if k[0] != table}
+            return rows
+
+    def departments(self):
+        return self.get("department")
+
+    def doctors(self):
+        return self.get("doctor")
+
+    def department_names(self):
+        """{department_id: name}"""
+        return self._derive("department", "names", lambda rows: {r[0]: r[1] for r in rows})
+
+    def doctors_for_department(self, dept_id):
+        """Doctors of one department (same row layout as doctors())."""
+        def group(rows):
+            by_dept = {}
+            for r in rows:
+                by_dept.setdefault(r[3], []).append(r)
+            return by_dept
+        return self._derive("doctor", "by_department", group).get(dept_id, [])
+
+    def warm(self, tables=tuple(REFERENCE_QUERIES)):
+        """Load the given tables now (e.g. from a background thread)."""
+        for table in tables:
+            self.get(table)
+
+    # ---------- invalidation ----------
+    def invalidate(self, table=None):
+        """Drop one table (or all) and notify its subscribers."""
+        tables = [*REFERENCE_QUERIES, *NOTIFY_ONLY] if table is None else [table]
+        with self._lock:
+            for t in tables:
+                self._rows.pop(t, None)
+                self._loaded_at.pop(t, None)
+            self._derived = {k: v for k, v in self._derived.items() if k[0] not in tables}
+            callbacks = [(t, entry) for t in tables for entry in self._subscribers[t]]
+
+        for t, (callback, widget) in callbacks:
+            if widget is not None and not _widget_alive(widget):
+                self.unsubscribe(t, callback)
+                continue
+            callback()
+
+    def subscribe(self, table, callback, widget=None):
+        """
+        Call `callback()` whenever `table` is invalidated.
+
+        If `widget` is given, the subscription is dropped once it is destroyed.
+        """
+        with self._lock:
+            self._subscribers[table].append((callback, widget))
+
+    def unsubscribe(self, table, callback):
+        with self._lock:
+            self._subscribers[table] = [e for e in self._subscribers[table] if e[0] != callback]
+
+    # ---------- internals ----------
+    def _fresh_rows(self, table):
+        with self._lock:
+            loaded = self._loaded_at.get(table)
+            if loaded is not None and time.monotonic() - loaded < self.ttl:
+                return self._rows[table]
+        return None
+
+    def _derive(self, table, name, build):
+        rows = self.get(table)
+        key = (table, name)
+        with self._lock:
+            if key in self._derived:
+                return self._derived[key]
+        value = build(rows)
+        with self._lock:
+            # Only keep it if the table was not reloaded meanwhile
+            if self._rows.get(table) is rows:
+                self._derived[key] = value
+        return value
+
+
+def _widget_alive(widget):
+    try:
+        return bool(widget.winfo_exists())
+    except Exception:
+        return False
+
+
+# Process-wide cache shared by every portal and frame.
+reference_cache = ReferenceCache()
@@ -0,0 +1,204 @@
+"""
+schedule.py
+-----------
+Slot templates for the booking grids.
+
+Both appointment frames used to rebuild the same 09:00-12:00 / 13:00-16:00
+30-minute list with strptime/strftime on every render. The schedule engine
+precomputes a SlotTemplate per (doctor, weekday) instead:
+
+    - slots are stored as integer minute offsets from midnight
+    - identical templates are interned, so every doctor on the default
+      roster shares one object
+    - slot length, opening hours and breaks can be set globally, per
+      weekday, per doctor and per doctor+weekday
+    - holidays (clinic-wide) and doctor days off give an empty template
+
+The roster is read from SCHEDULE_FILE (JSON) when it exists, otherwise the
+historical default is used:
+
+    {
+        "default":  {"slot_minutes": 30, "hours": [["09:00", "12:00"], ["13:00", "16:00"]],
+                     "breaks": []},
+        "weekdays": {"sat": {"hours": [["09:00", "12:00"]]}, "sun": null},
+        "doctors":  {"12": {"slot_minutes": 20,
+                            "weekdays": {"fri": null},
+                            "days_off": ["2026-12-24"]}},
+        "holidays": ["2026-12-25"]
+    }
+
+A rule only needs the keys it changes; `null` closes the day.
+"""
+
+import json
+import os
+import threading
+from datetime import date, datetime
+
+
+SCHEDULE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schedule.json")
+
+# Resolution of the booked-slot bitmaps (see availability.py)
+SLOT_GRANULARITY = 5
+
+DEFAULT_RULE = {
+    "slot_minutes": 30,
+    "hours": [["09:00", "12:00"], ["13:00", "16:00"]],
+    "breaks": [],
+}
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def parse_minutes(text):
+    """'HH:MM' -> minutes after midnight."""
+    hours, _, minutes = str(text).partition(":")
+    return int(hours) * 60 + int(minutes[:2] or 0)
+
+
+def format_minutes(minutes):
+    """Minutes after midnight -> 'HH:MM'."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def minute_bit(minutes):
+    """Bitmap bit of the SLOT_GRANULARITY bucket containing `minutes`."""
+    return 1 << (minutes // SLOT_GRANULARITY)
+
+
+def span_mask(start, end):
+    """Bitmap covering every bucket in [start, end)."""
+    first = start // SLOT_GRANULARITY
+    last = (end - 1) // SLOT_GRANULARITY
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+class SlotTemplate:
+    """Immutable list of bookable slots for one day, as minute offsets."""
+
+    __slots__ = ("spans", "starts", "slots", "masks", "start_index")
+
+    def __init__(self, spans):
+        self.spans = spans                                   # ((start_min, end_min), ...)
+        self.starts = tuple(format_minutes(s) for s, _ in spans)
+        self.slots = tuple((format_minutes(s), format_minutes(e)) for s, e in spans)
+        self.masks = tuple(span_mask(s, e) for s, e in spans)
+        self.start_index = {start: i for i, start in enumerate(self.starts)}
+
+    def __len__(self):
+        return len(self.spans)
+
+    def booked_starts(self, booked_mask):
+        """Start times of the slots that overlap a booking in `booked_mask`."""
+        return {start for start, mask in zip(self.starts, self.masks) if booked_mask & mask}
+
+    def free_count(self, booked_mask):
+        return sum(1 for mask in self.masks if not booked_mask & mask)
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def intern_template(spans):
+    """Return the shared SlotTemplate for these spans."""
+    spans = tuple(spans)
+    with _templates_lock:
+        template = _templates.get(spans)
+        if template is None:
+            template = _templates[spans] = SlotTemplate(spans)
+        return template
+
+
+EMPTY_TEMPLATE = intern_template(())
+
+
+def build_spans(slot_minutes, hours, breaks=()):
+    """
+    Cut the opening hours into slot_minutes-long slots, skipping breaks.
+
+    A slot never overlaps a break; slots restart right after the break ends.
+    """
+    breaks = sorted((parse_minutes(b), parse_minutes(e)) for b, e in breaks)
+    spans = []
+    for open_text, close_text in hours:
+        start = parse_minutes(open_text)
+        close = parse_minutes(close_text)
+        while start + slot_minutes <= close:
+            end = start + slot_minutes
+            clash = next((b_end for b_start, b_end in breaks if b_start < end and start < b_end), None)
+            if clash is not None:
+                start = clash
+                continue
+            spans.append((start, end))
+            start = end
+    return tuple(spans)
+
+
+class Schedule:
+    """Resolves the slot template of a doctor on a date."""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.default = dict(DEFAULT_RULE, **(config.get("default") or {}))
+        self.weekdays = {day.lower()[:3]: rule for day, rule in (config.get("weekdays") or {}).items()}
+        self.doctors = {int(doc_id): rule for doc_id, rule in (config.get("doctors") or {}).items()}
+        self.holidays = {str(d)[:10] for d in config.get("holidays") or ()}
+        self.days_off = {doc_id: {str(d)[:10] for d in rule.get("days_off") or ()}
+                         for doc_id, rule in self.doctors.items() if rule}
+        self._cache = {}   # (doctor_id, weekday) -> SlotTemplate
+        self._lock = threading.Lock()
+
+    def template_for(self, doctor_id, appointment_date):
+        """SlotTemplate for the doctor on the given date ('YYYY-MM-DD' or date)."""
+        if isinstance(appointment_date, (date, datetime)):
+            day = appointment_date
+            date_str = appointment_date.strftime("%Y-%m-%d")
+        else:
+            date_str = str(appointment_date)[:10]
+            day = datetime.strptime(date_str, "%Y-%m-%d")
+        if date_str in self.holidays or date_str in self.days_off.get(doctor_id, ()):
+            return EMPTY_TEMPLATE
+
+        key = (doctor_id if doctor_id in self.doctors else None, day.weekday())
+        with self._lock:
+            template = self._cache.get(key)
+        if template is None:
+            template = self._resolve(*key)
+            with self._lock:
+                self._cache[key] = template
+        return template
+
+    def _resolve(self, doctor_id, weekday):
+        day = WEEKDAYS[weekday]
+        layers = [self.default]
+        if day in self.weekdays:
+            layers.append(self.weekdays[day])
+        doctor_rule = self.doctors.get(doctor_id)
+        if doctor_id is not None:
+            if doctor_rule is None:
+                return EMPTY_TEMPLATE
+            layers.append({k: v for k, v in doctor_rule.items() if k in DEFAULT_RULE})
+            doctor_days = doctor_rule.get("weekdays") or {}
+            doctor_days = {d.lower()[:3]: rule for d, rule in doctor_days.items()}
+            if day in doctor_days:
+                layers.append(doctor_days[day])
+
+        rule = {}
+        for layer in layers:
+            if layer is None:
+                return EMPTY_TEMPLATE
+            rule.update(layer)
+        return intern_template(build_spans(int(rule["slot_minutes"]), rule["hours"], rule.get("breaks") or ()))
+
+
+def load_schedule(path=SCHEDULE_FILE):
+    """Read the roster from `path`; fall back to the default schedule if it does not exist."""
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return Schedule(json.load(f))
+    return Schedule()
+
+
+# Process-wide schedule shared by the booking frames and the availability index.
+schedule = load_schedule()
@@ -0,0 +1,280 @@
+"""
+schema.py
+---------
+Versioned schema migrations for the clinic database.
+
+Until now the schema only existed in the MySQL instance (and the project
+report). This module creates it, and adds the indexes the hot queries
+rely on. Each migration is applied once, in order, and recorded in
+`schema_version`. Index and column steps check information_schema first,
+so migrating a database that was created by hand is safe.
+
+    python schema.py migrate      # apply pending migrations
+    python schema.py status       # show applied / pending versions
+    python schema.py explain      # EXPLAIN every hot query; exit 1 on a full table scan
+
+Hot queries and the index serving each one (see HOT_QUERIES):
+    - booked slots of a doctor on a date   -> uq_appointment_slot (doctor_id, appointment_date, appointment_time)
+    - a patient's history (Rate Doctor)     -> idx_appointment_patient_date (patient_id, appointment_date DESC, appointment_time DESC)
+    - admin list keyset pages / date loads  -> idx_appointment_date_time (appointment_date, appointment_time, appointment_id)
+    - login by username                     -> uq_user_account_username (username)
+    - doctors of a department               -> idx_doctor_department (department_id)
+    - filtered doctor cards                 -> idx_doctor_department_rating (department_id, avg_rating,
+                                               specialty, last_name, first_name), covering
+
+Migration 8 adds the doctor_daily_stats rollup table (see analytics.py) and
+backfills it from the existing appointments.
+"""
+
+import re
+import sys
+from datetime import date
+
+from db_config import pooled_connection
+from ratings import RATING_COLUMNS_DDL, RATING_DELTA_SQL, reconcile_ratings
+from booking import SLOT_UNIQUE_INDEX_DDL
+from services import (PATIENT_SEARCH_INDEXES, DOCTOR_CARD_INDEX_DDL, DOCTOR_CARDS_SQL, DOCTOR_CARD_SORTS,
+                      ACCOUNT_BY_USERNAME_SQL, RATING_HISTORY_SQL, APPOINTMENT_PAGE_SIZE, appointment_page_query)
+from availability import DATE_BOOKINGS_SQL, DEPARTMENT_BOOKINGS_SQL, DOCTOR_DATE_BOOKINGS_SQL
+from credentials import PASSWORD_COLUMN_DDL
+from analytics import ROLLUP_TABLE_DDL, ROLLUP_INDEX_DDL, rebuild_rollups
+
+
+VERSION_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+"""
+
+BASE_TABLES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS department (
+        department_id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        min_doctors INT NOT NULL DEFAULT 0,
+        max_doctors INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS doctor (
+        doctor_id INT AUTO_INCREMENT PRIMARY KEY,
+        first_name VARCHAR(50) NOT NULL,
+        last_name VARCHAR(50) NOT NULL,
+        department_id INT NOT NULL,
+        phone VARCHAR(30),
+        email VARCHAR(100),
+        specialty VARCHAR(100),
+        bio TEXT,
+        avg_rating DECIMAL(3,2) NULL,
+        FOREIGN KEY (department_id) REFERENCES department (department_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS patient (
+        patient_id INT AUTO_INCREMENT PRIMARY KEY,
+        first_name VARCHAR(50) NOT NULL,
+        last_name VARCHAR(50) NOT NULL,
+        gender VARCHAR(10),
+        phone VARCHAR(30),
+        email VARCHAR(100)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS appointment (
+        appointment_id INT AUTO_INCREMENT PRIMARY KEY,
+        patient_id INT NOT NULL,
+        doctor_id INT NOT NULL,
+        appointment_date DATE NOT NULL,
+        appointment_time TIME NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'Scheduled',
+        doctor_rating DECIMAL(2,1) NULL,
+        notes VARCHAR(255),
+        FOREIGN KEY (patient_id) REFERENCES patient (patient_id),
+        FOREIGN KEY (doctor_id) REFERENCES doctor (doctor_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_account (
+        user_id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(50) NOT NULL,
+        password VARCHAR(100) NOT NULL,
+        role VARCHAR(10) NOT NULL DEFAULT 'client',
+        patient_id INT NULL,
+        FOREIGN KEY (patient_id) REFERENCES patient (patient_id)
+    )
+    """,
+]
+
+HOT_QUERY_INDEXES = [
+    "CREATE INDEX idx_appointment_patient_date "
+    "ON appointment (patient_id, appointment_date DESC, appointment_time DESC)",
+    "CREATE INDEX idx_appointment_date_time "
+    "ON appointment (appointment_date, appointment_time, appointment_id)",
+    "CREATE UNIQUE INDEX uq_user_account_username ON user_account (username)",
+    "CREATE INDEX idx_doctor_department ON doctor (department_id)",
+]
+
+
+# ---------------- migration steps ----------------
+
+_INDEX_RE = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(\w+)\s+ON\s+(\w+)", re.I)
+_COLUMN_RE = re.compile(r"ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+(\w+)", re.I)
+
+
+def _index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        LIMIT 1
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def run_ddl(cursor, ddl):
+    """
+    Execute one DDL statement, skipping CREATE INDEX / ADD COLUMN when the
+    index or column already exists (MySQL has no IF NOT EXISTS for those).
+    """
+    match = _INDEX_RE.search(ddl)
+    if match and _index_exists(cursor, match.group(2), match.group(1)):
+        return False
+    match = _COLUMN_RE.search(ddl)
+    if match and _column_exists(cursor, match.group(1), match.group(2)):
+        return False
+    cursor.execute(ddl)
+    return True
+
+
+def _reconcile_all(cursor):
+    reconcile_ratings(cursor)
+
+
+# (version, name, steps); a step is a DDL string or a callable(cursor).
+# Append new migrations at the end; never edit one that has shipped.
+MIGRATIONS = [
+    (1, "base tables", BASE_TABLES_DDL),
+    (2, "hot query indexes", HOT_QUERY_INDEXES),
+    (3, "patient search indexes", PATIENT_SEARCH_INDEXES),
+    (4, "doctor rating aggregates", RATING_COLUMNS_DDL + [_reconcile_all]),
+    (5, "unique appointment slot", [SLOT_UNIQUE_INDEX_DDL]),
+    (6, "doctor card filter index", [DOCTOR_CARD_INDEX_DDL]),
+    (7, "password hash column", [PASSWORD_COLUMN_DDL]),
+    (8, "daily doctor rollups", [ROLLUP_TABLE_DDL, ROLLUP_INDEX_DDL, rebuild_rollups]),
+]
+
+
+def applied_versions(cursor):
+    cursor.execute(VERSION_TABLE_DDL)
+    cursor.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(verbose=True):
+    """Apply every pending migration in order. Returns the versions applied."""
+    done = []
+    with pooled_connection() as con:
+        cur = con.cursor()
+        applied = applied_versions(cur)
+        for version, name, steps in MIGRATIONS:
+            if version in applied:
+                continue
+            if verbose:
+                print(f"Applying {version}: {name}")
+            for step in steps:
+                if callable(step):
+                    step(cur)
+                else:
+                    run_ddl(cur, step)
+            cur.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (%s, %s, NOW())",
+                        (version, name))
+            con.commit()
+            done.append(version)
+    return done
+
+
+def status():
+    with pooled_connection() as con:
+        applied = applied_versions(con.cursor())
+        con.commit()
+    return [(version, name, version in applied) for version, name, _ in MIGRATIONS]
+
+
+# ---------------- EXPLAIN check ----------------
+
+def _hot_queries():
+    """
+    (name, sql, params) for every query on a hot path, with sample parameters.
+    The SQL is the production constant, formatted the way its caller does.
+    """
+    today = date.today().isoformat()
+    page_sql, page_params = appointment_page_query((today, "12:00", 1), "older")
+    return [
+        ("booked slots (availability._load_key)", DOCTOR_DATE_BOOKINGS_SQL, (1, today)),
+        ("bulk date load (availability.load_dates)",
+         DATE_BOOKINGS_SQL.format(placeholders="%s, %s"), (today, today)),
+        ("department doctors x dates (availability.department_availability)",
+         DEPARTMENT_BOOKINGS_SQL.format(placeholders="%s"), (today, 1)),
+        ("patient history (RatingService.history)", RATING_HISTORY_SQL, (1,)),
+        ("admin list next page (AppointmentService.page)", page_sql, page_params + (APPOINTMENT_PAGE_SIZE,)),
+        ("doctor cards (DoctorRepo.cards)",
+         DOCTOR_CARDS_SQL.format(where="department_id = %s AND avg_rating >= %s", order=DOCTOR_CARD_SORTS["rating"]),
+         (1, 4.0)),
+        ("login (AccountRepo.find_by_username)", ACCOUNT_BY_USERNAME_SQL, ("admin",)),
+        ("rating delta (ratings.apply_rating_change)", RATING_DELTA_SQL, (1, 4.0, 1, 4.0, 1, 1)),
+    ]
+
+
+def explain_hot_queries(verbose=True):
+    """
+    EXPLAIN each hot query. Returns a list of (query name, table) pairs that
+    were planned as a full table scan (type=ALL).
+    """
+    problems = []
+    with pooled_connection() as con:
+        cur = con.cursor()
+        for name, sql, params in _hot_queries():
+            cur.execute("EXPLAIN " + sql, params)
+            columns = [c[0].lower() for c in cur.description]
+            rows = [dict(zip(columns, r)) for r in cur.fetchall()]
+            scans = [r.get("table") for r in rows if str(r.get("type", "")).upper() == "ALL"]
+            if verbose:
+                plan = ", ".join(f"{r.get('table')}:{r.get('type')}/{r.get('key')}" for r in rows)
+                print(f"{'FAIL' if scans else 'ok  '}  {name}\n      {plan}")
+            problems.extend((name, table) for table in scans)
+    return problems
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else ""
+    if command == "migrate":
+        done = migrate()
+        print(f"Applied {len(done)} migration(s)." if done else "Schema is up to date.")
+        return 0
+    if command == "status":
+        for version, name, applied in status():
+            print(f"{version:>3}  {'applied' if applied else 'pending'}  {name}")
+        return 0
+    if command == "explain":
+        problems = explain_hot_queries()
+        if problems:
+            print(f"\n{len(problems)} full table scan(s) found.")
+            return 1
+        print("\nNo full table scans.")
+        return 0
+    print("usage: python schema.py migrate | status | explain")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
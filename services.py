@@ -0,0 +1,788 @@
+"""
+services.py
+-----------
+UI-independent data access for the clinic app.
+
+The Tk frames used to embed their SQL in button callbacks next to the
+messagebox calls. The queries now live here, behind small repositories and
+services that return typed results and never import tkinter, so they can be
+batched, cached, profiled and benchmarked in headless processes:
+
+    department_repo      DepartmentRepo   CRUD + list
+    doctor_repo          DoctorRepo       CRUD + filtered doctor cards + lazy bios
+    patient_repo         PatientRepo      CRUD + type-ahead search
+    account_repo         AccountRepo      password login (with rehash) + client registration (single / batch)
+    appointment_service  AppointmentService   list pages, booking, update, delete, slots, export stream
+    rating_service       RatingService    patient history + submitting a rating
+
+Writes do not fire reference_cache subscribers (those touch widgets and
+must run on the Tk thread); callers invalidate the cache after a write,
+using the flags on the returned result where a write may change doctors.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from db_config import pooled_connection, streaming_cursor
+from availability import availability_index, format_slot_date, format_slot_time
+from reference_cache import reference_cache
+from ratings import apply_rating_change
+from booking import book_appointment, BookingResult, find_alternatives
+from schedule import schedule
+from credentials import password_hasher
+from analytics import apply_appointment_change
+
+
+# ---------------- typed results ----------------
+
+@dataclass(frozen=True)
+class Department:
+    department_id: int
+    name: str
+    min_doctors: int
+    max_doctors: int
+
+
+@dataclass(frozen=True)
+class Doctor:
+    doctor_id: int
+    first_name: str
+    last_name: str
+    department_id: int
+    phone: Optional[str]
+    email: Optional[str]
+    avg_rating: Optional[float]
+    specialty: Optional[str]
+    bio: Optional[str]
+
+    @property
+    def display(self) -> str:
+        return f"{self.doctor_id} - {self.first_name} {self.last_name}"
+
+
+@dataclass(frozen=True)
+class DoctorCard:
+    """The columns a booking card shows (the bio is loaded separately, on demand)."""
+    doctor_id: int
+    first_name: str
+    last_name: str
+    specialty: Optional[str]
+    avg_rating: Optional[float]
+
+    @property
+    def display(self) -> str:
+        return f"{self.doctor_id} - {self.first_name} {self.last_name}"
+
+
+@dataclass(frozen=True)
+class Patient:
+    patient_id: int
+    first_name: str
+    last_name: str
+    gender: Optional[str]
+    phone: Optional[str]
+    email: Optional[str]
+
+
+@dataclass(frozen=True)
+class Account:
+    user_id: int
+    username: str
+    password: str
+    role: str
+    patient_id: Optional[int]
+
+
+@dataclass(frozen=True)
+class AppointmentListRow:
+    appointment_id: int
+    patient_id: int
+    patient_display: str
+    department_id: int
+    department_display: str
+    doctor_id: int
+    doctor_display: str
+    appointment_date: str
+    appointment_time: str
+    status: str
+    doctor_rating: Optional[float]
+    notes: str
+    cursor: tuple   # raw (appointment_date, appointment_time, appointment_id) keyset
+
+
+@dataclass(frozen=True)
+class AppointmentPage:
+    rows: list
+    full: bool      # the page hit its limit, so more rows may follow
+
+
+@dataclass(frozen=True)
+class AppointmentChange:
+    found: bool
+    rating_changed: bool = False
+    ok: bool = True            # False: not written (see conflict / message)
+    conflict: bool = False     # the new slot is taken
+    message: str = ""
+    alternatives: tuple = ()   # (('YYYY-MM-DD', 'HH:MM'), ...) free slots of the doctor
+
+    def describe_alternatives(self):
+        """Human readable list of the alternatives, for message boxes."""
+        return "\n".join(f"  {d}  {t}" for d, t in self.alternatives)
+
+
+@dataclass(frozen=True)
+class RatingHistoryRow:
+    appointment_id: int
+    department_name: str
+    doctor_display: str
+    appointment_date: str
+    appointment_time: str
+    doctor_rating: Optional[float]
+    doctor_id: int
+
+
+def _rating(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+# ---------------- reference tables ----------------
+
+class DepartmentRepo:
+    def all(self) -> list[Department]:
+        return [Department(*row) for row in reference_cache.departments()]
+
+    def create(self, name: str, min_doctors: int, max_doctors: int) -> int:
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("INSERT INTO department (name, min_doctors, max_doctors) VALUES (%s, %s, %s)",
+                        (name, min_doctors, max_doctors))
+            con.commit()
+            return cur.lastrowid
+
+    def update(self, department_id, name: str, min_doctors: int, max_doctors: int) -> bool:
+        """Returns False when no department has this id."""
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("""
+                UPDATE department
+                SET name = %s, min_doctors = %s, max_doctors = %s
+                WHERE department_id = %s
+            """, (name, min_doctors, max_doctors, department_id))
+            con.commit()
+            return bool(cur.rowcount)
+
+    def delete(self, department_id) -> bool:
+        """Raises the driver's IntegrityError while doctors still reference it."""
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("DELETE FROM department WHERE department_id = %s", (department_id,))
+            con.commit()
+            return bool(cur.rowcount)
+
+
+# Serves DoctorRepo.cards from the index alone (schema migration 6)
+DOCTOR_CARD_INDEX_DDL = (
+    "CREATE INDEX idx_doctor_department_rating "
+    "ON doctor (department_id, avg_rating, specialty, last_name, first_name)"
+)
+
+DOCTOR_CARD_SORTS = {
+    "rating": "avg_rating DESC, last_name, first_name, doctor_id",   # unrated doctors last
+    "name": "last_name, first_name, doctor_id",
+}
+
+DOCTOR_CARDS_SQL = """
+    SELECT doctor_id, first_name, last_name, specialty, avg_rating
+    FROM doctor
+    WHERE {where}
+    ORDER BY {order}
+"""
+
+
+class DoctorRepo:
+    def all(self) -> list[Doctor]:
+        return [Doctor(*row) for row in reference_cache.doctors()]
+
+    def for_department(self, department_id, availability_dates=()) -> list[Doctor]:
+        """
+        Doctors of a department (from the reference cache). With
+        `availability_dates`, their booked slots for those dates are loaded
+        into the availability index with one query as well.
+        """
+        doctors = [Doctor(*row) for row in reference_cache.doctors_for_department(department_id)]
+        if availability_dates:
+            availability_index.department_availability(department_id, availability_dates,
+                                                       [d.doctor_id for d in doctors])
+        return doctors
+
+    def cards(self, department_id, min_rating=None, specialty=None, sort="rating") -> list[DoctorCard]:
+        """
+        The department's doctors for the booking cards, filtered and sorted
+        in the database. Unrated doctors only match when min_rating is None.
+        """
+        conditions = ["department_id = %s"]
+        params = [department_id]
+        if min_rating is not None:
+            conditions.append("avg_rating >= %s")
+            params.append(min_rating)
+        if specialty:
+            conditions.append("specialty = %s")
+            params.append(specialty)
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute(DOCTOR_CARDS_SQL.format(where=" AND ".join(conditions), order=DOCTOR_CARD_SORTS[sort]),
+                        tuple(params))
+            return [DoctorCard(doctor_id, first, last, spec, _rating(rating))
+                    for doctor_id, first, last, spec, rating in cur.fetchall()]
+
+    def bio(self, doctor_id) -> str:
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("SELECT bio FROM doctor WHERE doctor_id = %s", (doctor_id,))
+            row = cur.fetchone()
+        return (row[0] or "") if row else ""
+
+    def create(self, first_name, last_name, department_id, phone=None, email=None) -> int:
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("INSERT INTO doctor (first_name, last_name, department_id, phone, email) "
+                        "VALUES (%s, %s, %s, %s, %s)", (first_name, last_name, department_id, phone, email))
+            con.commit()
+            return cur.lastrowid
+
+    def update(self, doctor_id, first_name, last_name, department_id, phone=None, email=None) -> bool:
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("""
+                UPDATE doctor
+                SET first_name = %s,
+                    last_name = %s,
+                    department_id = %s,
+                    phone = %s,
+                    email = %s
+                WHERE doctor_id = %s
+            """, (first_name, last_name, department_id, phone, email, doctor_id))
+            con.commit()
+            return bool(cur.rowcount)
+
+    def delete(self, doctor_id) -> bool:
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("DELETE FROM doctor WHERE doctor_id = %s", (doctor_id,))
+            con.commit()
+            return bool(cur.rowcount)
+
+
+PATIENT_SEARCH_LIMIT = 25
+PATIENT_LIST_LIMIT = 200   # rows shown by the Patients tab at once
+
+# Indexes behind PatientRepo.search (schema migration 3)
+PATIENT_SEARCH_INDEXES = [
+    "CREATE INDEX idx_patient_name ON patient (last_name, first_name)",
+    "CREATE INDEX idx_patient_first_name ON patient (first_name)",
+    "CREATE INDEX idx_patient_phone ON patient (phone)",
+    "CREATE INDEX idx_patient_email ON patient (email)",
+]
+
+
+def _like_prefix(text):
+    """LIKE pattern matching values that start with `text` (wildcards escaped)."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+class PatientRepo:
+    def newest(self, limit: int = PATIENT_LIST_LIMIT) -> list[Patient]:
+        """The `limit` most recently added patients (primary key order)."""
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("""
+                SELECT patient_id, first_name, last_name, gender, phone, email
+                FROM patient
+                ORDER BY patient_id DESC
+                LIMIT %s
+            """, (limit,))
+            return [Patient(*row) for row in cur.fetchall()]
+
+    def search(self, text: str, limit: int = PATIENT_SEARCH_LIMIT) -> list[Patient]:
+        """
+        Up to `limit` patients whose id equals `text`, or whose first/last
+        name, phone or email starts with it ("ann sm" matches Ann Smith).
+        Uses prefix LIKEs only, so every branch can use an index.
+        """
+        text = " ".join(text.split())
+        if not text:
+            return []
+
+        conditions = []
+        params = []
+        if text.isdigit():
+            conditions.append("patient_id = %s")
+            params.append(int(text))
+            conditions.append("phone LIKE %s")
+            params.append(_like_prefix(text))
+        else:
+            words = text.split(" ")
+            if len(words) >= 2:
+                # "first last" and "last first"
+                first, rest = words[0], " ".join(words[1:])
+                conditions.append("(first_name LIKE %s AND last_name LIKE %s)")
+                params += [_like_prefix(first), _like_prefix(rest)]
+                conditions.append("(last_name LIKE %s AND first_name LIKE %s)")
+                params += [_like_prefix(first), _like_prefix(rest)]
+            else:
+                conditions.append("last_name LIKE %s")
+                conditions.append("first_name LIKE %s")
+                params += [_like_prefix(text), _like_prefix(text)]
+            conditions.append("email LIKE %s")
+            params.append(_like_prefix(text))
+            if text.replace("+", "").replace("-", "").isdigit():
+                conditions.append("phone LIKE %s")
+                params.append(_like_prefix(text))
+
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute(f"""
+                SELECT patient_id, first_name, last_name, gender, phone, email
+                FROM patient
+                WHERE {" OR ".join(conditions)}
+                ORDER BY last_name, first_name, patient_id
+                LIMIT %s
+            """, tuple(params) + (limit,))
+            return [Patient(*row) for row in cur.fetchall()]
+
+    def create(self, first_name, last_name, gender=None, phone=None, email=None) -> int:
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("""
+                INSERT INTO patient (first_name, last_name, gender, phone, email)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (first_name, last_name, gender, phone, email))
+            con.commit()
+            return cur.lastrowid
+
+    def update(self, patient_id, first_name, last_name, gender=None, phone=None, email=None) -> bool:
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("""
+                UPDATE patient
+                SET first_name = %s, last_name = %s, gender = %s, phone = %s, email = %s
+                WHERE patient_id = %s
+            """, (first_name, last_name, gender, phone, email, patient_id))
+            con.commit()
+            return bool(cur.rowcount)
+
+    def delete(self, patient_id) -> bool:
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("DELETE FROM patient WHERE patient_id = %s", (patient_id,))
+            con.commit()
+            return bool(cur.rowcount)
+
+
+ACCOUNT_BY_USERNAME_SQL = """
+    SELECT user_id, username, password, role, patient_id
+    FROM user_account WHERE username=%s
+"""
+
+
+class AccountRepo:
+    def find_by_username(self, username: str) -> Optional[Account]:
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute(ACCOUNT_BY_USERNAME_SQL, (username,))
+            row = cur.fetchone()
+        return Account(*row) if row else None
+
+    def authenticate(self, username: str, password: str) -> Optional[Account]:
+        """
+        The account if `password` is right, else None. Slow on purpose (one
+        password hash), so call it off the Tk thread. A stored plaintext or
+        outdated hash is replaced by one with the current parameters.
+        """
+        account = self.find_by_username(username)
+        if not password_hasher.verify(password, account.password if account else None):
+            return None
+        if password_hasher.needs_rehash(account.password):
+            stored = password_hasher.hash(password)
+            with pooled_connection() as con:
+                cur = con.cursor()
+                # Only if nobody changed the password in the meantime
+                cur.execute("UPDATE user_account SET password=%s WHERE user_id=%s AND password=%s",
+                            (stored, account.user_id, account.password))
+                con.commit()
+                if cur.rowcount == 1:
+                    account = replace(account, password=stored)
+        return account
+
+    def register_client(self, first_name, last_name, gender, phone, email, username, password) -> int:
+        """Create the patient and its client login in one transaction; returns the patient_id."""
+        password = password_hasher.hash(password)   # before taking a pooled connection
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute("""
+                INSERT INTO patient(first_name, last_name, gender, phone, email)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (first_name, last_name, gender, phone, email))
+            patient_id = cur.lastrowid
+            cur.execute("""
+                INSERT INTO user_account(username, password, role, patient_id)
+                VALUES (%s, %s, 'client', %s)
+            """, (username, password, patient_id))
+            con.commit()
+            return patient_id
+
+    def register_batch(self, records) -> int:
+        """
+        Insert a chunk of patients, each with an optional client login, in one
+        transaction (nothing is kept if any row fails); returns the number of
+        patients. `records` are ((first, last, gender, phone, email),
+        (username, password_hash) or None); passwords must already be hashed.
+
+        Patients without a login go in with one executemany. Patients with a
+        login are inserted one by one, since their ids are needed for the
+        accounts; the accounts then go in with one executemany.
+        """
+        insert_patient = """
+            INSERT INTO patient(first_name, last_name, gender, phone, email)
+            VALUES (%s, %s, %s, %s, %s)
+        """
+        with pooled_connection() as con:
+            cur = con.cursor()
+            plain = [patient for patient, account in records if account is None]
+            if plain:
+                cur.executemany(insert_patient, plain)
+            accounts = []
+            for patient, account in records:
+                if account is not None:
+                    cur.execute(insert_patient, patient)
+                    accounts.append((account[0], account[1], cur.lastrowid))
+            if accounts:
+                cur.executemany("""
+                    INSERT INTO user_account(username, password, role, patient_id)
+                    VALUES (%s, %s, 'client', %s)
+                """, accounts)
+            con.commit()
+        return len(records)
+
+    def existing_usernames(self, usernames) -> set[str]:
+        """The subset of `usernames` that already have an account."""
+        usernames = list(usernames)
+        if not usernames:
+            return set()
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute(f"SELECT username FROM user_account WHERE username IN ({', '.join(['%s'] * len(usernames))})",
+                        tuple(usernames))
+            return {row[0] for row in cur.fetchall()}
+
+
+# ---------------- appointments ----------------
+
+APPOINTMENT_PAGE_SIZE = 200
+
+APPOINTMENT_LIST_SQL = """
+    SELECT a.appointment_id,
+           CONCAT(p.patient_id, ' - ', p.first_name, ' ', p.last_name) AS patient_display,
+           CONCAT(dep.department_id, ' - ', dep.name) AS department_display,
+           CONCAT(d.doctor_id, ' - ', d.first_name, ' ', d.last_name) AS doctor_display,
+           a.appointment_date,
+           a.appointment_time,
+           a.status,
+           a.doctor_rating,
+           COALESCE(a.notes, ''),
+           d.doctor_id,
+           dep.department_id,
+           p.patient_id
+    FROM appointment a
+    JOIN patient p ON a.patient_id = p.patient_id
+    JOIN doctor d ON a.doctor_id = d.doctor_id
+    JOIN department dep ON d.department_id = dep.department_id
+"""
+
+# Keyset predicates on (appointment_date, appointment_time, appointment_id),
+# written out so MySQL can use a range scan on the composite index.
+OLDER_THAN_SQL = """
+    WHERE a.appointment_date < %s
+       OR (a.appointment_date = %s AND (a.appointment_time < %s
+           OR (a.appointment_time = %s AND a.appointment_id {op} %s)))
+"""
+NEWER_THAN_SQL = """
+    WHERE a.appointment_date > %s
+       OR (a.appointment_date = %s AND (a.appointment_time > %s
+           OR (a.appointment_time = %s AND a.appointment_id {op} %s)))
+"""
+
+
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_COLUMNS = ("appointment_id", "appointment_date", "appointment_time", "status", "doctor_rating",
+                  "notes", "patient_id", "patient_first_name", "patient_last_name", "doctor_id",
+                  "doctor_first_name", "doctor_last_name", "department_id", "department_name")
+
+EXPORT_SQL = """
+    SELECT a.appointment_id, a.appointment_date, a.appointment_time, a.status, a.doctor_rating,
+           a.notes, p.patient_id, p.first_name, p.last_name, d.doctor_id,
+           d.first_name, d.last_name, dep.department_id, dep.name
+    FROM appointment a
+    JOIN patient p ON a.patient_id = p.patient_id
+    JOIN doctor d ON a.doctor_id = d.doctor_id
+    JOIN department dep ON d.department_id = dep.department_id
+"""
+
+
+def appointment_page_query(cursor=None, direction="older", inclusive=False):
+    """(sql, params) of AppointmentService.page; the LIMIT value is appended by the caller."""
+    query = APPOINTMENT_LIST_SQL
+    params = ()
+    if cursor is not None:
+        appt_date, appt_time, appt_id = cursor
+        if direction == "older":
+            query += OLDER_THAN_SQL.format(op="<=" if inclusive else "<")
+        else:
+            query += NEWER_THAN_SQL.format(op=">=" if inclusive else ">")
+        params = (appt_date, appt_date, appt_time, appt_time, appt_id)
+    if direction == "older":
+        query += " ORDER BY a.appointment_date DESC, a.appointment_time DESC, a.appointment_id DESC"
+    else:
+        query += " ORDER BY a.appointment_date ASC, a.appointment_time ASC, a.appointment_id ASC"
+    return query + " LIMIT %s", params
+
+
+class AppointmentService:
+    def page(self, cursor=None, direction="older", inclusive=False,
+             limit=APPOINTMENT_PAGE_SIZE) -> AppointmentPage:
+        """
+        One page of the appointment list relative to a keyset cursor.
+
+        cursor: a row's `cursor` (raw date, time, id), or None for the newest page.
+        direction: "older" pages continue downwards, "newer" pages upwards.
+        Rows are always newest first.
+        """
+        query, params = appointment_page_query(cursor, direction, inclusive)
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute(query, params + (limit,))
+            rows = cur.fetchall()
+
+        if direction == "newer":
+            rows = list(reversed(rows))
+
+        result = []
+        for (appt_id, patient_display, dept_display, doctor_display, appt_date, appt_time,
+             status, doctor_rating, notes, doctor_id, dept_id, patient_id) in rows:
+            result.append(AppointmentListRow(
+                appointment_id=appt_id,
+                patient_id=patient_id,
+                patient_display=patient_display,
+                department_id=dept_id,
+                department_display=dept_display,
+                doctor_id=doctor_id,
+                doctor_display=doctor_display,
+                appointment_date=format_slot_date(appt_date),
+                appointment_time=format_slot_time(appt_time),
+                status=status,
+                doctor_rating=_rating(doctor_rating),
+                notes=notes,
+                cursor=(appt_date, appt_time, appt_id),
+            ))
+        return AppointmentPage(result, len(rows) == limit)
+
+    def export_batches(self, date_from=None, date_to=None, department_id=None, doctor_id=None,
+                       batch_size=EXPORT_BATCH_SIZE):
+        """
+        Generator of row batches (EXPORT_COLUMNS order) for the appointments
+        in [date_from, date_to] (inclusive, either may be None), optionally
+        of one department / doctor, oldest first.
+
+        Reads through an unbuffered server-side cursor, so memory stays at
+        one batch however many rows match. The pooled connection is held
+        until the generator is exhausted or closed.
+        """
+        conditions, params = [], []
+        if date_from is not None:
+            conditions.append("a.appointment_date >= %s")
+            params.append(format_slot_date(date_from))
+        if date_to is not None:
+            conditions.append("a.appointment_date <= %s")
+            params.append(format_slot_date(date_to))
+        if department_id is not None:
+            conditions.append("d.department_id = %s")
+            params.append(department_id)
+        if doctor_id is not None:
+            conditions.append("a.doctor_id = %s")
+            params.append(doctor_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with pooled_connection() as con:
+            cur = streaming_cursor(con)
+            try:
+                cur.execute(f"""{EXPORT_SQL} {where}
+                    ORDER BY a.appointment_date, a.appointment_time, a.appointment_id
+                """, tuple(params))
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cur.close()
+
+    def booked_slots(self, doctor_id, appointment_date, exclude_appointment_id=None) -> set:
+        """Start times ('HH:MM') of the doctor's booked slots on the date."""
+        return availability_index.booked_slots(doctor_id, appointment_date, exclude_appointment_id)
+
+    def book(self, patient_id, doctor_id, appointment_date, appointment_time,
+             notes="", status=None, doctor_rating=None) -> BookingResult:
+        return book_appointment(patient_id, doctor_id, appointment_date, appointment_time,
+                                notes, status, doctor_rating)
+
+    def update(self, appointment_id, patient_id, doctor_id, appointment_date, appointment_time,
+               status, doctor_rating, notes) -> AppointmentChange:
+        """
+        Rewrite an appointment; rating aggregates and the slot index follow.
+        Moving it to a time that is not a slot of the doctor's schedule, or to
+        a taken slot, writes nothing and returns ok=False with alternatives.
+        """
+        date_str = format_slot_date(appointment_date)
+        time_str = format_slot_time(appointment_time)
+        with pooled_connection() as con:
+            cur = con.cursor()
+            old = self._lock(cur, appointment_id)
+            if old is None:
+                return AppointmentChange(found=False)
+            old_doctor_id, old_rating, old_date, old_status, old_time = old
+
+            moved = (int(old_doctor_id), format_slot_date(old_date), format_slot_time(old_time)) != \
+                (int(doctor_id), date_str, time_str)
+            if moved and time_str not in schedule.template_for(doctor_id, date_str).start_index:
+                return AppointmentChange(
+                    found=True, ok=False,
+                    message=f"{time_str} is not a bookable slot for this doctor on {date_str}.",
+                    alternatives=tuple(find_alternatives(doctor_id, date_str, None)))
+
+            try:
+                cur.execute("""
+                    UPDATE appointment
+                    SET patient_id=%s, doctor_id=%s, appointment_date=%s,
+                        appointment_time=%s, status=%s, doctor_rating=%s, notes=%s
+                    WHERE appointment_id=%s
+                """, (patient_id, doctor_id, date_str, time_str,
+                      status, doctor_rating, notes, appointment_id))
+            except con.IntegrityError:
+                con.rollback()
+                # Same handling as book_appointment: pick up the other booking, then answer from memory
+                availability_index.refresh(doctor_id, date_str)
+                if time_str not in availability_index.booked_slots(doctor_id, date_str, int(appointment_id)):
+                    raise   # not a slot clash (e.g. unknown patient/doctor)
+                return AppointmentChange(
+                    found=True, ok=False, conflict=True, message="This time slot is already booked.",
+                    alternatives=tuple(find_alternatives(doctor_id, date_str, time_str)))
+
+            if old_doctor_id == doctor_id:
+                rating_changed = apply_rating_change(cur, old_doctor_id, old_rating, doctor_rating)
+            else:
+                rating_changed = apply_rating_change(cur, old_doctor_id, old_rating, None)
+                rating_changed |= apply_rating_change(cur, doctor_id, None, doctor_rating)
+            apply_appointment_change(cur, (old_doctor_id, old_date, old_status, old_rating),
+                                     (doctor_id, date_str, status, doctor_rating))
+            con.commit()
+
+        availability_index.move_booking(int(appointment_id), doctor_id, date_str, time_str)
+        return AppointmentChange(found=True, rating_changed=rating_changed)
+
+    def delete(self, appointment_id) -> AppointmentChange:
+        with pooled_connection() as con:
+            cur = con.cursor()
+            old = self._lock(cur, appointment_id)
+            cur.execute("DELETE FROM appointment WHERE appointment_id=%s", (appointment_id,))
+            rating_changed = old is not None and apply_rating_change(cur, old[0], old[1], None)
+            if old is not None:
+                apply_appointment_change(cur, (old[0], old[2], old[3], old[1]), None)
+            con.commit()
+
+        availability_index.release_booking(int(appointment_id))
+        return AppointmentChange(found=old is not None, rating_changed=rating_changed)
+
+    @staticmethod
+    def _lock(cursor, appointment_id):
+        """
+        Lock the appointment row and return its current
+        (doctor_id, doctor_rating, appointment_date, status, appointment_time), or None.
+        """
+        cursor.execute("""
+            SELECT doctor_id, doctor_rating, appointment_date, status, appointment_time
+            FROM appointment
+            WHERE appointment_id=%s
+            FOR UPDATE
+        """, (appointment_id,))
+        return cursor.fetchone()
+
+
+RATING_HISTORY_SQL = """
+    SELECT a.appointment_id,
+           dep.name AS department_name,
+           CONCAT(d.doctor_id, ' - ', d.first_name, ' ', d.last_name) AS doctor_display,
+           a.appointment_date,
+           a.appointment_time,
+           a.doctor_rating,
+           d.doctor_id
+    FROM appointment a
+    JOIN doctor d ON a.doctor_id = d.doctor_id
+    JOIN department dep ON d.department_id = dep.department_id
+    WHERE a.patient_id = %s
+    ORDER BY a.appointment_date DESC, a.appointment_time DESC
+"""
+
+
+class RatingService:
+    def history(self, patient_id) -> list[RatingHistoryRow]:
+        """The patient's appointments, newest first."""
+        with pooled_connection() as con:
+            cur = con.cursor()
+            cur.execute(RATING_HISTORY_SQL, (patient_id,))
+            rows = cur.fetchall()
+        return [
+            RatingHistoryRow(appt_id, dep_name, doctor_display, format_slot_date(appt_date),
+                             format_slot_time(appt_time), _rating(rating), doctor_id)
+            for appt_id, dep_name, doctor_display, appt_date, appt_time, rating, doctor_id in rows
+        ]
+
+    def submit(self, patient_id, appointment_id, rating) -> bool:
+        """
+        Store a rating for an unrated appointment of this patient and apply it
+        to the running aggregates of the appointment's doctor. Returns False
+        if nothing was stored (already rated, or not this patient's appointment).
+        """
+        with pooled_connection() as con:
+            cur = con.cursor()
+            # The doctor comes from the locked row, never from the caller
+            cur.execute("""
+                SELECT doctor_id, appointment_date, status
+                FROM appointment
+                WHERE appointment_id = %s AND patient_id = %s AND doctor_rating IS NULL
+                FOR UPDATE
+            """, (appointment_id, patient_id))
+            row = cur.fetchone()
+            if row is None:
+                return False
+            doctor_id, appointment_date, status = row
+
+            cur.execute("UPDATE appointment SET doctor_rating = %s WHERE appointment_id = %s",
+                        (rating, appointment_id))
+            apply_rating_change(cur, doctor_id, None, rating)
+            apply_appointment_change(cur, (doctor_id, appointment_date, status, None),
+                                     (doctor_id, appointment_date, status, rating))
+            con.commit()
+        return True
+
+
+# Process-wide instances shared by the frames, the benchmark and scripts.
+department_repo = DepartmentRepo()
+doctor_repo = DoctorRepo()
+patient_repo = PatientRepo()
+account_repo = AccountRepo()
+appointment_service = AppointmentService()
+rating_service = RatingService()
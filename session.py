@@ -0,0 +1,216 @@
+"""
+session.py
+----------
+Login sessions that outlive their portal windows.
+
+"Return to Login" used to destroy the portal, so logging in again meant a
+password hash, a user_account query and building every tab (and its
+queries) from scratch. Now the portal window is only hidden and the
+session stays alive for SESSION_IDLE_MINUTES (CLINIC_SESSION_IDLE_MINUTES):
+
+    - logging in again as the same user within that time checks the
+      password against the session (an in-memory HMAC, no password hash)
+      and re-reads the account row; if the account is unchanged the hidden
+      window is shown again, tabs and loaded data intact. A deleted
+      account, a new role or a changed password ends the session and the
+      login goes through the full check
+    - logging in while the user's portal is still open opens another
+      window bound to the same session, so both share one SessionContext
+    - once every window of a session has been hidden for the idle time,
+      the windows are destroyed and the session is dropped
+
+SessionContext holds per-user data the frames would otherwise load once
+per window (the admin appointment window, a client's visit history).
+fetch() runs on db_executor workers: a fresh value is reused, and a load
+already running for another window is waited for instead of repeated.
+Process-wide reference data stays in reference_cache.
+
+Everything except SessionContext runs on the Tk thread.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from tkinter import Toplevel
+
+
+SESSION_IDLE_MINUTES = float(os.environ.get("CLINIC_SESSION_IDLE_MINUTES", 15))
+CONTEXT_MAX_AGE = 30.0   # seconds a shared value is reused by another window
+
+
+class SessionContext:
+    """Per-user data shared by all portal windows of a session (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}    # name -> (loaded_at, value)
+        self._loading = {}   # name -> Event set when the running load finishes
+
+    def fetch(self, name, loader, *args, max_age=CONTEXT_MAX_AGE):
+        """
+        Worker thread: the value stored under `name` if it is younger than
+        max_age seconds, else loader(*args) (stored for the next caller).
+        """
+        while True:
+            with self._lock:
+                entry = self._values.get(name)
+                if entry is not None and time.monotonic() - entry[0] <= max_age:
+                    return entry[1]
+                running = self._loading.get(name)
+                if running is None:
+                    running = self._loading[name] = threading.Event()
+                    break
+            running.wait()
+            if name not in self._values:   # the other load failed; try ourselves
+                continue
+        try:
+            value = loader(*args)
+            self.put(name, value)
+            return value
+        finally:
+            with self._lock:
+                del self._loading[name]
+            running.set()
+
+    def put(self, name, value):
+        """Store a value loaded elsewhere (e.g. after a write refreshed it)."""
+        with self._lock:
+            self._values[name] = (time.monotonic(), value)
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._values.clear()
+            else:
+                self._values.pop(name, None)
+
+
+def account_stamp(account):
+    """What must not change for a session to be resumed: identity, role and stored password hash."""
+    return (account.user_id, account.username, account.role, account.patient_id,
+            hashlib.sha256(account.password.encode("utf-8")).digest())
+
+
+class Session:
+    """One logged-in user: user_info, their portal windows and shared context."""
+
+    def __init__(self, user_info, password, stamp=None):
+        self.user_info = user_info
+        self.username = user_info["username"]
+        self.stamp = stamp           # account_stamp() at login
+        self.context = SessionContext()
+        self.master = None           # window the portals were opened from (owns the expiry timer)
+        self.windows = []            # [(Toplevel, portal)]
+        self.hidden = set()          # Toplevels withdrawn by "Return to Login"
+        self.expiry_job = None
+        self._secret = os.urandom(32)
+        self._password_mac = self._mac(password)
+
+    def _mac(self, password):
+        return hmac.new(self._secret, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def check_password(self, password):
+        return hmac.compare_digest(self._mac(password), self._password_mac)
+
+
+class SessionManager:
+    """
+    Keeps sessions and their portal windows alive across "Return to Login".
+
+    build_portal(window, session) creates the portal inside a new Toplevel
+    and returns it; the portal calls session_manager.leave(window) from its
+    "Return to Login" button.
+    """
+
+    def __init__(self, idle_minutes=SESSION_IDLE_MINUTES):
+        self.idle_ms = int(idle_minutes * 60 * 1000)
+        self.sessions = {}   # username -> Session
+
+    def resume(self, username, password):
+        """
+        The live session of `username` if `password` matches it, else None.
+        Confirm it with confirm() against a fresh read of the account row
+        before showing its windows.
+        """
+        session = self.sessions.get(username)
+        if session is None or not session.check_password(password):
+            return None
+        return session
+
+    def confirm(self, session, account):
+        """
+        True if `account` (re-read from the database, None if deleted) is
+        still the one the session was started for; otherwise ends the session.
+        """
+        if self.sessions.get(session.username) is not session:
+            return False   # expired (or replaced) while the account was being read
+        if account is not None and session.stamp is not None and account_stamp(account) == session.stamp:
+            return True
+        self.end(session)
+        return False
+
+    def start(self, user_info, password, account=None):
+        """New session after a successful login (replaces an old one of the user)."""
+        old = self.sessions.get(user_info["username"])
+        if old is not None:
+            self.end(old)
+        stamp = account_stamp(account) if account is not None else None
+        session = self.sessions[user_info["username"]] = Session(user_info, password, stamp)
+        return session
+
+    def open_window(self, master, session, build_portal):
+        """Show a hidden window of the session again, or open a new one sharing its context."""
+        session.master = master
+        self._cancel_expiry(session)
+        for window, _ in session.windows:
+            if window in session.hidden:
+                session.hidden.discard(window)
+                window.deiconify()
+                window.lift()
+                return window
+        window = Toplevel(master)
+        window.protocol("WM_DELETE_WINDOW", lambda: self.leave(window))
+        session.windows.append((window, build_portal(window, session)))
+        return window
+
+    def leave(self, window):
+        """Hide a portal window ("Return to Login"); the session expires after the idle time."""
+        session = self._session_of(window)
+        if session is None:
+            window.destroy()
+            return
+        window.withdraw()
+        session.hidden.add(window)
+        if len(session.hidden) == len(session.windows):
+            self._cancel_expiry(session)
+            session.expiry_job = session.master.after(self.idle_ms, lambda: self.end(session))
+
+    def end(self, session):
+        """Destroy the session's windows and forget it."""
+        self._cancel_expiry(session)
+        for window, _ in session.windows:
+            if window.winfo_exists():
+                window.destroy()
+        session.windows.clear()
+        session.hidden.clear()
+        session.context.invalidate()
+        if self.sessions.get(session.username) is session:
+            del self.sessions[session.username]
+
+    def _session_of(self, window):
+        for session in self.sessions.values():
+            if any(w is window for w, _ in session.windows):
+                return session
+        return None
+
+    @staticmethod
+    def _cancel_expiry(session):
+        if session.expiry_job is not None:
+            session.master.after_cancel(session.expiry_job)
+            session.expiry_job = None
+
+
+# Sessions of this process (one per logged-in user).
+session_manager = SessionManager()
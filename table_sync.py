@@ -0,0 +1,96 @@
+"""
+table_sync.py
+-------------
+Incremental refresh helper for ttk.Treeview tables.
+
+The list tabs used to delete every item and re-insert every row on each
+refresh. TreeviewSync keys rows by primary key (used as the Treeview iid)
+and applies only the difference:
+    - rows that disappeared are deleted
+    - new rows are inserted at their position
+    - rows whose values/tags changed are updated in place
+    - rows that moved are repositioned with a single `move`
+
+Untouched items keep their selection and focus. The scroll position is
+restored by keeping the row that was at the top of the view at the top,
+so rows added or dropped above it do not make the view jump.
+"""
+
+from operator import itemgetter
+
+
+class TreeviewSync:
+    """Keeps a Treeview in step with a list of rows keyed by primary key."""
+
+    def __init__(self, tree, key=itemgetter(0)):
+        self.tree = tree
+        self.key = key
+        self._rows = {}   # iid -> (values, tags) last written to the tree
+
+    def sync(self, rows, tags=None, columns=None):
+        """
+        Make the Treeview show exactly `rows`, in order.
+
+        rows: iterable of value tuples (one per table row).
+        tags: optional callable(row) -> tuple of tags for that row.
+        columns: if given, only row[:columns] is shown; trailing fields can
+                 carry hidden data for `tags`.
+        Returns (inserted, updated, deleted) counts.
+        """
+        tree = self.tree
+        before = tree.get_children()
+        anchor = before[min(round(tree.yview()[0] * len(before)), len(before) - 1)] if before else None
+
+        desired = []
+        wanted = {}
+        for row in rows:
+            iid = str(self.key(row))
+            values = tuple(row[:columns]) if columns else tuple(row)
+            row_tags = tuple(tags(row)) if tags else ()
+            desired.append(iid)
+            wanted[iid] = (values, row_tags)
+
+        # 1) delete rows that are gone
+        stale = [iid for iid in tree.get_children() if iid not in wanted]
+        if stale:
+            tree.delete(*stale)
+            for iid in stale:
+                self._rows.pop(iid, None)
+
+        # 2) walk the desired order; insert / update / move as needed
+        current = list(tree.get_children())
+        pos = 0
+        moved = set()
+        inserted = updated = 0
+        for index, iid in enumerate(desired):
+            values, row_tags = wanted[iid]
+            while pos < len(current) and current[pos] in moved:
+                pos += 1
+
+            if iid not in self._rows and not tree.exists(iid):
+                tree.insert("", index, iid=iid, values=values, tags=row_tags)
+                self._rows[iid] = (values, row_tags)
+                inserted += 1
+                continue
+
+            if pos < len(current) and current[pos] == iid:
+                pos += 1
+            else:
+                tree.move(iid, "", index)
+                moved.add(iid)
+
+            if self._rows.get(iid) != (values, row_tags):
+                tree.item(iid, values=values, tags=row_tags)
+                self._rows[iid] = (values, row_tags)
+                updated += 1
+
+        if anchor in wanted and desired:
+            tree.yview_moveto(desired.index(anchor) / len(desired))
+        return inserted, updated, len(stale)
+
+    def clear(self):
+        """Remove every row."""
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._rows.clear()
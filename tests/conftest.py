@@ -0,0 +1,114 @@
+"""
+Shared fixtures: every database test runs against a fresh SQLite file
+through bench/sqlite_backend, filled with a small bench/datagen data set.
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk_import
+import db_config
+import services
+from credentials import PBKDF2, PasswordHasher
+from availability import availability_index
+from reference_cache import reference_cache
+from schedule import schedule
+from bench.datagen import DataGenConfig, generate
+from bench.sqlite_backend import use_sqlite
+
+
+SMALL_DATA = dict(departments=2, doctors_per_department=3, patients=40, appointments=300, future_days=6)
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Point the pool at a new SQLite database with a small generated clinic."""
+    use_sqlite(str(tmp_path / "clinic.db"))
+    availability_index.invalidate()
+    reference_cache.invalidate()
+    generate(DataGenConfig(**SMALL_DATA), verbose=False)
+    yield
+    availability_index.invalidate()
+    reference_cache.invalidate()
+    db_config.get_pool().close_all()
+
+
+@pytest.fixture
+def cheap_hasher(monkeypatch):
+    """A low-cost hasher in place of the production one, so tests stay fast."""
+    hasher = PasswordHasher(scheme=PBKDF2, pbkdf2_iterations=1000)
+    monkeypatch.setattr(services, "password_hasher", hasher)
+    monkeypatch.setattr(bulk_import, "password_hasher", hasher)
+    return hasher
+
+
+def query(sql, params=()):
+    with db_config.pooled_connection() as con:
+        cur = con.cursor()
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+def open_day(doctor_id, start=None):
+    """
+    The first date from `start` on which the doctor has slots. The default
+    start lies past the generated booking window, so the day is empty.
+    """
+    day = start or date.today() + timedelta(days=SMALL_DATA["future_days"] + 2)
+    while not len(schedule.template_for(doctor_id, day)):
+        day += timedelta(days=1)
+    return day.isoformat()
+
+
+def free_slot(doctor_id, day):
+    """A slot start of the doctor on `day` that is not booked in the database."""
+    taken = {str(t)[:5] for (t,) in query(
+        "SELECT appointment_time FROM appointment WHERE doctor_id=%s AND appointment_date=%s", (doctor_id, day))}
+    for start in schedule.template_for(doctor_id, day).starts:
+        if start not in taken:
+            return start
+    return None
+
+
+def random_changes(rng, count=200):
+    """
+    Book, rate, edit and delete appointments at random through the services,
+    the same way the portals do. Returns the number of writes that succeeded.
+    """
+    from services import appointment_service, rating_service
+
+    doctors = [d for (d,) in query("SELECT doctor_id FROM doctor")]
+    patients = [p for (p,) in query("SELECT patient_id FROM patient")]
+    statuses = ("Scheduled", "Completed", "Cancelled", "No-show")
+    ratings = (None, None, 1.0, 2.5, 3.0, 4.5, 5.0)
+    done = 0
+    for _ in range(count):
+        op = rng.choice(("book", "rate", "update", "update", "delete"))
+        appointments = query("SELECT appointment_id, patient_id, doctor_id, appointment_date, "
+                             "appointment_time, doctor_rating FROM appointment")
+        appt_id, patient_id, doctor_id, appt_date, appt_time, rating = rng.choice(appointments)
+        if op == "book":
+            doctor_id = rng.choice(doctors)
+            day = open_day(doctor_id)
+            time = free_slot(doctor_id, day)
+            result = appointment_service.book(rng.choice(patients), doctor_id, day, time,
+                                              status=rng.choice(statuses), doctor_rating=rng.choice(ratings))
+            done += result.ok
+        elif op == "rate":
+            done += rating_service.submit(patient_id, appt_id, rng.choice(ratings[2:]))
+        elif op == "update":
+            if rng.random() < 0.3:
+                doctor_id = rng.choice(doctors)
+                appt_date = open_day(doctor_id)
+                appt_time = free_slot(doctor_id, appt_date)
+            change = appointment_service.update(appt_id, patient_id, doctor_id, appt_date, appt_time,
+                                                rng.choice(statuses), rng.choice(ratings), "")
+            done += change.ok
+        else:
+            done += appointment_service.delete(appt_id).found
+    return done
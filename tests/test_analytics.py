@@ -0,0 +1,61 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import analytics
+import db_config
+
+from conftest import random_changes
+
+
+def _rollups():
+    with db_config.pooled_connection() as con:
+        cur = con.cursor()
+        cur.execute(f"""
+            SELECT doctor_id, stat_date, department_id, {", ".join(analytics.COUNTER_COLUMNS)}, rating_sum
+            FROM doctor_daily_stats
+        """)
+        rows = cur.fetchall()
+    # A row whose counters all dropped back to zero is the same as no row
+    return {(r[0], str(r[1])): (r[2],) + tuple(int(n) for n in r[3:-1]) + (round(float(r[-1]), 1),)
+            for r in rows if any(r[3:])}
+
+
+def _rebuilt(date_from=None, date_to=None):
+    with db_config.pooled_connection() as con:
+        analytics.rebuild_rollups(con.cursor(), date_from, date_to)
+        con.commit()
+    return _rollups()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_incremental_rollups_match_rebuild(db, seed):
+    assert random_changes(random.Random(seed)) > 0
+
+    assert _rollups() == _rebuilt()
+
+
+def test_rebuild_of_a_range_leaves_other_days_alone(db):
+    everything = _rollups()
+    today = date.today()
+
+    assert _rebuilt(today - timedelta(days=2), today) == everything
+
+
+def test_report_totals_match_the_appointments(db):
+    random_changes(random.Random(7), count=60)
+    today = date.today()
+    date_from, date_to = today - timedelta(days=60), today + timedelta(days=60)
+
+    doctors = analytics.doctor_report(date_from, date_to)
+    departments = analytics.department_report(date_from, date_to)
+
+    with db_config.pooled_connection() as con:
+        cur = con.cursor()
+        cur.execute("SELECT COUNT(*), COUNT(doctor_rating) FROM appointment "
+                    "WHERE appointment_date >= %s AND appointment_date <= %s",
+                    (date_from.isoformat(), date_to.isoformat()))
+        booked, rated = cur.fetchone()
+    assert sum(d.booked for d in doctors) == sum(d.booked for d in departments) == booked
+    assert sum(d.rated for d in doctors) == rated
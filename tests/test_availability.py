@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+from availability import AvailabilityIndex, availability_index, format_slot_time
+from schedule import schedule
+from services import appointment_service
+
+from conftest import SMALL_DATA, free_slot, open_day, query
+
+
+def _booked_in_db(doctor_id, day):
+    return {format_slot_time(t) for (t,) in query(
+        "SELECT appointment_time FROM appointment WHERE doctor_id=%s AND appointment_date=%s", (doctor_id, day))}
+
+
+def _window():
+    today = date.today()
+    return [(today + timedelta(days=n)).isoformat() for n in range(SMALL_DATA["future_days"] + 1)]
+
+
+def test_bulk_load_matches_the_database(db):
+    index = AvailabilityIndex()
+    days = _window()
+    index.load_dates(days)
+
+    for (doctor_id,) in query("SELECT doctor_id FROM doctor"):
+        for day in days:
+            assert index.booked_slots(doctor_id, day) == _booked_in_db(doctor_id, day)
+
+
+def test_department_availability_matches_the_database(db):
+    index = AvailabilityIndex()
+    days = _window()
+
+    result = index.department_availability(1, days)
+
+    doctors = [d for (d,) in query("SELECT doctor_id FROM doctor WHERE department_id=%s", (1,))]
+    assert sorted(result) == sorted(doctors)
+    for doctor_id in doctors:
+        for day in days:
+            assert result[doctor_id][day] == _booked_in_db(doctor_id, day)
+            assert index.is_cached(doctor_id, day)
+            free = len(schedule.template_for(doctor_id, day)) - len(_booked_in_db(doctor_id, day))
+            assert index.free_slot_count(doctor_id, day, load=False) == free
+
+
+def test_writes_keep_the_shared_index_current(db):
+    day = open_day(1)
+    time = free_slot(1, day)
+    booked = appointment_service.book(5, 1, day, time)
+    assert availability_index.booked_slots(1, day) == _booked_in_db(1, day) == {time}
+
+    new_time = free_slot(1, day)
+    appointment_service.update(booked.appointment_id, 5, 1, day, new_time, "Scheduled", None, "")
+    assert availability_index.booked_slots(1, day) == _booked_in_db(1, day) == {new_time}
+    assert availability_index.booked_slots(1, day, exclude_appt_id=booked.appointment_id) == set()
+
+    appointment_service.delete(booked.appointment_id)
+    assert availability_index.booked_slots(1, day) == _booked_in_db(1, day) == set()
@@ -0,0 +1,98 @@
+from availability import availability_index
+from services import appointment_service
+
+from conftest import free_slot, open_day, query
+
+
+DOCTOR = 1
+PATIENT = 1
+
+
+def _appointments_at(day, time):
+    return query("SELECT appointment_id FROM appointment WHERE doctor_id=%s AND appointment_date=%s "
+                 "AND appointment_time=%s", (DOCTOR, day, time))
+
+
+def test_book_free_slot(db):
+    day = open_day(DOCTOR)
+    time = free_slot(DOCTOR, day)
+
+    result = appointment_service.book(PATIENT, DOCTOR, day, time)
+
+    assert result.ok and not result.conflict
+    assert _appointments_at(day, time) == [(result.appointment_id,)]
+    assert time in availability_index.booked_slots(DOCTOR, day)
+
+
+def test_second_booking_of_a_slot_is_a_conflict(db):
+    day = open_day(DOCTOR)
+    time = free_slot(DOCTOR, day)
+    first = appointment_service.book(PATIENT, DOCTOR, day, time)
+
+    second = appointment_service.book(PATIENT + 1, DOCTOR, day, time)
+
+    assert not second.ok and second.conflict
+    assert second.alternatives and (day, time) not in second.alternatives
+    assert _appointments_at(day, time) == [(first.appointment_id,)]
+
+
+def test_conflict_found_by_the_database_when_the_index_is_stale(db):
+    day = open_day(DOCTOR)
+    time = free_slot(DOCTOR, day)
+    first = appointment_service.book(PATIENT, DOCTOR, day, time)
+    availability_index.invalidate()   # another desk booked it; this process has not seen it
+
+    second = appointment_service.book(PATIENT + 1, DOCTOR, day, time)
+
+    assert not second.ok and second.conflict
+    assert _appointments_at(day, time) == [(first.appointment_id,)]
+    assert time in availability_index.booked_slots(DOCTOR, day)
+
+
+def test_time_outside_the_schedule_is_rejected(db):
+    day = open_day(DOCTOR)
+
+    result = appointment_service.book(PATIENT, DOCTOR, day, "03:10")
+
+    assert not result.ok and not result.conflict
+    assert result.alternatives
+    assert _appointments_at(day, "03:10") == []
+
+
+def test_update_onto_a_taken_slot_is_a_conflict(db):
+    day = open_day(DOCTOR)
+    taken = free_slot(DOCTOR, day)
+    appointment_service.book(PATIENT, DOCTOR, day, taken)
+    other = free_slot(DOCTOR, day)
+    moving = appointment_service.book(PATIENT + 1, DOCTOR, day, other)
+    availability_index.invalidate()
+
+    change = appointment_service.update(moving.appointment_id, PATIENT + 1, DOCTOR, day, taken,
+                                        "Scheduled", None, "")
+
+    assert change.found and not change.ok and change.conflict
+    assert query("SELECT appointment_time FROM appointment WHERE appointment_id=%s",
+                 (moving.appointment_id,)) == [(other,)]
+
+
+def test_update_to_a_time_outside_the_schedule_is_rejected(db):
+    day = open_day(DOCTOR)
+    booked = appointment_service.book(PATIENT, DOCTOR, day, free_slot(DOCTOR, day))
+
+    change = appointment_service.update(booked.appointment_id, PATIENT, DOCTOR, day, "03:10",
+                                        "Scheduled", None, "")
+
+    assert change.found and not change.ok and not change.conflict
+    assert _appointments_at(day, "03:10") == []
+
+
+def test_update_keeping_its_own_slot_is_not_a_conflict(db):
+    day = open_day(DOCTOR)
+    time = free_slot(DOCTOR, day)
+    booked = appointment_service.book(PATIENT, DOCTOR, day, time)
+
+    change = appointment_service.update(booked.appointment_id, PATIENT, DOCTOR, day, time,
+                                        "Completed", 4.5, "seen")
+
+    assert change.ok and change.found and change.rating_changed
+    assert time in availability_index.booked_slots(DOCTOR, day)
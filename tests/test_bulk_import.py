@@ -0,0 +1,61 @@
+import services
+from bulk_import import import_file
+
+from conftest import query
+
+
+CSV = """first_name,last_name,gender,phone,email,username,password
+Ann,Smith,F,555-0101,ann@example.com,ann,pw-ann
+Bob,,M,,,,
+Cara,Jones,female,,,user1,pw-cara
+Dan,Lee,x,,,,
+Eve,Park,,,eve@,,
+Finn,Moss,male,,,,
+Gail,Reed,,,,ann,pw-gail
+Hal,Kim,,,,hal,
+"""
+
+
+def _import(tmp_path, chunk_size=100):
+    path = tmp_path / "patients.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return import_file(str(path), chunk_size=chunk_size)
+
+
+def _patients(*first_names):
+    placeholders = ", ".join(["%s"] * len(first_names))
+    return sorted(r[0] for r in query(f"SELECT first_name FROM patient WHERE first_name IN ({placeholders})",
+                                      first_names))
+
+
+def test_bad_rows_are_reported_and_the_rest_imported(db, cheap_hasher, tmp_path):
+    report = _import(tmp_path)
+
+    assert (report.rows, report.imported, report.accounts, report.failed) == (8, 2, 1, 6)
+    assert sorted(line for line, _ in report.errors) == [3, 4, 5, 6, 8, 9]
+    assert "already taken" in dict(report.errors)[4]
+    assert "more than once" in dict(report.errors)[8]
+    assert _patients("Ann", "Finn", "Cara", "Gail") == ["Ann", "Finn"]
+    [(stored,)] = query("SELECT password FROM user_account WHERE username=%s", ("ann",))
+    assert cheap_hasher.verify("pw-ann", stored)
+
+
+def test_rejected_chunk_is_retried_row_by_row(db, cheap_hasher, tmp_path, monkeypatch):
+    # Let the taken username reach the database, as when another desk registers it mid-import
+    monkeypatch.setattr(services.account_repo, "existing_usernames", lambda usernames: set())
+
+    report = _import(tmp_path)
+
+    assert (report.imported, report.failed) == (2, 6)
+    assert "database rejected the row" in dict(report.errors)[4]
+    assert _patients("Ann", "Finn", "Cara") == ["Ann", "Finn"]   # Cara's patient row was rolled back too
+
+
+def test_dry_run_writes_nothing(db, cheap_hasher, tmp_path):
+    path = tmp_path / "patients.csv"
+    path.write_text(CSV, encoding="utf-8")
+
+    report = import_file(str(path), dry_run=True)
+
+    assert (report.imported, report.failed) == (2, 6)
+    assert _patients("Ann", "Finn") == []
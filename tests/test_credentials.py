@@ -0,0 +1,50 @@
+import pytest
+
+from credentials import PBKDF2, SCRYPT, PasswordHasher
+from services import account_repo
+
+from conftest import query
+
+
+@pytest.mark.parametrize("hasher", [
+    PasswordHasher(scheme=SCRYPT, scrypt_n=2 ** 4),
+    PasswordHasher(scheme=PBKDF2, pbkdf2_iterations=1000),
+], ids=["scrypt", "pbkdf2"])
+def test_hash_and_verify(hasher):
+    stored = hasher.hash("s3cret")
+
+    assert hasher.is_hash(stored)
+    assert stored != hasher.hash("s3cret")   # fresh salt every time
+    assert hasher.verify("s3cret", stored)
+    assert not hasher.verify("S3cret", stored)
+    assert not hasher.needs_rehash(stored)
+
+
+def test_plaintext_and_outdated_hashes_need_a_rehash():
+    hasher = PasswordHasher(scheme=PBKDF2, pbkdf2_iterations=1000)
+    stronger = PasswordHasher(scheme=PBKDF2, pbkdf2_iterations=2000)
+
+    assert hasher.verify("legacy", "legacy") and hasher.needs_rehash("legacy")
+    assert stronger.needs_rehash(hasher.hash("pw"))
+    assert stronger.verify("pw", hasher.hash("pw"))   # old hashes keep working until replaced
+
+
+def test_unknown_user_never_verifies():
+    hasher = PasswordHasher(scheme=PBKDF2, pbkdf2_iterations=1000)
+
+    assert not hasher.verify("", None)
+    assert not hasher.verify("anything", None)
+
+
+def test_login_replaces_a_plaintext_password(db, cheap_hasher):
+    account = account_repo.authenticate("user1", "pass1")
+
+    [(stored,)] = query("SELECT password FROM user_account WHERE username=%s", ("user1",))
+    assert account is not None and account.password == stored
+    assert cheap_hasher.is_hash(stored) and cheap_hasher.verify("pass1", stored)
+    assert account_repo.authenticate("user1", "pass1") == account   # no second rehash
+    assert account_repo.authenticate("user1", "wrong") is None
+
+
+def test_unknown_user_cannot_log_in(db, cheap_hasher):
+    assert account_repo.authenticate("nobody", "pass1") is None
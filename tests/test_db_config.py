@@ -0,0 +1,114 @@
+import pymysql
+import pytest
+
+from db_config import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self, fail_rollback=False):
+        self.fail_rollback = fail_rollback
+        self.rollbacks = 0
+        self.closed = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        if self.fail_rollback:
+            raise OSError("connection lost")
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def _pool(max_size=2, **kwargs):
+    opened = []
+
+    def connect():
+        con = FakeConnection()
+        opened.append(con)
+        return con
+
+    return ConnectionPool(connect=connect, max_size=max_size, timeout=0.05, **kwargs), opened
+
+
+def test_release_rolls_back_and_keeps_the_connection():
+    pool, opened = _pool()
+
+    with pool.connection():
+        pass
+    with pool.connection():
+        pass
+
+    assert len(opened) == 1 and opened[0].rollbacks == 2 and not opened[0].closed
+    assert pool.stats() == {"size": 1, "idle": 1, "in_use": 0, "max_size": 2}
+
+
+def test_failed_rollback_discards_the_connection():
+    pool, opened = _pool()
+    con = pool.acquire()
+    opened[0].fail_rollback = True
+
+    con.close()
+
+    assert opened[0].closed
+    assert pool.stats()["size"] == 0
+
+
+def test_connection_past_its_lifetime_is_closed_on_return():
+    pool, opened = _pool(max_lifetime=-1)
+
+    with pool.connection():
+        pass
+
+    assert opened[0].closed
+    assert pool.stats()["size"] == 0
+
+
+def test_exhausted_pool_times_out_and_recovers():
+    pool, _ = _pool(max_size=1)
+    con = pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    con.close()
+    pool.acquire().close()
+
+
+def test_returned_connection_cannot_be_used():
+    pool, _ = _pool()
+    con = pool.acquire()
+    con.close()
+    con.close()   # a second close is harmless
+
+    with pytest.raises(pymysql.err.InterfaceError):
+        con.rollback()
+    assert pool.stats()["in_use"] == 0
+
+
+def test_close_all_closes_idle_and_later_returned_connections():
+    pool, opened = _pool()
+    busy = pool.acquire()
+    pool.acquire().close()
+    idle = next(c for c in opened if c.rollbacks)
+
+    pool.close_all()
+
+    assert idle.closed
+    busy_raw = next(c for c in opened if c is not idle)
+    assert not busy_raw.closed
+    busy.close()
+    assert busy_raw.closed
+    assert pool.stats() == {"size": 0, "idle": 0, "in_use": 0, "max_size": 2}
+
+
+def test_closed_pool_does_not_keep_new_connections():
+    pool, opened = _pool()
+    pool.close_all()
+
+    with pool.connection():
+        pass
+
+    assert opened[0].closed
+    assert pool.stats()["size"] == 0
@@ -0,0 +1,65 @@
+import pytest
+
+from services import appointment_service
+
+from conftest import query
+
+
+def _expected():
+    """Every appointment id in list order (newest first, ties broken by id)."""
+    rows = query("SELECT appointment_id, appointment_date, appointment_time FROM appointment")
+    return [r[0] for r in sorted(rows, key=lambda r: (str(r[1]), str(r[2]), r[0]), reverse=True)]
+
+
+def _walk_older(limit):
+    ids, cursor = [], None
+    while True:
+        page = appointment_service.page(cursor, "older", limit=limit)
+        ids += [row.appointment_id for row in page.rows]
+        if not page.full:
+            return ids
+        cursor = page.rows[-1].cursor
+
+
+@pytest.mark.parametrize("limit", [1, 7, 50])
+def test_older_pages_cover_every_row_once(db, limit):
+    assert _walk_older(limit) == _expected()
+
+
+def test_page_size_dividing_the_total_ends_with_an_empty_page(db):
+    total = len(_expected())
+    limit = next(n for n in range(9, 0, -1) if total % n == 0)
+
+    assert _walk_older(limit) == _expected()
+
+
+def test_slot_ties_are_split_by_id(db):
+    ties = query("SELECT appointment_date, appointment_time FROM appointment "
+                 "GROUP BY appointment_date, appointment_time HAVING COUNT(*) > 1")
+    assert ties, "the generated data should book several doctors into the same slot"
+
+    # Page boundaries land inside every group of equal (date, time) rows
+    assert _walk_older(2) == _expected()
+
+
+def test_newer_pages_walk_back_up(db):
+    expected = _expected()
+    third = appointment_service.page(
+        appointment_service.page(appointment_service.page(limit=10).rows[-1].cursor, limit=10).rows[-1].cursor,
+        limit=10)
+
+    back = appointment_service.page(third.rows[0].cursor, "newer", limit=10)
+
+    assert [row.appointment_id for row in third.rows] == expected[20:30]
+    assert [row.appointment_id for row in back.rows] == expected[10:20]
+
+
+def test_inclusive_cursor_repeats_its_row(db):
+    expected = _expected()
+    cursor = appointment_service.page(limit=5).rows[-1].cursor
+
+    older = appointment_service.page(cursor, "older", inclusive=True, limit=3)
+    newer = appointment_service.page(cursor, "newer", inclusive=True, limit=3)
+
+    assert [row.appointment_id for row in older.rows] == expected[4:7]
+    assert [row.appointment_id for row in newer.rows] == expected[2:5]
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+import db_config
+from ratings import reconcile_ratings
+from services import appointment_service, rating_service
+
+from conftest import free_slot, open_day, query, random_changes
+
+
+def _aggregates():
+    return {doctor_id: (round(float(total), 1), count, None if avg is None else round(float(avg), 6))
+            for doctor_id, total, count, avg in query(
+                "SELECT doctor_id, rating_sum, rating_count, avg_rating FROM doctor ORDER BY doctor_id")}
+
+
+def _reconciled():
+    with db_config.pooled_connection() as con:
+        reconcile_ratings(con.cursor())
+        con.commit()
+    return _aggregates()
+
+
+def test_generated_data_starts_reconciled(db):
+    assert _aggregates() == _reconciled()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_deltas_match_reconcile_after_random_changes(db, seed):
+    assert random_changes(random.Random(seed)) > 0
+
+    assert _aggregates() == _reconciled()
+
+
+def test_submit_rates_only_once_and_only_own_appointments(db):
+    day = open_day(1)
+    booked = appointment_service.book(5, 1, day, free_slot(1, day))
+    before = _aggregates()[1]
+
+    assert not rating_service.submit(6, booked.appointment_id, 4.0)   # someone else's appointment
+    assert rating_service.submit(5, booked.appointment_id, 4.0)
+    assert not rating_service.submit(5, booked.appointment_id, 1.0)   # already rated
+
+    total, count, _ = _aggregates()[1]
+    assert (total, count) == (round(before[0] + 4.0, 1), before[1] + 1)
+    assert _aggregates() == _reconciled()
+
+
+def test_moving_a_rated_appointment_moves_its_rating(db):
+    day = open_day(1)
+    booked = appointment_service.book(5, 1, day, free_slot(1, day), status="Completed", doctor_rating=5.0)
+    target_day = open_day(2)
+
+    change = appointment_service.update(booked.appointment_id, 5, 2, target_day, free_slot(2, target_day),
+                                        "Completed", 5.0, "")
+
+    assert change.ok and change.rating_changed
+    assert _aggregates() == _reconciled()
@@ -0,0 +1,97 @@
+from table_sync import TreeviewSync
+
+
+class FakeTree:
+    """The ttk.Treeview calls TreeviewSync makes, on a plain list (no display needed)."""
+
+    def __init__(self):
+        self.order = []
+        self.items = {}   # iid -> {"values": ..., "tags": ...}
+        self.calls = []
+
+    def get_children(self):
+        return tuple(self.order)
+
+    def exists(self, iid):
+        return iid in self.items
+
+    def insert(self, parent, index, iid, values, tags):
+        self.calls.append(("insert", iid))
+        self.order.insert(index, iid)
+        self.items[iid] = {"values": values, "tags": tags}
+
+    def delete(self, *iids):
+        self.calls.append(("delete",) + iids)
+        for iid in iids:
+            self.order.remove(iid)
+            del self.items[iid]
+
+    def move(self, iid, parent, index):
+        self.calls.append(("move", iid))
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def item(self, iid, values, tags):
+        self.calls.append(("item", iid))
+        self.items[iid] = {"values": values, "tags": tags}
+
+    def yview(self):
+        return (0.0, 1.0)
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def rows(self):
+        return [self.items[iid]["values"] for iid in self.order]
+
+
+def test_first_sync_inserts_every_row():
+    tree = FakeTree()
+    rows = [(1, "a"), (2, "b"), (3, "c")]
+
+    assert TreeviewSync(tree).sync(rows) == (3, 0, 0)
+    assert tree.rows() == rows
+
+
+def test_unchanged_rows_are_not_touched():
+    tree = FakeTree()
+    sync = TreeviewSync(tree)
+    sync.sync([(1, "a"), (2, "b")])
+    tree.calls.clear()
+
+    assert sync.sync([(1, "a"), (2, "b")]) == (0, 0, 0)
+    assert tree.calls == []
+
+
+def test_only_the_difference_is_applied():
+    tree = FakeTree()
+    sync = TreeviewSync(tree)
+    sync.sync([(1, "a"), (2, "b"), (3, "c"), (4, "d")])
+    tree.calls.clear()
+
+    rows = [(4, "d"), (1, "a"), (3, "C"), (5, "e")]
+    assert sync.sync(rows) == (1, 1, 1)
+    assert tree.rows() == rows
+    assert ("delete", "2") in tree.calls and ("insert", "5") in tree.calls
+    assert ("item", "3") in tree.calls and ("item", "1") not in tree.calls
+
+
+def test_tags_and_hidden_columns():
+    tree = FakeTree()
+    sync = TreeviewSync(tree)
+
+    sync.sync([(1, "a", True), (2, "b", False)], tags=lambda r: ("late",) if r[2] else (), columns=2)
+
+    assert tree.rows() == [(1, "a"), (2, "b")]
+    assert tree.items["1"]["tags"] == ("late",) and tree.items["2"]["tags"] == ()
+
+
+def test_clear_forgets_the_rows():
+    tree = FakeTree()
+    sync = TreeviewSync(tree)
+    sync.sync([(1, "a")])
+
+    sync.clear()
+
+    assert tree.order == []
+    assert sync.sync([(1, "a")]) == (1, 0, 0)
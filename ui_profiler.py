@@ -0,0 +1,254 @@
+"""
+ui_profiler.py
+--------------
+Wall time and widget churn of every Tk callback.
+
+query_metrics.py shows what the database costs; this shows what the UI
+thread costs. Once installed, the profiler wraps the callbacks Tk calls
+into Python: command= options, bind() handlers, after() timers and
+variable traces. It records per handler:
+
+    - calls, total / max wall time
+    - widgets created and destroyed while the handler ran
+    - Treeview rows inserted / deleted / moved while it ran
+
+Results that db_executor delivers from its worker threads (on_done /
+on_error) are timed as their own handlers, e.g.
+"AppointmentAdminFrame.show_appointments" rather than "DbExecutor._drain".
+Handlers that block the mainloop longer than `slow_threshold`
+(SLOW_HANDLER_MS, or CLINIC_UI_SLOW_MS) are logged to the "clinic.ui_slow"
+logger and kept in a short list.
+
+Turn it on with CLINIC_UI_PROFILE=1 when starting main_app.py. A report is
+printed when the app exits, and CLINIC_UI_PROFILE_DUMP=path also writes
+the JSON. From code: ui_profiler.install(), then ui_profiler.report().
+
+Only callbacks registered after install() are timed, so install before
+the first window is built. Everything here runs on the Tk thread.
+"""
+
+import atexit
+import json
+import logging
+import os
+import time
+import tkinter
+from collections import deque
+from tkinter import ttk
+
+
+SLOW_HANDLER_MS = 100
+SLOW_LOG_SIZE = 100
+OUTSIDE_HANDLERS = "<outside handlers>"   # startup code, window construction, ...
+
+slow_log = logging.getLogger("clinic.ui_slow")
+
+
+def handler_name(func):
+    """Readable name of a Tk callback: 'Class.method', a function's qualname, ..."""
+    # after() wraps the function in a local `callit`; report the real one
+    if getattr(func, "__qualname__", "").endswith("after.<locals>.callit") and func.__closure__:
+        cells = dict(zip(func.__code__.co_freevars, func.__closure__))
+        if "func" in cells:
+            func = cells["func"].cell_contents
+    func = getattr(func, "func", func)   # functools.partial
+    owner = getattr(func, "__self__", None)
+    if owner is not None and not isinstance(owner, type(tkinter)):
+        return f"{type(owner).__name__}.{func.__name__}"
+    name = getattr(func, "__qualname__", None) or getattr(func, "__name__", None)
+    return name or type(func).__name__
+
+
+class _HandlerStats:
+    __slots__ = ("calls", "total", "max", "slow", "created", "destroyed",
+                 "tree_inserts", "tree_deletes", "tree_moves")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.created = 0
+        self.destroyed = 0
+        self.tree_inserts = 0
+        self.tree_deletes = 0
+        self.tree_moves = 0
+
+
+class UiProfiler:
+    """Times Tk callbacks and attributes widget churn to the handler that caused it."""
+
+    def __init__(self, slow_threshold=SLOW_HANDLER_MS / 1000):
+        self.enabled = False
+        self.slow_threshold = slow_threshold
+        self._stats = {}      # handler name -> _HandlerStats
+        self._active = []     # names of the handlers currently running (innermost last)
+        self._slow = deque(maxlen=SLOW_LOG_SIZE)
+        self._originals = None
+
+    # ---------- install ----------
+    def install(self):
+        """Patch tkinter so callbacks registered from now on are profiled."""
+        if self._originals is not None:
+            return
+        profiler = self
+        original_widget_init = tkinter.BaseWidget.__init__
+        original_destroy = tkinter.BaseWidget.destroy
+        original_insert = ttk.Treeview.insert
+        original_delete = ttk.Treeview.delete
+        original_move = ttk.Treeview.move
+
+        class ProfiledCallWrapper(tkinter.CallWrapper):
+            def __call__(self, *args):
+                name = self.__dict__.get("_profile_name")
+                if name is None:
+                    name = self._profile_name = handler_name(self.func)
+                return profiler.run(name, super().__call__, *args)
+
+        def widget_init(widget, *args, **kwargs):
+            original_widget_init(widget, *args, **kwargs)
+            profiler._count("created")
+
+        def destroy(widget):
+            profiler._count("destroyed")
+            original_destroy(widget)
+
+        def insert(tree, *args, **kwargs):
+            profiler._count("tree_inserts")
+            return original_insert(tree, *args, **kwargs)
+
+        def delete(tree, *items):
+            profiler._count("tree_deletes", len(items))
+            return original_delete(tree, *items)
+
+        def move(tree, *args):
+            profiler._count("tree_moves")
+            return original_move(tree, *args)
+
+        self._originals = {
+            (tkinter, "CallWrapper"): tkinter.CallWrapper,
+            (tkinter.BaseWidget, "__init__"): original_widget_init,
+            (tkinter.BaseWidget, "destroy"): original_destroy,
+            (ttk.Treeview, "insert"): original_insert,
+            (ttk.Treeview, "delete"): original_delete,
+            (ttk.Treeview, "move"): original_move,
+        }
+        tkinter.CallWrapper = ProfiledCallWrapper
+        tkinter.BaseWidget.__init__ = widget_init
+        tkinter.BaseWidget.destroy = destroy
+        ttk.Treeview.insert = insert
+        ttk.Treeview.delete = delete
+        ttk.Treeview.move = move
+        self.enabled = True
+
+    def uninstall(self):
+        """Restore tkinter (callbacks registered meanwhile stay wrapped but stop recording)."""
+        if self._originals is None:
+            return
+        for (owner, attr), value in self._originals.items():
+            setattr(owner, attr, value)
+        self._originals = None
+        self.enabled = False
+
+    # ---------- recording ----------
+    def call(self, func, *args):
+        """Run func(*args) as a named handler (used for db_executor deliveries)."""
+        if not self.enabled:
+            return func(*args)
+        return self.run(handler_name(func), func, *args)
+
+    def run(self, name, func, *args):
+        if not self.enabled:
+            return func(*args)
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _HandlerStats()
+        before = (stats.created, stats.destroyed)
+        self._active.append(name)
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._active.pop()
+            stats.calls += 1
+            stats.total += elapsed
+            if elapsed > stats.max:
+                stats.max = elapsed
+            if elapsed >= self.slow_threshold:
+                stats.slow += 1
+                self._record_slow(name, elapsed, stats.created - before[0], stats.destroyed - before[1])
+
+    def _count(self, field, n=1):
+        if not self.enabled:
+            return
+        name = self._active[-1] if self._active else OUTSIDE_HANDLERS
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = _HandlerStats()
+        setattr(stats, field, getattr(stats, field) + n)
+
+    def _record_slow(self, name, seconds, created, destroyed):
+        self._slow.append({"at": time.strftime("%Y-%m-%d %H:%M:%S"), "handler": name,
+                           "ms": round(seconds * 1000, 2), "created": created, "destroyed": destroyed})
+        slow_log.warning("%s blocked the mainloop for %.1f ms (+%d / -%d widgets)",
+                         name, seconds * 1000, created, destroyed)
+
+    def reset(self):
+        self._stats.clear()
+        self._slow.clear()
+
+    # ---------- reading ----------
+    def snapshot(self):
+        """Plain dict: handlers sorted by total time, plus the slow-handler list."""
+        handlers = [
+            {"handler": name, "calls": s.calls, "total_ms": round(s.total * 1000, 3),
+             "avg_ms": round(s.total * 1000 / s.calls, 3) if s.calls else 0.0,
+             "max_ms": round(s.max * 1000, 3), "slow": s.slow,
+             "widgets_created": s.created, "widgets_destroyed": s.destroyed,
+             "tree_inserts": s.tree_inserts, "tree_deletes": s.tree_deletes, "tree_moves": s.tree_moves}
+            for name, s in self._stats.items()
+        ]
+        handlers.sort(key=lambda h: h["total_ms"], reverse=True)
+        return {"slow_threshold_ms": round(self.slow_threshold * 1000, 3),
+                "handlers": handlers, "slow_handlers": list(self._slow)}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def dump_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+
+    def report(self, limit=20):
+        """Text table of the handlers that kept the Tk thread busiest."""
+        rows = self.snapshot()["handlers"][:limit]
+        width = max([len(h["handler"]) for h in rows] + [7])
+        lines = [f"{'handler':<{width}}{'calls':>7}{'total ms':>11}{'avg ms':>9}{'max ms':>9}{'slow':>6}"
+                 f"{'+widgets':>10}{'-widgets':>10}{'tree +/-/mv':>14}",
+                 "-" * (width + 76)]
+        for h in rows:
+            tree = f"{h['tree_inserts']}/{h['tree_deletes']}/{h['tree_moves']}"
+            lines.append(f"{h['handler']:<{width}}{h['calls']:>7}{h['total_ms']:>11.1f}{h['avg_ms']:>9.2f}"
+                         f"{h['max_ms']:>9.2f}{h['slow']:>6}{h['widgets_created']:>10}"
+                         f"{h['widgets_destroyed']:>10}{tree:>14}")
+        return "\n".join(lines)
+
+
+def install_from_environment():
+    """Install when CLINIC_UI_PROFILE=1; print the report (and dump JSON) at exit."""
+    if os.environ.get("CLINIC_UI_PROFILE", "0") in ("", "0"):
+        return False
+    threshold = os.environ.get("CLINIC_UI_SLOW_MS")
+    if threshold:
+        ui_profiler.slow_threshold = float(threshold) / 1000
+    ui_profiler.install()
+    atexit.register(lambda: print(ui_profiler.report(), flush=True))
+    dump_path = os.environ.get("CLINIC_UI_PROFILE_DUMP")
+    if dump_path:
+        atexit.register(ui_profiler.dump_json, dump_path)
+    return True
+
+
+# Process-wide profiler (inactive until installed).
+ui_profiler = UiProfiler()